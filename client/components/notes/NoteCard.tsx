@@ -90,7 +90,9 @@ export default function NoteCard({
             {/* Similarity Score for Search Results */}
             {showSimilarity && isRetrievedNote(note) && (
               <span className='flex items-center gap-1 px-2 py-0.5 rounded-full bg-green-100 dark:bg-green-900/30 text-green-700 dark:text-green-400 font-medium'>
-                {Math.round(note.similarity_score * 100)}% match
+                {note.similarity_score === null
+                  ? 'Keyword match'
+                  : `${Math.round(note.similarity_score * 100)}% match`}
               </span>
             )}
           </div>
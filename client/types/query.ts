@@ -10,7 +10,8 @@ export interface RetrievedNote {
   title: string;
   content: string;
   tags: string[];
-  similarity_score: number;
+  similarity_score: number | null;
+  text_rank?: number | null;
   created_at: string;
 }
 
@@ -9,7 +9,8 @@ export interface SearchResult {
   title: string;
   content: string;
   tags: string[];
-  similarity_score: number;
+  similarity_score: number | null;
+  text_rank?: number | null;
   created_at: string;
 }
 
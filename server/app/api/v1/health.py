@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from sqlalchemy import text
+from app.core.auth import get_user_id
 from app.core.database import get_db
+from app.core.metrics import metrics
 
 router = APIRouter(prefix="/health", tags=["health"])
 
@@ -29,4 +31,10 @@ def database_health(db: Session = Depends(get_db)):
             "status": "unhealthy",
             "database": "disconnected",
             "error": str(e)
-        }
\ No newline at end of file
+        }
+
+
+@router.get("/metrics", dependencies=[Depends(get_user_id)])
+def service_metrics():
+    """In-process counters and histograms (batching, caches, ...); requires a valid token like the API routes"""
+    return metrics.snapshot()
@@ -10,9 +10,13 @@ from app.schemas.note import (
     NoteResponse, 
     NoteListResponse,
     NoteDeleteResponse,
-    NoteDeleteAllResponse
+    NoteDeleteAllResponse,
+    RelatedNotesResponse
 )
+from app.api.v1.search import to_result_item
+from app.models.note import Note, PREVIEW_CHARS
 from app.services.note_service import NoteService
+from app.utils.helpers import make_snippet
 
 router = APIRouter(
     prefix="/notes",
@@ -20,16 +24,28 @@ router = APIRouter(
 )
 
 
+def _preview_response(note: Note) -> NoteResponse:
+    """NoteResponse with a snippet in place of the content (reads only content_preview)"""
+    return NoteResponse(
+        id=note.id,  # type: ignore
+        title=note.title,  # type: ignore
+        snippet=make_snippet(note.content_preview, PREVIEW_CHARS),  # type: ignore
+        tags=note.tags,  # type: ignore
+        embedding_status=note.embedding_status,  # type: ignore
+        created_at=note.created_at,  # type: ignore
+        updated_at=note.updated_at  # type: ignore
+    )
+
 
 @router.post("", response_model=NoteResponse, status_code=status.HTTP_201_CREATED)
 @router.post("/", response_model=NoteResponse, status_code=status.HTTP_201_CREATED)
-def create_note(
+async def create_note(
     note: NoteCreate,
     user_id: str = Depends(get_user_id), 
     db: Session = Depends(get_db)
 ):
     """Create a new note for authenticated user"""
-    created_note = NoteService.create_note(db, note, user_id)
+    created_note = await NoteService.acreate_note(db, note, user_id)
     return created_note
 
 @router.get("", response_model=NoteListResponse)
@@ -38,6 +54,7 @@ def list_notes(
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(20, ge=1, le=100, description="Items per page"),
     tag: Optional[str] = Query(None, description="Filter by tag"),
+    preview: bool = Query(False, description="Return a snippet instead of each note's content"),
     user_id: str = Depends(get_user_id),
     db: Session = Depends(get_db)
 ):
@@ -48,11 +65,12 @@ def list_notes(
         user_id=user_id,  
         skip=skip, 
         limit=page_size, 
-        tag=tag
+        tag=tag,
+        preview=preview
     )
     
     return NoteListResponse(
-        notes=notes,  # type: ignore
+        notes=[_preview_response(note) for note in notes] if preview else notes,  # type: ignore
         total=total,
         page=page,
         page_size=page_size
@@ -85,15 +103,36 @@ def get_note(
     
     return note
 
+@router.get("/{note_id}/related", response_model=RelatedNotesResponse)
+def get_related_notes(
+    note_id: UUID,
+    limit: int = Query(5, ge=1, le=20, description="Number of related notes"),
+    min_similarity: float = Query(0.0, ge=0.0, le=1.0, description="Minimum similarity score"),
+    preview: bool = Query(True, description="Return a snippet instead of each note's content"),
+    user_id: str = Depends(get_user_id),
+    db: Session = Depends(get_db)
+):
+    """Notes most similar to an existing note (uses its stored embedding, no embedding call)"""
+    related = NoteService.get_related_notes(db, note_id, user_id, limit, min_similarity, preview)
+    
+    if related is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Note with id {note_id} not found"
+        )
+    
+    results = [to_result_item(note, similarity, [], preview) for note, similarity in related]
+    return RelatedNotesResponse(note_id=note_id, results=results, total_results=len(results))
+
 @router.put("/{note_id}", response_model=NoteResponse)
-def update_note(
+async def update_note(
     note_id: UUID,
     note_update: NoteUpdate,
     user_id: str = Depends(get_user_id),
     db: Session = Depends(get_db)
 ):
     """Update an existing note (must belong to user)"""
-    updated_note = NoteService.update_note(db, note_id, note_update, user_id)
+    updated_note = await NoteService.aupdate_note(db, note_id, note_update, user_id)
     
     if not updated_note:
         raise HTTPException(
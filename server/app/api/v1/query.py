@@ -1,22 +1,226 @@
 from fastapi import APIRouter, Depends, UploadFile, File, Query as QueryParam
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+import asyncio
+import json
 import time
+from dataclasses import asdict
 from app.core.database import get_db
 from app.core.auth import get_user_id  
+from app.core.bulkhead import embedding_bulkhead, database_bulkhead
+from app.core.deadline import Deadline
+from app.core.scheduler import groq_scheduler
+from app.core.settings import get_settings
+from app.core.single_flight import SingleFlight
+from app.models.note import Note
+from app.services.answer_cache import NoteVersions, answer_cache, note_versions
+from app.services.context_packer import context_packer
 from app.services.voice_service import voice_service
-from app.services.embedding_service import embedding_service
-from app.services.vector_service import vector_service
+from app.services.retrieval_service import retrieval_service
+from app.services.search_cache import normalize_query
+from app.services.summary_pipeline import summary_pipeline
 from app.services.llm_service import llm_service
-from app.schemas.query import QueryRequest, QueryResponse, RetrievedNote
+from app.schemas.query import (
+    ContextPackingStats, QueryRequest, QueryResponse, QueryStreamDone, QueryStreamNotes, QueryTimings, RetrievedNote
+)
+from app.utils.exceptions import LLMReasoningError
+from app.utils.logger import logger
 
 router = APIRouter(
     prefix="/query",
     tags=["query"],
 )
 
+# Identical concurrent questions over the same notes share one LLM completion
+answer_flight = SingleFlight("llm_answer")
+
+# Answer sent with the retrieved notes when the LLM cannot answer within the deadline
+_NO_ANSWER = {
+    "answer": "An answer could not be generated in time. These are the notes that best match your question.",
+    "cited_notes": []
+}
+
+def _deadline(requested_ms: Optional[int] = None) -> Deadline:
+    """Time budget of a query request: QUERY_DEADLINE_MS, or less if the client asked for less"""
+    budget_ms = get_settings().query_deadline_ms
+    return Deadline(min(budget_ms, requested_ms) if requested_ms else budget_ms)
+
+def _lexical_only(mode: str, deadline: Deadline) -> bool:
+    """Whether results are keyword-only matches, scored by text rank rather than cosine similarity"""
+    return mode == "lexical" or "lexical_fallback" in deadline.degradations
+
+def _scores(score: float, lexical: bool) -> Dict[str, Optional[float]]:
+    """similarity_score / text_rank of a result; the two scales are never mixed"""
+    if lexical:
+        return {"similarity_score": None, "text_rank": round(score, 3)}
+    return {"similarity_score": round(score, 3), "text_rank": None}
+
+def _prompt_passages(passages: List[str], summary: Optional[str]) -> List[str]:
+    """What stands in for a note's content in the prompt, per LLM_NOTE_CONTEXT"""
+    strategy = get_settings().llm_note_context
+    if summary is None or strategy == "content":
+        return passages
+    if strategy == "summary_passage" and passages:
+        return [summary, passages[0]]
+    return [summary]
+
+def _notes_for_llm(
+    results: List[Tuple[Note, float, List[str]]],
+    summaries: Optional[Dict[Any, str]] = None,
+    lexical: bool = False
+) -> List[Dict[str, Any]]:
+    """Note dicts for LLMService; long notes carry only their matched passages, or their summary"""
+    summaries = summaries or {}
+    return [
+        {
+            "id": str(note.id),
+            "title": note.title,
+            "content": note.content,
+            "passages": _prompt_passages(passages, summaries.get(note.id)),
+            "tags": note.tags,
+            **_scores(score, lexical)
+        }
+        for note, score, passages in results
+    ]
+
+def _confidence(results: List[Tuple[Note, float, List[str]]], lexical: bool = False) -> str:
+    """Bands on the top cosine similarity; keyword-only matches have none and rate at most medium"""
+    if lexical:
+        return "medium" if results else "low"
+    if results and results[0][1] > 0.7:
+        return "high"
+    if results and results[0][1] > 0.5:
+        return "medium"
+    return "low"
+
+def _retrieved_notes(results: List[Tuple[Note, float, List[str]]], lexical: bool = False) -> List[RetrievedNote]:
+    return [
+        RetrievedNote(
+            id=note.id,  # type: ignore
+            title=note.title,  # type: ignore
+            content=note.content,  # type: ignore
+            tags=note.tags,  # type: ignore
+            **_scores(score, lexical),
+            created_at=note.created_at  # type: ignore
+        )
+        for note, score, _ in results
+    ]
+
+async def _cached_answer(
+    user_id: str,
+    query: str,
+    mode: str,
+    notes: NoteVersions,
+    deadline: Deadline,
+    embedding: Optional[List[float]] = None
+) -> Tuple[Optional[List[float]], Optional[Dict[str, Any]]]:
+    """
+    Query vector for the answer cache (None in lexical mode or when it was too slow for retrieval)
+    and the cached answer, if any; `embedding` is the vector retrieval already searched with
+    """
+    if answer_cache is None or not notes:
+        return embedding, None
+    if embedding is None and mode != "lexical" and "lexical_fallback" not in deadline.degradations:
+        # Retrieval came from the search cache: normally an embedding cache hit
+        embedding = await retrieval_service.aembed_query(query, deadline)
+    return embedding, answer_cache.get(user_id, query, embedding, notes)
+
+def _store_answer(
+    user_id: str,
+    query: str,
+    embedding: Optional[List[float]],
+    notes: NoteVersions,
+    llm_response: Dict[str, Any]
+) -> None:
+    if answer_cache is not None:
+        answer_cache.put(user_id, query, embedding, notes, llm_response)
+
+def _ms(start: float, end: float) -> float:
+    return round((end - start) * 1000, 2)
+
+async def _generate_answer(
+    db: Session,
+    user_id: str,
+    query: str,
+    query_embedding: Optional[List[float]],
+    versions: NoteVersions,
+    results: List[Tuple[Note, float, List[str]]],
+    deadline: Deadline,
+    lexical: bool = False
+) -> Tuple[Dict[str, Any], Optional[ContextPackingStats], Optional[float]]:
+    """
+    LLM answer (single-flight per user, question and note versions), packing stats and packing time (ms)
+    
+    If the answer is not ready within the deadline (or the LLM fails), the notes-only
+    answer is returned without stats and the reason is recorded on the deadline.
+    """
+    remaining_ms = deadline.remaining_ms()
+    if results and remaining_ms < get_settings().query_answer_min_ms:
+        deadline.degrade("answer_skipped")
+        return _NO_ANSWER, None, None
+    try:
+        return await asyncio.wait_for(
+            answer_flight.run(
+                (user_id, normalize_query(query), tuple(versions.items())),
+                _agenerate_answer, db, user_id, query, query_embedding, versions, results, deadline, lexical
+            ),
+            remaining_ms / 1000
+        )
+    except asyncio.TimeoutError:
+        logger.warning(f"LLM answer not ready within the {deadline.budget_ms:.0f} ms deadline, returning notes only")
+        deadline.degrade("answer_timeout")
+    except LLMReasoningError as e:
+        logger.warning(f"{e.message}; returning notes only")
+        deadline.degrade("answer_failed")
+    return _NO_ANSWER, None, None
+
+async def _agenerate_answer(
+    db: Session,
+    user_id: str,
+    query: str,
+    query_embedding: Optional[List[float]],
+    versions: NoteVersions,
+    results: List[Tuple[Note, float, List[str]]],
+    deadline: Deadline,
+    lexical: bool = False
+) -> Tuple[Dict[str, Any], ContextPackingStats, float]:
+    # Notes for the LLM: best-matching passages, fitted under the prompt token ceiling
+    retrieved_notes_data, context_stats, packing_ms = await _pack_context(db, query, results, lexical)
+    
+    llm_response = await groq_scheduler.run(
+        user_id,
+        llm_service.areason_over_notes,
+        query=query,
+        retrieved_notes=retrieved_notes_data,
+        deadline=deadline
+    )
+    _store_answer(user_id, query, query_embedding, versions, llm_response)
+    return llm_response, context_stats, packing_ms
+
+async def _pack_context(
+    db: Session,
+    query: str,
+    results: List[Tuple[Note, float, List[str]]],
+    lexical: bool = False
+) -> Tuple[List[Dict[str, Any]], ContextPackingStats, float]:
+    """Note dicts for the LLM fitted under LLM_CONTEXT_MAX_TOKENS, packing stats and packing time (ms)"""
+    started = time.time()
+    settings = get_settings()
+    summaries: Dict[Any, str] = {}
+    if settings.note_summaries_enabled and settings.llm_note_context != "content":
+        summaries = await database_bulkhead.run_sync(summary_pipeline.lookup, db, [note for note, _, _ in results])
+    notes, stats = await embedding_bulkhead.run_sync(context_packer.pack, query, _notes_for_llm(results, summaries, lexical))
+    return notes, ContextPackingStats(**asdict(stats), notes_summarized=len(summaries)), _ms(started, time.time())
+
+def _sse(event: str, payload: Union[BaseModel, Dict[str, Any]]) -> str:
+    """One Server-Sent Events message"""
+    data = payload.model_dump_json() if isinstance(payload, BaseModel) else json.dumps(payload)
+    return f"event: {event}\ndata: {data}\n\n"
+
 @router.post("/text", response_model=QueryResponse)
-def text_query(
+async def text_query(
     request: QueryRequest,
     user_id: str = Depends(get_user_id),  # Get user_id from Auth0 token
     db: Session = Depends(get_db)
@@ -25,72 +229,179 @@ def text_query(
     Enhanced text query with LLM reasoning (user's notes only)
     
     Pipeline:
-    1. Generate embedding for query
-    2. Search similar notes (user's notes only)
+    1. Generate embedding for query (skipped in lexical mode)
+    2. Search similar notes (user's notes only; semantic, hybrid or lexical)
     3. LLM synthesizes answer from notes
+    
+    The request runs under a deadline (QUERY_DEADLINE_MS or request.deadline_ms):
+    a slow query embedding falls back to lexical search, and an answer that is
+    not ready in time is replaced by a notes-only answer. `degradations` lists
+    what was cut short.
     """
     start_time = time.time()
+    deadline = _deadline(request.deadline_ms)
     
-    # 1. Generate embedding
-    query_embedding = embedding_service.generate_embedding(request.query)
-    
-    # 2. Search similar notes (filtered by user_id)
-    results = vector_service.search_similar_notes(
+    # 1-2. Embed the query and search similar notes (filtered by user_id)
+    results, query_embedding = await retrieval_service.aretrieve_with_embedding(
         db=db,
         user_id=user_id,  # Only search user's notes
-        query_embedding=query_embedding,
+        query=request.query,
         top_k=request.top_k,
-        similarity_threshold=request.min_similarity
+        similarity_threshold=request.min_similarity,
+        mode=request.mode,
+        rerank=request.rerank,
+        diversity=request.diversity,
+        filters=request.filters,
+        deadline=deadline
     )
     
-    # Format notes for LLM
-    retrieved_notes_data = [
-        {
-            "id": str(note.id),
-            "title": note.title,
-            "content": note.content,
-            "tags": note.tags,
-            "similarity_score": round(similarity, 3)
-        }
-        for note, similarity in results
-    ]
+    retrieved_at = time.time()
     
-    # 3. LLM reasoning
-    llm_response = llm_service.reason_over_notes(
-        query=request.query,
-        retrieved_notes=retrieved_notes_data
+    # 3. LLM reasoning, unless the same question over the same notes was answered recently
+    lexical = _lexical_only(request.mode, deadline)
+    versions = note_versions(note for note, _, _ in results)
+    query_embedding, llm_response = await _cached_answer(
+        user_id, request.query, request.mode, versions, deadline, query_embedding
     )
-    
-    # Determine confidence
-    if results and results[0][1] > 0.7:
-        confidence = "high"
-    elif results and results[0][1] > 0.5:
-        confidence = "medium"
-    else:
-        confidence = "low"
+    answer_cached = llm_response is not None
+    context_stats, packing_ms = None, None
+    if llm_response is None:
+        llm_response, context_stats, packing_ms = await _generate_answer(
+            db, user_id, request.query, query_embedding, versions, results, deadline, lexical
+        )
     
     # Format response
-    retrieved_notes = [
-        RetrievedNote(
-            id=note.id,  # type: ignore
-            title=note.title,  # type: ignore
-            content=note.content,  # type: ignore
-            tags=note.tags,  # type: ignore
-            similarity_score=round(similarity, 3),
-            created_at=note.created_at  # type: ignore
-        )
-        for note, similarity in results
-    ]
+    retrieved_notes = _retrieved_notes(results, lexical)
     
-    execution_time = (time.time() - start_time) * 1000
+    end_time = time.time()
     
     return QueryResponse(
         query=request.query,
         answer=llm_response["answer"],
-        confidence=confidence,
+        confidence=_confidence(results, lexical),
         retrieved_notes=retrieved_notes,
         cited_notes=[note.id for note in retrieved_notes if str(note.id) in llm_response["cited_notes"]],
-        execution_time_ms=round(execution_time, 2)
+        execution_time_ms=_ms(start_time, end_time),
+        timings=QueryTimings(
+            retrieval_ms=_ms(start_time, retrieved_at),
+            packing_ms=packing_ms,
+            generation_ms=_ms(retrieved_at, end_time),
+            total_ms=_ms(start_time, end_time),
+            context=context_stats
+        ),
+        answer_cached=answer_cached,
+        degradations=deadline.degradations
+    )
+
+@router.post("/text/stream")
+async def text_query_stream(
+    request: QueryRequest,
+    user_id: str = Depends(get_user_id),  # Get user_id from Auth0 token
+    db: Session = Depends(get_db)
+):
+    """
+    Text query with the answer streamed as Server-Sent Events
+    
+    Events:
+    - notes: the retrieved notes, sent as soon as retrieval finishes
+    - token: {"text": ...} answer fragments as the LLM produces them
+    - done: confidence, cited notes and the timing breakdown
+    - error: {"detail": ...} if generation fails midway
+    
+    Retrieval runs under the request deadline like /query/text; once tokens
+    flow, the answer is streamed to the end.
+    """
+    start_time = time.time()
+    deadline = _deadline(request.deadline_ms)
+    
+    # Retrieval runs before the response starts, so its errors keep their status codes
+    results, query_embedding = await retrieval_service.aretrieve_with_embedding(
+        db=db,
+        user_id=user_id,  # Only search user's notes
+        query=request.query,
+        top_k=request.top_k,
+        similarity_threshold=request.min_similarity,
+        mode=request.mode,
+        rerank=request.rerank,
+        diversity=request.diversity,
+        filters=request.filters,
+        deadline=deadline
+    )
+    retrieved_at = time.time()
+    
+    # Everything the stream needs is copied out of the ORM objects now
+    lexical = _lexical_only(request.mode, deadline)
+    retrieved_notes = _retrieved_notes(results, lexical)
+    confidence = _confidence(results, lexical)
+    versions = note_versions(note for note, _, _ in results)
+    query_embedding, cached = await _cached_answer(
+        user_id, request.query, request.mode, versions, deadline, query_embedding
+    )
+    retrieved_notes_data: List[Dict[str, Any]] = []
+    context_stats, packing_ms = None, None
+    if cached is None:
+        # Reject now with 429/503 if the user's share of the LLM is exhausted; the call itself starts with the stream
+        groq_scheduler.check(user_id)
+        retrieved_notes_data, context_stats, packing_ms = await _pack_context(db, request.query, results, lexical)
+    
+    async def answer_fragments() -> AsyncIterator[str]:
+        if cached is not None:
+            yield cached["answer"]
+            return
+        async for text in groq_scheduler.stream(
+            user_id,
+            llm_service.astream_answer,
+            query=request.query,
+            retrieved_notes=retrieved_notes_data
+        ):
+            yield text
+    
+    async def events() -> AsyncIterator[str]:
+        yield _sse("notes", QueryStreamNotes(query=request.query, retrieved_notes=retrieved_notes))
+        
+        answer: List[str] = []
+        first_token_at: Optional[float] = None
+        try:
+            async for text in answer_fragments():
+                if first_token_at is None:
+                    first_token_at = time.time()
+                answer.append(text)
+                yield _sse("token", {"text": text})
+        except Exception as e:
+            logger.error(f"Streaming query failed: {str(e)}")
+            yield _sse("error", {"detail": str(e)})
+            return
+        
+        end_time = time.time()
+        if cached is not None:
+            cited = cached["cited_notes"]
+        else:
+            full_answer = "".join(answer).strip()
+            cited = llm_service.cited_notes(full_answer, retrieved_notes_data)
+            _store_answer(
+                user_id, request.query, query_embedding, versions, {"answer": full_answer, "cited_notes": cited}
+            )
+        yield _sse("done", QueryStreamDone(
+            confidence=confidence,
+            cited_notes=[note.id for note in retrieved_notes if str(note.id) in cited],
+            execution_time_ms=_ms(start_time, end_time),
+            timings=QueryTimings(
+                retrieval_ms=_ms(start_time, retrieved_at),
+                packing_ms=packing_ms,
+                first_token_ms=_ms(start_time, first_token_at) if first_token_at else None,
+                generation_ms=_ms(retrieved_at, end_time),
+                total_ms=_ms(start_time, end_time),
+                context=context_stats
+            ),
+            answer_cached=cached is not None,
+            degradations=deadline.degradations
+        ))
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # No caching, and no response buffering by reverse proxies (nginx)
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 @router.post("/voice", response_model=QueryResponse)
@@ -110,60 +421,58 @@ async def voice_query(
     2. Generate embedding
     3. Search similar notes (user's notes only)
     4. LLM synthesizes answer
+    
+    Same deadline and degradations as /query/text, counted from the upload.
     """
     start_time = time.time()
+    deadline = _deadline()
     
     # 1. Transcribe
-    transcribed_text = voice_service.transcribe_audio(audio, language=language)
+    transcribed_text = await groq_scheduler.run(user_id, voice_service.atranscribe_audio, audio, language=language)
+    transcribed_at = time.time()
     
     # 2-4. Use same pipeline as text query
-    query_embedding = embedding_service.generate_embedding(transcribed_text)
-    
-    results = vector_service.search_similar_notes(
+    results, query_embedding = await retrieval_service.aretrieve_with_embedding(
         db=db,
         user_id=user_id,  # Only search user's notes
-        query_embedding=query_embedding,
+        query=transcribed_text,
         top_k=top_k,
-        similarity_threshold=min_similarity
+        similarity_threshold=min_similarity,
+        deadline=deadline
     )
+    retrieved_at = time.time()
     
-    retrieved_notes_data = [
-        {
-            "id": str(note.id),
-            "title": note.title,
-            "content": note.content,
-            "tags": note.tags,
-            "similarity_score": round(similarity, 3)
-        }
-        for note, similarity in results
-    ]
-    
-    llm_response = llm_service.reason_over_notes(
-        query=transcribed_text,
-        retrieved_notes=retrieved_notes_data
+    lexical = _lexical_only("semantic", deadline)
+    versions = note_versions(note for note, _, _ in results)
+    query_embedding, llm_response = await _cached_answer(
+        user_id, transcribed_text, "semantic", versions, deadline, query_embedding
     )
-    
-    confidence = "high" if results and results[0][1] > 0.7 else "medium" if results and results[0][1] > 0.5 else "low"
-    
-    retrieved_notes = [
-        RetrievedNote(
-            id=note.id,  # type: ignore
-            title=note.title,  # type: ignore
-            content=note.content,  # type: ignore
-            tags=note.tags,  # type: ignore
-            similarity_score=round(similarity, 3),
-            created_at=note.created_at  # type: ignore
+    answer_cached = llm_response is not None
+    context_stats, packing_ms = None, None
+    if llm_response is None:
+        llm_response, context_stats, packing_ms = await _generate_answer(
+            db, user_id, transcribed_text, query_embedding, versions, results, deadline, lexical
         )
-        for note, similarity in results
-    ]
     
-    execution_time = (time.time() - start_time) * 1000
+    retrieved_notes = _retrieved_notes(results, lexical)
+    
+    end_time = time.time()
     
     return QueryResponse(
         query=transcribed_text,
         answer=llm_response["answer"],
-        confidence=confidence,
+        confidence=_confidence(results, lexical),
         retrieved_notes=retrieved_notes,
         cited_notes=[note.id for note in retrieved_notes if str(note.id) in llm_response["cited_notes"]],
-        execution_time_ms=round(execution_time, 2)
+        execution_time_ms=_ms(start_time, end_time),
+        timings=QueryTimings(
+            transcription_ms=_ms(start_time, transcribed_at),
+            retrieval_ms=_ms(transcribed_at, retrieved_at),
+            packing_ms=packing_ms,
+            generation_ms=_ms(retrieved_at, end_time),
+            total_ms=_ms(start_time, end_time),
+            context=context_stats
+        ),
+        answer_cached=answer_cached,
+        degradations=deadline.degradations
     )
\ No newline at end of file
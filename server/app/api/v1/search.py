@@ -1,19 +1,55 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
+from typing import List
 
 from app.core.database import get_db
 from app.core.auth import get_user_id  
-from app.services.embedding_service import embedding_service
-from app.services.vector_service import vector_service
-from app.schemas.search import SearchRequest, SearchResultItem, SearchResponse
+from app.models.note import Note, PREVIEW_CHARS
+from app.services.retrieval_service import retrieval_service
+from app.schemas.search import (
+    BatchSearchRequest,
+    BatchSearchResponse,
+    SearchRequest,
+    SearchResultItem,
+    SearchResponse,
+)
+from app.utils.helpers import make_snippet
 
 router = APIRouter(
     prefix="/search",
     tags=["search"],
 )
 
+
+def to_result_item(
+    note: Note,
+    score: float,
+    passages: List[str],
+    preview: bool,
+    lexical: bool = False
+) -> SearchResultItem:
+    """
+    Full result, or a preview whose snippet is the best matching passage when there is one
+    (lexical: score is a text rank, reported as text_rank instead of similarity_score)
+    """
+    if preview:
+        content = None
+        snippet = make_snippet(passages[0] if passages else note.content_preview, PREVIEW_CHARS)  # type: ignore
+    else:
+        content, snippet = note.content, None
+    return SearchResultItem(
+        id=note.id,            # type: ignore
+        title=note.title,      # type: ignore
+        content=content,       # type: ignore
+        snippet=snippet,
+        tags=note.tags,        # type: ignore
+        similarity_score=None if lexical else round(score, 3),
+        text_rank=round(score, 3) if lexical else None,
+        created_at=note.created_at  # type: ignore
+    )
+
 @router.post("/", response_model=SearchResponse)
-def search_notes(
+async def search_notes(
     search_req: SearchRequest,
     user_id: str = Depends(get_user_id),  # Get user_id from Auth0 token
     db: Session = Depends(get_db)
@@ -21,35 +57,64 @@ def search_notes(
     """
     Semantic search over user's notes using text query
     
-    Returns notes ranked by similarity to the query
+    Returns notes ranked by similarity to the query (or, in hybrid mode,
+    by reciprocal rank fusion of semantic and keyword matches)
     """
-    # Generate embedding for query
-    query_embedding = embedding_service.generate_embedding(search_req.query)
-    
-    # Search for similar notes (only user's notes)
-    results = vector_service.search_similar_notes(
+    # Retrieve notes (only user's notes); lexical mode skips the embedding call
+    results = await retrieval_service.aretrieve(
         db=db,
         user_id=user_id,  # Pass user_id to filter results
-        query_embedding=query_embedding,
+        query=search_req.query,
         top_k=search_req.top_k,
-        similarity_threshold=search_req.min_similarity
+        similarity_threshold=search_req.min_similarity,
+        mode=search_req.mode,
+        preview=search_req.preview,
+        rerank=search_req.rerank,
+        diversity=search_req.diversity,
+        filters=search_req.filters
     )
     
     # Format results
     search_results = [
-        SearchResultItem(
-            id=note.id,            # type: ignore
-            title=note.title,      # type: ignore
-            content=note.content,  # type: ignore
-            tags=note.tags,        # type: ignore
-            similarity_score=round(similarity, 3),
-            created_at=note.created_at  # type: ignore
-        )
-        for note, similarity in results
+        to_result_item(note, score, passages, search_req.preview, lexical=search_req.mode == "lexical")
+        for note, score, passages in results
     ]
     
     return SearchResponse(
         query=search_req.query,
         results=search_results,
         total_results=len(search_results)
-    )
\ No newline at end of file
+    )
+
+@router.post("/batch", response_model=BatchSearchResponse)
+async def batch_search_notes(
+    batch_req: BatchSearchRequest,
+    user_id: str = Depends(get_user_id),  # Get user_id from Auth0 token
+    db: Session = Depends(get_db)
+):
+    """
+    Semantic search for several queries at once
+    
+    Each query is searched like /search in semantic mode (no rerank or
+    diversity) and shares its result cache; the uncached queries are embedded
+    in one batched call and searched in one statement. Results are grouped
+    per query, in request order
+    """
+    grouped_results = await retrieval_service.aretrieve_batch(
+        db=db,
+        user_id=user_id,
+        queries=batch_req.queries,
+        top_k=batch_req.top_k,
+        similarity_threshold=batch_req.min_similarity,
+        preview=batch_req.preview
+    )
+    
+    responses = []
+    for query, results in zip(batch_req.queries, grouped_results):
+        search_results = [
+            to_result_item(note, similarity, passages, batch_req.preview)
+            for note, similarity, passages in results
+        ]
+        responses.append(SearchResponse(query=query, results=search_results, total_results=len(search_results)))
+    
+    return BatchSearchResponse(results=responses)
@@ -3,6 +3,9 @@ from sqlalchemy.orm import Session
 from typing import Optional
 from app.core.database import get_db
 from app.core.auth import get_user_id  # Add this import
+from app.core.bulkhead import embedding_bulkhead, database_bulkhead
+from app.core.scheduler import groq_scheduler
+from app.utils.exceptions import BulkheadFullError, UserQueueFullError
 from app.services.voice_service import voice_service
 from app.services.embedding_service import embedding_service
 from app.services.vector_service import vector_service
@@ -23,7 +26,7 @@ async def transcribe_audio(
     Upload an audio file and get back the transcribed text
     """
     try:
-        transcribed_text = voice_service.transcribe_audio(audio, language=language)
+        transcribed_text = await groq_scheduler.run(user_id, voice_service.atranscribe_audio, audio, language=language)
         
         if not transcribed_text:
             raise HTTPException(
@@ -36,6 +39,8 @@ async def transcribe_audio(
             language=language
         )
     
+    except (HTTPException, BulkheadFullError, UserQueueFullError):
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -65,7 +70,7 @@ async def voice_search_query(
     """
     try:
         # 1. Transcribe audio
-        transcribed_text = voice_service.transcribe_audio(audio, language=language)
+        transcribed_text = await groq_scheduler.run(user_id, voice_service.atranscribe_audio, audio, language=language)
         
         if not transcribed_text:
             raise HTTPException(
@@ -74,10 +79,11 @@ async def voice_search_query(
             )
         
         # 2. Generate embedding for query
-        query_embedding = embedding_service.generate_embedding(transcribed_text)
+        query_embedding = await embedding_bulkhead.run(embedding_service.agenerate_embedding, transcribed_text)
         
         # 3. Search similar notes (filtered by user_id)
-        results = vector_service.search_similar_notes(
+        results = await database_bulkhead.run_sync(
+            vector_service.search_similar_notes,
             db=db,
             user_id=user_id,  # Now defined via dependency
             query_embedding=query_embedding,
@@ -105,6 +111,8 @@ async def voice_search_query(
             total_results=len(search_results)
         )
     
+    except (HTTPException, BulkheadFullError, UserQueueFullError):
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+from app.core.metrics import metrics
+from app.core.settings import get_settings
+from app.utils.exceptions import BulkheadFullError
+from app.utils.logger import logger
+
+T = TypeVar("T")
+
+
+class Bulkhead:
+    """
+    Bounded concurrency compartment for one external dependency
+
+    - Blocking calls run on the bulkhead's own thread pool (run_sync), so a
+      slow provider can only exhaust its own workers, never the event loop
+      or the shared AnyIO threadpool.
+    - Async calls are limited by a semaphore of the same size (run).
+    - At most max_concurrent + max_queue calls may be admitted at once;
+      anything beyond that is rejected immediately with BulkheadFullError.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int):
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._admitted = 0
+        self._lock = threading.Lock()
+
+        self.rejected = metrics.counter(f"bulkhead_{name}_rejected", f"Calls rejected by the {name} bulkhead")
+        self.queue_wait = metrics.histogram(
+            f"bulkhead_{name}_queue_wait_ms",
+            buckets=[1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000],
+            description=f"Time spent waiting for a {name} slot (ms)",
+        )
+
+    @property
+    def capacity(self) -> int:
+        return self.max_concurrent + self.max_queue
+
+    @property
+    def in_flight(self) -> int:
+        return self._admitted
+
+    def _admit(self) -> None:
+        with self._lock:
+            if self._admitted >= self.capacity:
+                self.rejected.inc()
+                logger.warning(f"Bulkhead '{self.name}' saturated ({self._admitted}/{self.capacity}), rejecting call")
+                raise BulkheadFullError(
+                    f"{self.name} is at capacity, please retry shortly",
+                    details={"bulkhead": self.name, "capacity": self.capacity},
+                )
+            self._admitted += 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self._admitted -= 1
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_concurrent,
+                        thread_name_prefix=f"bulkhead-{self.name}",
+                    )
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def run_sync(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run a blocking callable on this bulkhead's dedicated threads"""
+        self._admit()
+        queued_at = time.perf_counter()
+
+        def timed_call() -> T:
+            self.queue_wait.observe((time.perf_counter() - queued_at) * 1000)
+            return fn(*args, **kwargs)
+
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), timed_call)
+        finally:
+            self._release()
+
+    async def run(self, fn: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> T:
+        """Await a coroutine function with bounded concurrency"""
+        self._admit()
+        queued_at = time.perf_counter()
+        try:
+            async with self._get_semaphore():
+                self.queue_wait.observe((time.perf_counter() - queued_at) * 1000)
+                return await fn(*args, **kwargs)
+        finally:
+            self._release()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def _build_bulkheads():
+    settings = get_settings()
+    return (
+        Bulkhead("embedding", settings.bulkhead_embedding_max_concurrent, settings.bulkhead_embedding_max_queue),
+        Bulkhead("database", settings.bulkhead_database_max_concurrent, settings.bulkhead_database_max_queue),
+    )
+
+
+# One bulkhead per external dependency (Groq calls go through app.core.scheduler.groq_scheduler)
+embedding_bulkhead, database_bulkhead = _build_bulkheads()
+
+
+def shutdown_bulkheads() -> None:
+    for bulkhead in (embedding_bulkhead, database_bulkhead):
+        bulkhead.shutdown()
@@ -0,0 +1,38 @@
+import time
+from typing import List, Optional
+from app.core.metrics import metrics
+
+_degraded = metrics.counter("query_degradations", "Pipeline stages cut short or substituted to meet a request deadline")
+
+
+class Deadline:
+    """
+    Time budget of one request, handed to each pipeline stage
+
+    Stages size their own timeouts with remaining_ms() and, when they fall
+    back to a cheaper result instead of failing, record why with degrade()
+    so the response can report it.
+    """
+
+    def __init__(self, budget_ms: float):
+        self.budget_ms = budget_ms
+        self.expires_at = time.monotonic() + budget_ms / 1000
+        self.degradations: List[str] = []
+
+    def remaining_ms(self, cap: Optional[float] = None) -> float:
+        """Milliseconds left (never negative), at most cap"""
+        remaining = max(0.0, (self.expires_at - time.monotonic()) * 1000)
+        return remaining if cap is None else min(remaining, cap)
+
+    def remaining(self) -> float:
+        """Seconds left (never negative), for asyncio/httpx timeouts"""
+        return self.remaining_ms() / 1000
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def degrade(self, *reasons: str) -> None:
+        for reason in reasons:
+            if reason not in self.degradations:
+                self.degradations.append(reason)
+                _degraded.inc()
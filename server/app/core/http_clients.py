@@ -0,0 +1,97 @@
+import threading
+from typing import Dict
+import httpx
+from app.core.settings import get_settings
+from app.utils.logger import logger
+
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the optional `h2` package (httpx[http2])"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class HTTPClientPool:
+    """
+    Shared, pooled HTTP clients per external provider
+
+    Every service talking to the same provider reuses one sync and one async
+    client, so keep-alive connections (and HTTP/2 streams when available)
+    are shared instead of each SDK instance opening its own pool.
+    """
+
+    def __init__(self):
+        self._sync: Dict[str, httpx.Client] = {}
+        self._async: Dict[str, httpx.AsyncClient] = {}
+        self._lock = threading.Lock()
+
+    def _options(self, provider: str) -> dict:
+        settings = get_settings()
+        max_connections = {
+            "hf": settings.http_hf_max_connections,
+            "groq": settings.http_groq_max_connections,
+        }.get(provider, settings.http_default_max_connections)
+
+        http2 = settings.http2_enabled and _http2_available()
+        return {
+            "limits": httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=settings.http_keepalive_expiry,
+            ),
+            "timeout": httpx.Timeout(
+                settings.http_timeout,
+                connect=settings.http_connect_timeout,
+            ),
+            "http2": http2,
+        }
+
+    def get_sync(self, provider: str) -> httpx.Client:
+        client = self._sync.get(provider)
+        if client is None:
+            with self._lock:
+                client = self._sync.get(provider)
+                if client is None:
+                    options = self._options(provider)
+                    client = httpx.Client(**options)
+                    self._sync[provider] = client
+                    logger.info(
+                        f"Created pooled HTTP client for {provider} "
+                        f"(max_connections={options['limits'].max_connections}, http2={options['http2']})"
+                    )
+        return client
+
+    def get_async(self, provider: str) -> httpx.AsyncClient:
+        client = self._async.get(provider)
+        if client is None:
+            with self._lock:
+                client = self._async.get(provider)
+                if client is None:
+                    options = self._options(provider)
+                    client = httpx.AsyncClient(**options)
+                    self._async[provider] = client
+                    logger.info(
+                        f"Created pooled async HTTP client for {provider} "
+                        f"(max_connections={options['limits'].max_connections}, http2={options['http2']})"
+                    )
+        return client
+
+    async def aclose(self) -> None:
+        """Close all pooled clients (application shutdown)"""
+        with self._lock:
+            sync_clients = list(self._sync.values())
+            async_clients = list(self._async.values())
+            self._sync.clear()
+            self._async.clear()
+
+        for client in sync_clients:
+            client.close()
+        for client in async_clients:
+            await client.aclose()
+
+
+# Shared pool instance
+http_clients = HTTPClientPool()
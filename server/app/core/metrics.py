@@ -0,0 +1,126 @@
+import bisect
+import threading
+from typing import Callable, Dict, List, Optional, Sequence
+
+
+class Counter:
+    """Monotonically increasing counter"""
+
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+    def snapshot(self) -> Dict:
+        return {"type": "counter", "description": self.description, "value": self._value}
+
+
+class Gauge:
+    """Value computed on read (e.g. a ratio of two counters)"""
+
+    def __init__(self, name: str, read: Callable[[], float], description: str = ""):
+        self.name = name
+        self.description = description
+        self._read = read
+
+    @property
+    def value(self) -> float:
+        return self._read()
+
+    def snapshot(self) -> Dict:
+        return {"type": "gauge", "description": self.description, "value": self._read()}
+
+
+class Histogram:
+    """Fixed-bucket histogram (cumulative buckets, Prometheus style)"""
+
+    def __init__(self, name: str, buckets: Sequence[float], description: str = ""):
+        self.name = name
+        self.description = description
+        self.buckets: List[float] = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+
+        cumulative: Dict[str, int] = {}
+        running = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            running += bucket_count
+            cumulative[str(bound)] = running
+        cumulative["+Inf"] = count
+
+        return {
+            "type": "histogram",
+            "description": self.description,
+            "count": count,
+            "sum": round(total, 3),
+            "mean": round(total / count, 3) if count else None,
+            "buckets": cumulative,
+        }
+
+
+class MetricsRegistry:
+    """Process-local registry of counters, gauges and histograms"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, description: str = "") -> Counter:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = Counter(name, description)
+                self._metrics[name] = metric
+            return metric  # type: ignore
+
+    def gauge(self, name: str, read: Callable[[], float], description: str = "") -> Gauge:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = Gauge(name, read, description)
+                self._metrics[name] = metric
+            return metric  # type: ignore
+
+    def histogram(self, name: str, buckets: Sequence[float], description: str = "") -> Histogram:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = Histogram(name, buckets, description)
+                self._metrics[name] = metric
+            return metric  # type: ignore
+
+    def snapshot(self, prefix: Optional[str] = None) -> Dict[str, Dict]:
+        with self._lock:
+            items = list(self._metrics.items())
+        return {
+            name: metric.snapshot()  # type: ignore
+            for name, metric in sorted(items)
+            if prefix is None or name.startswith(prefix)
+        }
+
+
+# Global registry
+metrics = MetricsRegistry()
@@ -0,0 +1,254 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, TypeVar
+from app.core.metrics import metrics
+from app.core.settings import get_settings
+from app.utils.exceptions import BulkheadFullError, UserQueueFullError
+from app.utils.logger import logger
+
+T = TypeVar("T")
+
+# Service time assumed until calls have been measured (ms), and the weight of each new measurement
+_INITIAL_SERVICE_MS = 2000.0
+_SERVICE_SMOOTHING = 0.2
+
+# Scheduler tenant of the background note summary worker (NOTE_SUMMARY_SCHEDULER_WEIGHT)
+SUMMARY_TENANT = "background:note-summaries"
+
+
+@dataclass(order=True)
+class _Waiter:
+    start: float
+    seq: int
+    user_id: str = field(compare=False)
+    future: "asyncio.Future[None]" = field(compare=False)
+
+
+class FairScheduler:
+    """
+    Per-user fair-share admission for one provider
+
+    At most max_concurrent calls run at once. Calls beyond that wait in
+    per-user queues served by start-time fair queuing: each call is tagged
+    with max(virtual time, the user's previous finish tag) and the lowest tag
+    runs next, so a user with many calls in flight waits behind users with
+    few, in proportion to SCHEDULER_USER_WEIGHTS (default 1).
+
+    Calls are rejected up front rather than left to wait:
+    - UserQueueFullError (429) when the user already has max_queue_per_user
+      calls waiting, or has calls waiting and the new one could not start
+      within queue_timeout_ms;
+    - BulkheadFullError (503) when the shared queue is full, the call could
+      not start within queue_timeout_ms, or it is still waiting at that deadline.
+    Both carry a Retry-After estimate (details["retry_after"], seconds).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrent: int,
+        max_queue: int,
+        max_queue_per_user: int,
+        queue_timeout_ms: float,
+        weights: Optional[Dict[str, float]] = None
+    ):
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.max_queue_per_user = max(1, max_queue_per_user)
+        self.queue_timeout_ms = queue_timeout_ms
+        # Default weights of non-user tenants; SCHEDULER_USER_WEIGHTS takes precedence
+        self.weights = dict(weights or {})
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._service_ms = _INITIAL_SERVICE_MS
+        self._reset()
+
+        self.rejected_user = metrics.counter(
+            f"scheduler_{name}_rejected_user", f"{name} calls rejected because the user's queue was full (429)"
+        )
+        self.rejected_capacity = metrics.counter(
+            f"scheduler_{name}_rejected_capacity", f"{name} calls rejected because the shared queue was full (503)"
+        )
+        self.timeouts = metrics.counter(
+            f"scheduler_{name}_queue_timeouts", f"{name} calls that reached their queue deadline (503)"
+        )
+        self.queue_wait = metrics.histogram(
+            f"scheduler_{name}_queue_wait_ms",
+            buckets=[1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000, 10000],
+            description=f"Time spent waiting for a {name} slot (ms)",
+        )
+        metrics.gauge(f"scheduler_{name}_queued", lambda: len(self._queue), f"{name} calls waiting for a slot")
+
+    def _reset(self) -> None:
+        self._running = 0
+        self._queue: List[_Waiter] = []
+        self._queued_by_user: Dict[str, int] = {}
+        self._finish_tags: Dict[str, float] = {}
+        self._virtual_time = 0.0
+        self._seq = itertools.count()
+
+    def _bind_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Futures belong to one event loop; state left from another loop is void
+            self._loop = loop
+            self._reset()
+
+    def _weight(self, user_id: str) -> float:
+        weight = get_settings().scheduler_user_weights.get(user_id, self.weights.get(user_id, 1.0))
+        return max(weight, 1e-3)
+
+    def _start_tag(self, user_id: str) -> float:
+        return max(self._virtual_time, self._finish_tags.get(user_id, 0.0))
+
+    def _estimated_wait_ms(self, start: float) -> float:
+        ahead = sum(1 for waiter in self._queue if waiter.start <= start)
+        return (ahead + 1) * self._service_ms / self.max_concurrent
+
+    def _reject(self, user_id: str, reason: str, wait_ms: float) -> None:
+        retry_after = max(1, math.ceil(wait_ms / 1000))
+        details = {"scheduler": self.name, "retry_after": retry_after}
+        if self._queued_by_user.get(user_id, 0):
+            self.rejected_user.inc()
+            raise UserQueueFullError(f"Too many {self.name} requests in progress, please retry shortly", details)
+        self.rejected_capacity.inc()
+        logger.warning(f"Scheduler '{self.name}' rejecting call: {reason}")
+        raise BulkheadFullError(f"{self.name} is at capacity, please retry shortly", details)
+
+    def check(self, user_id: str) -> None:
+        """
+        Raise the rejection a call for this user would get right now, without admitting it
+        (for responses that only start the call once streaming begins)
+        """
+        self._bind_loop()
+        if self._running < self.max_concurrent and not self._queue:
+            return
+        wait_ms = self._estimated_wait_ms(self._start_tag(user_id))
+        if len(self._queue) >= self.max_queue:
+            self._reject(user_id, f"queue full ({len(self._queue)}/{self.max_queue})", wait_ms)
+        if self._queued_by_user.get(user_id, 0) >= self.max_queue_per_user:
+            self._reject(user_id, "user queue full", wait_ms)
+        if wait_ms > self.queue_timeout_ms:
+            self._reject(user_id, f"estimated wait {wait_ms:.0f} ms exceeds the queue deadline", wait_ms)
+
+    async def _acquire(self, user_id: str) -> None:
+        self._bind_loop()
+        start = self._start_tag(user_id)
+        if self._running < self.max_concurrent and not self._queue:
+            self._finish_tags[user_id] = start + 1.0 / self._weight(user_id)
+            self._running += 1
+            self._virtual_time = start
+            self.queue_wait.observe(0.0)
+            return
+
+        self.check(user_id)
+        previous = self._finish_tags.get(user_id)
+        finish = self._finish_tags[user_id] = start + 1.0 / self._weight(user_id)
+        waiter = _Waiter(start, next(self._seq), user_id, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._queue, waiter)
+        self._queued_by_user[user_id] = self._queued_by_user.get(user_id, 0) + 1
+        queued_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter.future, timeout=self.queue_timeout_ms / 1000)
+        except asyncio.TimeoutError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                return  # granted a slot right at the deadline
+            self._unclaim(user_id, finish, previous)
+            self.timeouts.inc()
+            raise BulkheadFullError(
+                f"{self.name} is at capacity, please retry shortly",
+                details={"scheduler": self.name, "retry_after": max(1, math.ceil(self._service_ms / 1000))},
+            )
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self._release()  # granted a slot just as the caller went away
+            else:
+                self._unclaim(user_id, finish, previous)
+            raise
+        finally:
+            self._forget(waiter)
+            self.queue_wait.observe((time.perf_counter() - queued_at) * 1000)
+
+    def _unclaim(self, user_id: str, finish: float, previous: Optional[float]) -> None:
+        """A waiter left without a slot: its share must not count against the user's next call"""
+        if self._finish_tags.get(user_id) != finish:
+            return  # a later call of the user already built on it, or the scheduler went idle
+        if previous is None:
+            self._finish_tags.pop(user_id, None)
+        else:
+            self._finish_tags[user_id] = previous
+
+    def _forget(self, waiter: _Waiter) -> None:
+        if waiter in self._queue:
+            self._queue.remove(waiter)
+            heapq.heapify(self._queue)
+        remaining = self._queued_by_user.get(waiter.user_id, 1) - 1
+        if remaining:
+            self._queued_by_user[waiter.user_id] = remaining
+        else:
+            self._queued_by_user.pop(waiter.user_id, None)
+
+    def _release(self) -> None:
+        self._running = max(0, self._running - 1)
+        while self._running < self.max_concurrent and self._queue:
+            waiter = heapq.heappop(self._queue)
+            if waiter.future.done():
+                continue  # timed out or cancelled
+            self._running += 1
+            self._virtual_time = waiter.start
+            waiter.future.set_result(None)
+        if not self._running and not self._queue:
+            # Idle: past usage no longer counts against anyone
+            self._finish_tags.clear()
+            self._virtual_time = 0.0
+
+    def _observe(self, started: float) -> None:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._service_ms += _SERVICE_SMOOTHING * (elapsed_ms - self._service_ms)
+
+    async def run(self, user_id: str, fn: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> T:
+        """Await a coroutine function in the user's fair share of the provider"""
+        await self._acquire(user_id)
+        started = time.perf_counter()
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            self._observe(started)
+            self._release()
+
+    async def stream(
+        self,
+        user_id: str,
+        fn: Callable[..., AsyncIterator[T]],
+        *args: Any,
+        **kwargs: Any
+    ) -> AsyncIterator[T]:
+        """Iterate an async generator, holding one of the user's slots until it is exhausted or closed"""
+        await self._acquire(user_id)
+        started = time.perf_counter()
+        try:
+            async for item in fn(*args, **kwargs):
+                yield item
+        finally:
+            self._observe(started)
+            self._release()
+
+
+def _build_groq_scheduler() -> FairScheduler:
+    settings = get_settings()
+    return FairScheduler(
+        "groq",
+        max_concurrent=settings.bulkhead_groq_max_concurrent,
+        max_queue=settings.bulkhead_groq_max_queue,
+        max_queue_per_user=settings.scheduler_max_queue_per_user,
+        queue_timeout_ms=settings.scheduler_queue_timeout_ms,
+        weights={SUMMARY_TENANT: settings.note_summary_scheduler_weight},
+    )
+
+
+# Shared by LLM completions, transcriptions and note summaries (one Groq account, one rate budget)
+groq_scheduler = _build_groq_scheduler()
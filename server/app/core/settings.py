@@ -1,5 +1,5 @@
 from functools import lru_cache
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -21,6 +21,142 @@ class Settings(BaseSettings):
     cors_allow_credentials: bool = Field(default=True, alias="CORS_ALLOW_CREDENTIALS")
     docs_enabled: Optional[bool] = Field(default=None, alias="DOCS_ENABLED")
 
+    # Embeddings
+    embedding_backend: str = Field(default="local", alias="EMBEDDING_BACKEND")
+    embedding_fallback_backend: Optional[str] = Field(default=None, alias="EMBEDDING_FALLBACK_BACKEND")
+    embedding_model: str = Field(default="sentence-transformers/all-MiniLM-L6-v2", alias="EMBEDDING_MODEL")
+    # Size of the vector columns, query casts and compact indexes (app.models.note.EMBEDDING_DIMENSIONS); fixed once migrated
+    embedding_dimensions: int = Field(default=384, alias="EMBEDDING_DIMENSIONS")
+    embedding_max_tokens: int = Field(default=256, alias="EMBEDDING_MAX_TOKENS")
+    embedding_request_timeout: float = Field(default=10.0, alias="EMBEDDING_REQUEST_TIMEOUT")
+    embedding_warmup: bool = Field(default=True, alias="EMBEDDING_WARMUP")
+    embedding_batching_enabled: bool = Field(default=True, alias="EMBEDDING_BATCHING_ENABLED")
+    embedding_batch_max_size: int = Field(default=32, alias="EMBEDDING_BATCH_MAX_SIZE")
+    embedding_batch_max_wait_ms: float = Field(default=5.0, alias="EMBEDDING_BATCH_MAX_WAIT_MS")
+    embedding_batch_workers: int = Field(default=2, alias="EMBEDDING_BATCH_WORKERS")
+    embedding_cache_enabled: bool = Field(default=True, alias="EMBEDDING_CACHE_ENABLED")
+    embedding_cache_memory_mb: float = Field(default=32.0, alias="EMBEDDING_CACHE_MEMORY_MB")
+    # Postgres tier of the embedding cache: worth it for a remote backend, off by default (local encodes are cheap)
+    embedding_cache_persistent: bool = Field(default=False, alias="EMBEDDING_CACHE_PERSISTENT")
+    embedding_cache_persistent_ttl_days: float = Field(default=30.0, alias="EMBEDDING_CACHE_PERSISTENT_TTL_DAYS")
+    embedding_cache_persistent_max_entries: int = Field(default=200000, alias="EMBEDDING_CACHE_PERSISTENT_MAX_ENTRIES")
+    embedding_cache_prune_interval_seconds: float = Field(default=3600.0, alias="EMBEDDING_CACHE_PRUNE_INTERVAL_SECONDS")
+    # "sync": embed before the note write commits; "async": commit first, embed in the background
+    embedding_write_mode: str = Field(default="sync", alias="EMBEDDING_WRITE_MODE")
+    embedding_worker_count: int = Field(default=2, alias="EMBEDDING_WORKER_COUNT")
+    embedding_worker_batch_size: int = Field(default=32, alias="EMBEDDING_WORKER_BATCH_SIZE")
+    embedding_worker_poll_interval: float = Field(default=2.0, alias="EMBEDDING_WORKER_POLL_INTERVAL")
+    embedding_job_lease_seconds: int = Field(default=120, alias="EMBEDDING_JOB_LEASE_SECONDS")
+    embedding_job_max_attempts: int = Field(default=6, alias="EMBEDDING_JOB_MAX_ATTEMPTS")
+    embedding_job_backoff_base: float = Field(default=2.0, alias="EMBEDDING_JOB_BACKOFF_BASE")
+    embedding_job_backoff_max: float = Field(default=600.0, alias="EMBEDDING_JOB_BACKOFF_MAX")
+    # How search treats notes whose embedding is pending: "exclude" or "wait" (embed them inline first)
+    pending_search_policy: str = Field(default="exclude", alias="PENDING_SEARCH_POLICY")
+    pending_search_wait_limit: int = Field(default=32, alias="PENDING_SEARCH_WAIT_LIMIT")
+    # Chunk-level embeddings for long notes
+    chunking_enabled: bool = Field(default=True, alias="CHUNKING_ENABLED")
+    chunk_max_tokens: int = Field(default=200, alias="CHUNK_MAX_TOKENS")
+    chunk_overlap_tokens: int = Field(default=32, alias="CHUNK_OVERLAP_TOKENS")
+    # Chunk hits fetched per requested note before grouping them back into notes
+    chunk_search_candidates: int = Field(default=4, alias="CHUNK_SEARCH_CANDIDATES")
+    chunk_passages_per_note: int = Field(default=2, alias="CHUNK_PASSAGES_PER_NOTE")
+    # Vector storage: "full", or search a quantized copy ("halfvec" / "binary") then rerank exactly
+    vector_storage_mode: str = Field(default="full", alias="VECTOR_STORAGE_MODE")
+    vector_rerank_factor: int = Field(default=8, alias="VECTOR_RERANK_FACTOR")
+    # ANN indexes (built by Alembic) and per-query search knobs
+    vector_index_type: str = Field(default="hnsw", alias="VECTOR_INDEX_TYPE")
+    vector_hnsw_m: int = Field(default=16, alias="VECTOR_HNSW_M")
+    vector_hnsw_ef_construction: int = Field(default=64, alias="VECTOR_HNSW_EF_CONSTRUCTION")
+    vector_hnsw_ef_search: int = Field(default=40, alias="VECTOR_HNSW_EF_SEARCH")
+    vector_ivfflat_probes: int = Field(default=10, alias="VECTOR_IVFFLAT_PROBES")
+    # Keep scanning the index until LIMIT rows pass the user filter (pgvector >= 0.8): "off", "relaxed_order", "strict_order"
+    vector_iterative_scan: str = Field(default="relaxed_order", alias="VECTOR_ITERATIVE_SCAN")
+    # Filtered searches matching at most this many rows skip the ANN index and scan them exactly
+    # (also the most filter matches the in-memory index is given; broader filters search Postgres)
+    vector_filter_exact_max_rows: int = Field(default=5000, alias="VECTOR_FILTER_EXACT_MAX_ROWS")
+    # In-process per-user vector index (exact search without a Postgres scan)
+    memory_index_enabled: bool = Field(default=False, alias="MEMORY_INDEX_ENABLED")
+    memory_index_memory_mb: float = Field(default=256.0, alias="MEMORY_INDEX_MEMORY_MB")
+    memory_index_max_rows_per_user: int = Field(default=50000, alias="MEMORY_INDEX_MAX_ROWS_PER_USER")
+    # Bounds staleness from writes handled by other worker processes
+    memory_index_ttl_seconds: float = Field(default=60.0, alias="MEMORY_INDEX_TTL_SECONDS")
+    # Hybrid search: candidates per mode (x top_k) and the reciprocal rank fusion constant
+    hybrid_candidates: int = Field(default=4, alias="HYBRID_CANDIDATES")
+    hybrid_rrf_k: int = Field(default=60, alias="HYBRID_RRF_K")
+    # Second-stage reranking of a wider candidate pool with a local cross-encoder
+    rerank_enabled: bool = Field(default=False, alias="RERANK_ENABLED")
+    reranker_model: str = Field(default="cross-encoder/ms-marco-MiniLM-L-6-v2", alias="RERANKER_MODEL")
+    reranker_max_tokens: int = Field(default=256, alias="RERANKER_MAX_TOKENS")
+    # Small batches keep the budget check (after each batch) close to RERANK_BUDGET_MS
+    reranker_batch_size: int = Field(default=4, alias="RERANKER_BATCH_SIZE")
+    # Candidates scored per requested result (x top_k)
+    rerank_candidates: int = Field(default=3, alias="RERANK_CANDIDATES")
+    # Past this budget the vector order is kept
+    rerank_budget_ms: float = Field(default=300.0, alias="RERANK_BUDGET_MS")
+    # LLM prompt ceiling (counted with the embedding model's tokenizer); long notes are cut to their most relevant sentences
+    llm_context_max_tokens: int = Field(default=3000, alias="LLM_CONTEXT_MAX_TOKENS")
+    llm_context_min_note_tokens: int = Field(default=48, alias="LLM_CONTEXT_MIN_NOTE_TOKENS")
+    # Time budget of a /query request; past it, stages degrade (lexical retrieval, notes without an answer)
+    query_deadline_ms: float = Field(default=10000.0, alias="QUERY_DEADLINE_MS")
+    query_embedding_budget_ms: float = Field(default=1500.0, alias="QUERY_EMBEDDING_BUDGET_MS")
+    # The LLM is not called (or retried) with less time than this left
+    query_answer_min_ms: float = Field(default=1000.0, alias="QUERY_ANSWER_MIN_MS")
+    # Candidates considered per requested result (x top_k) when diversity > 0
+    mmr_candidates: int = Field(default=3, alias="MMR_CANDIDATES")
+    # Precomputed related-notes lists (note_neighbors), maintained on every note write
+    note_neighbors_enabled: bool = Field(default=False, alias="NOTE_NEIGHBORS_ENABLED")
+    note_neighbors_count: int = Field(default=10, alias="NOTE_NEIGHBORS_COUNT")
+    # Precomputed per-note summaries (note_summaries), written by a background worker for long notes
+    note_summaries_enabled: bool = Field(default=False, alias="NOTE_SUMMARIES_ENABLED")
+    note_summary_min_chars: int = Field(default=800, alias="NOTE_SUMMARY_MIN_CHARS")
+    note_summary_max_tokens: int = Field(default=150, alias="NOTE_SUMMARY_MAX_TOKENS")
+    # Edits are left to settle this long before a note is (re)summarized
+    note_summary_settle_seconds: float = Field(default=60.0, alias="NOTE_SUMMARY_SETTLE_SECONDS")
+    note_summary_batch_size: int = Field(default=8, alias="NOTE_SUMMARY_BATCH_SIZE")
+    note_summary_poll_interval: float = Field(default=30.0, alias="NOTE_SUMMARY_POLL_INTERVAL")
+    note_summary_max_attempts: int = Field(default=3, alias="NOTE_SUMMARY_MAX_ATTEMPTS")
+    # Fair-share weight of the summary worker in the Groq scheduler (a user has 1): it yields to interactive calls
+    note_summary_scheduler_weight: float = Field(default=0.25, alias="NOTE_SUMMARY_SCHEDULER_WEIGHT")
+    # What the LLM prompt gets for a note with a current summary: "content" (full text or matched passages),
+    # "summary", or "summary_passage" (summary plus the best matched passage)
+    llm_note_context: str = Field(default="content", alias="LLM_NOTE_CONTEXT")
+    # Per-user search result cache; note writes in this process invalidate it, the TTL bounds other workers
+    search_cache_enabled: bool = Field(default=True, alias="SEARCH_CACHE_ENABLED")
+    search_cache_memory_mb: float = Field(default=32.0, alias="SEARCH_CACHE_MEMORY_MB")
+    search_cache_ttl_seconds: float = Field(default=30.0, alias="SEARCH_CACHE_TTL_SECONDS")
+    # Concurrent identical embedding/retrieval/LLM calls share one in-flight computation
+    single_flight_enabled: bool = Field(default=True, alias="SINGLE_FLIGHT_ENABLED")
+    # Per-user LLM answer cache for repeated questions, validated against the retrieved notes
+    answer_cache_enabled: bool = Field(default=True, alias="ANSWER_CACHE_ENABLED")
+    answer_cache_similarity: float = Field(default=0.95, alias="ANSWER_CACHE_SIMILARITY")
+    answer_cache_entries_per_user: int = Field(default=32, alias="ANSWER_CACHE_ENTRIES_PER_USER")
+    answer_cache_max_users: int = Field(default=1000, alias="ANSWER_CACHE_MAX_USERS")
+    answer_cache_ttl_seconds: float = Field(default=3600.0, alias="ANSWER_CACHE_TTL_SECONDS")
+    hf_inference_base_url: str = Field(default="https://router.huggingface.co/hf-inference", alias="HF_INFERENCE_BASE_URL")
+
+    # Outbound HTTP (shared provider connection pools)
+    http2_enabled: bool = Field(default=True, alias="HTTP2_ENABLED")
+    http_timeout: float = Field(default=30.0, alias="HTTP_TIMEOUT")
+    http_connect_timeout: float = Field(default=5.0, alias="HTTP_CONNECT_TIMEOUT")
+    http_keepalive_expiry: float = Field(default=60.0, alias="HTTP_KEEPALIVE_EXPIRY")
+    http_hf_max_connections: int = Field(default=20, alias="HTTP_HF_MAX_CONNECTIONS")
+    http_groq_max_connections: int = Field(default=40, alias="HTTP_GROQ_MAX_CONNECTIONS")
+    http_default_max_connections: int = Field(default=10, alias="HTTP_DEFAULT_MAX_CONNECTIONS")
+
+    # Bulkheads (per-dependency concurrency + queue limits)
+    bulkhead_groq_max_concurrent: int = Field(default=8, alias="BULKHEAD_GROQ_MAX_CONCURRENT")
+    bulkhead_groq_max_queue: int = Field(default=32, alias="BULKHEAD_GROQ_MAX_QUEUE")
+    bulkhead_embedding_max_concurrent: int = Field(default=16, alias="BULKHEAD_EMBEDDING_MAX_CONCURRENT")
+    bulkhead_embedding_max_queue: int = Field(default=64, alias="BULKHEAD_EMBEDDING_MAX_QUEUE")
+    bulkhead_database_max_concurrent: int = Field(default=20, alias="BULKHEAD_DATABASE_MAX_CONCURRENT")
+    bulkhead_database_max_queue: int = Field(default=80, alias="BULKHEAD_DATABASE_MAX_QUEUE")
+    bulkhead_retry_after_seconds: int = Field(default=2, alias="BULKHEAD_RETRY_AFTER_SECONDS")
+
+    # Fair-share scheduling of Groq calls (LLM, transcription) across users; global limits are BULKHEAD_GROQ_*
+    scheduler_max_queue_per_user: int = Field(default=4, alias="SCHEDULER_MAX_QUEUE_PER_USER")
+    scheduler_queue_timeout_ms: float = Field(default=10000.0, alias="SCHEDULER_QUEUE_TIMEOUT_MS")
+    scheduler_user_weights: Dict[str, float] = Field(default_factory=dict, alias="SCHEDULER_USER_WEIGHTS")
+
     @property
     def is_production(self) -> bool:
         return self.environment.lower() == "production"
@@ -0,0 +1,68 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+from app.core.metrics import metrics
+from app.core.settings import get_settings
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls into one in-flight computation
+
+    The first caller for a key (the leader) runs the call; callers arriving
+    with the same key while it is running wait for it and receive the same
+    result or exception. Nothing is cached: once the call finishes, the next
+    caller starts a new one. If the leader is cancelled (e.g. its client
+    disconnected), a waiting caller takes over and runs the call itself.
+
+    With `share`, waiting callers receive share(result) instead of the
+    leader's own result, e.g. a copy detached from the leader's session.
+    """
+
+    def __init__(self, name: str, share: Optional[Callable[[Any], Any]] = None):
+        self.name = name
+        self.share = share
+        self._calls: Dict[Hashable, "asyncio.Future[Any]"] = {}
+
+        self.leaders = metrics.counter(f"single_flight_{name}_calls", f"{name} computations started")
+        self.coalesced = metrics.counter(
+            f"single_flight_{name}_coalesced", f"{name} calls that joined an identical in-flight computation"
+        )
+
+    async def run(self, key: Hashable, fn: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> T:
+        """Await fn(*args, **kwargs), shared with concurrent callers using the same key"""
+        if not get_settings().single_flight_enabled:
+            return await fn(*args, **kwargs)
+        while True:
+            future = self._calls.get(key)
+            if future is None or future.get_loop() is not asyncio.get_running_loop():
+                break
+            self.coalesced.inc()
+            try:
+                # shield: a waiting caller being cancelled must not cancel the leader
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                task = asyncio.current_task()
+                if future.cancelled() and not (task is not None and task.cancelling()):
+                    continue  # the leader went away; run the call ourselves
+                raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        self.leaders.inc()
+        try:
+            result = await fn(*args, **kwargs)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved: nobody may be waiting
+            raise
+        else:
+            future.set_result(self.share(result) if self.share is not None else result)
+            return result
+        finally:
+            if self._calls.get(key) is future:
+                del self._calls[key]
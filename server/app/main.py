@@ -9,6 +9,13 @@ from contextlib import asynccontextmanager
 from app.core.database import check_db_health, ensure_pgvector_extension, engine, Base
 from app.api.v1 import api_router
 from app.core.settings import get_settings
+from app.services.embedding_service import embedding_service
+from app.services.embedding_pipeline import embedding_pipeline
+from app.services.summary_pipeline import summary_pipeline
+from app.services.reranker_service import reranker_service
+from app.core.http_clients import http_clients
+from app.core.bulkhead import shutdown_bulkheads
+from app.utils.exceptions import BulkheadFullError, UserQueueFullError
 
 settings = get_settings()
 
@@ -28,10 +35,34 @@ async def lifespan(app: FastAPI):
     # Create tables
     Base.metadata.create_all(bind=engine)
     logger.info("Database tables initialized")
+
+    # Load local embedding model weights before the first request
+    if settings.embedding_warmup:
+        try:
+            embedding_service.warmup()
+        except Exception:
+            logger.exception("Embedding backend warmup failed")
+        if settings.rerank_enabled:
+            try:
+                reranker_service.warmup()
+            except Exception:
+                logger.exception("Reranker warmup failed")
+
+    # Background embedding workers (EMBEDDING_WRITE_MODE=async)
+    if embedding_pipeline.enabled:
+        embedding_pipeline.start()
+    # Background note summaries (NOTE_SUMMARIES_ENABLED)
+    if summary_pipeline.enabled:
+        summary_pipeline.start()
     
     yield
     
     logger.info("Shutting down Mnemonic API...")
+    embedding_pipeline.stop()
+    summary_pipeline.stop()
+    embedding_service.shutdown()
+    await http_clients.aclose()
+    shutdown_bulkheads()
 
 
 docs_enabled = settings.resolved_docs_enabled
@@ -56,6 +87,26 @@ app.add_middleware(
 )
 
 
+@app.exception_handler(BulkheadFullError)
+async def bulkhead_full_handler(request: Request, exc: BulkheadFullError):
+    logger.warning(f"Rejected {request.method} {request.url.path}: {exc.message}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": exc.message},
+        headers={"Retry-After": str(exc.details.get("retry_after", settings.bulkhead_retry_after_seconds))}
+    )
+
+
+@app.exception_handler(UserQueueFullError)
+async def user_queue_full_handler(request: Request, exc: UserQueueFullError):
+    logger.info(f"Rate limited {request.method} {request.url.path}: {exc.message}")
+    return JSONResponse(
+        status_code=429,
+        content={"detail": exc.message},
+        headers={"Retry-After": str(exc.details.get("retry_after", settings.bulkhead_retry_after_seconds))}
+    )
+
+
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -1,3 +1,8 @@
 from app.models.note import Note
+from app.models.note_chunk import NoteChunk
+from app.models.note_neighbor import NoteNeighbor
+from app.models.note_summary import NoteSummary
+from app.models.embedding_cache import EmbeddingCacheEntry
+from app.models.embedding_job import EmbeddingJob
 
-__all__ = ["Note"]
\ No newline at end of file
+__all__ = ["Note", "NoteChunk", "NoteNeighbor", "NoteSummary", "EmbeddingCacheEntry", "EmbeddingJob"]
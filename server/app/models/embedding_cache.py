@@ -0,0 +1,29 @@
+from sqlalchemy import Column, String, DateTime
+from sqlalchemy.sql import func
+from pgvector.sqlalchemy import Vector
+from app.core.database import Base
+from app.models.note import EMBEDDING_DIMENSIONS
+
+
+class EmbeddingCacheEntry(Base):
+    """Persistent embedding cache, keyed by model + SHA-256 of the exact text"""
+    __tablename__ = "embedding_cache"
+
+    model = Column(String(255), primary_key=True)
+    text_hash = Column(String(64), primary_key=True)
+    embedding = Column(Vector(EMBEDDING_DIMENSIONS), nullable=False)
+    created_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now()
+    )
+    # Refreshed on reads (at most daily); entries unused for EMBEDDING_CACHE_PERSISTENT_TTL_DAYS are pruned
+    last_used_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+        index=True
+    )
+
+    def __repr__(self):
+        return f"<EmbeddingCacheEntry {self.model}:{self.text_hash[:12]}>"
@@ -0,0 +1,33 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, Text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class EmbeddingJob(Base):
+    """Durable queue entry: a note whose embedding must be (re)computed"""
+    __tablename__ = "embedding_jobs"
+
+    note_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("notes.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    attempts = Column(Integer, nullable=False, server_default="0")
+    # Earliest time a worker may claim the job (also used as the claim lease)
+    next_attempt_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+        index=True
+    )
+    # Bumped on every enqueue; a worker only completes the job version it claimed
+    enqueued_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now()
+    )
+    last_error = Column(Text, nullable=True)
+
+    def __repr__(self):
+        return f"<EmbeddingJob {self.note_id} attempts={self.attempts}>"
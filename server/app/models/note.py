@@ -1,20 +1,55 @@
-from sqlalchemy import Column, String, Text, DateTime, ARRAY
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Boolean, Column, Computed, Index, String, Text, DateTime, ARRAY, false, text
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
+from sqlalchemy.orm import column_property, defer, deferred, undefer
 from sqlalchemy.sql import func
 from pgvector.sqlalchemy import Vector
 import uuid
 from app.core.database import Base
+from app.core.settings import get_settings
+
+# Text search configuration of notes.search_vector (queries must use the same one)
+SEARCH_TEXT_CONFIG = "english"
+
+# Characters of content loaded for previews (list/search with preview=true)
+PREVIEW_CHARS = 280
+
+# Size of every embedding column, and of the vector casts in VectorService and the ANN index migration
+EMBEDDING_DIMENSIONS = get_settings().embedding_dimensions
 
 
 class Note(Base):
     __tablename__ = "notes"
+    __table_args__ = (
+        Index("ix_notes_search_vector", "search_vector", postgresql_using="gin"),
+        # Search filters: tag containment and per-user date ranges
+        Index("ix_notes_tags", "tags", postgresql_using="gin"),
+        Index("ix_notes_user_id_created_at", "user_id", "created_at"),
+        # Notes still matched on their note-level vector (no note_chunks yet); usually none
+        Index("ix_notes_unchunked", "user_id", postgresql_where=text("NOT chunked")),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(String, nullable=False, index=True)
     title = Column(String(255), nullable=False, index=True)
     content = Column(Text, nullable=False)
     tags = Column(ARRAY(String), nullable=False, server_default='{}')
-    embedding = Column(Vector(384), nullable=True)
+    # Only vector search / the embedding pipeline need the vector; loaded on access
+    embedding = deferred(Column(Vector(EMBEDDING_DIMENSIONS), nullable=True))
+    # "ready", "pending" (queued for the background embedding pipeline) or "failed"
+    embedding_status = Column(String(16), nullable=False, server_default="ready")
+    # Has note_chunks rows (set by ChunkService.apply): search matches it through its chunks
+    chunked = Column(Boolean, nullable=False, server_default=false())
+    # Full-text search document (title weighted above content), maintained by Postgres
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed(
+            f"setweight(to_tsvector('{SEARCH_TEXT_CONFIG}', coalesce(title, '')), 'A') || "
+            f"setweight(to_tsvector('{SEARCH_TEXT_CONFIG}', coalesce(content, '')), 'B')",
+            persisted=True
+        )
+    ))
+    # Leading slice of content computed in SQL; one extra char tells whether it was cut
+    content_preview = column_property(func.left(content, PREVIEW_CHARS + 1), deferred=True)
     created_at = Column(
         DateTime(timezone=True), 
         nullable=False, 
@@ -28,4 +63,8 @@ class Note(Base):
     )
     
     def __repr__(self):
-        return f"<Note {self.id}: {self.title[:30]}>"
\ No newline at end of file
+        return f"<Note {self.id}: {self.title[:30]}>"
+
+
+# Loader options for previews: the full body stays in Postgres
+PREVIEW_LOAD_OPTIONS = (defer(Note.content), undefer(Note.content_preview))
@@ -0,0 +1,33 @@
+from sqlalchemy import Column, ForeignKey, Integer, String, Text, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from pgvector.sqlalchemy import Vector
+import uuid
+from app.core.database import Base
+from app.models.note import EMBEDDING_DIMENSIONS
+
+
+class NoteChunk(Base):
+    """Token-bounded passage of a note with its own embedding"""
+    __tablename__ = "note_chunks"
+    __table_args__ = (
+        UniqueConstraint("note_id", "chunk_index", name="uq_note_chunks_note_id_chunk_index"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    note_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("notes.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True
+    )
+    # Denormalized so chunk search can filter by user without joining notes
+    user_id = Column(String, nullable=False, index=True)
+    chunk_index = Column(Integer, nullable=False)
+    content = Column(Text, nullable=False)
+    # SHA-256 of the embedded text; a chunk is only re-embedded when this changes
+    content_hash = Column(String(64), nullable=False)
+    token_count = Column(Integer, nullable=False)
+    embedding = Column(Vector(EMBEDDING_DIMENSIONS), nullable=True)
+
+    def __repr__(self):
+        return f"<NoteChunk {self.note_id}#{self.chunk_index}>"
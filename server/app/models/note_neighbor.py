@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Float, ForeignKey, Integer, String
+from sqlalchemy.dialects.postgresql import UUID
+from app.core.database import Base
+
+
+class NoteNeighbor(Base):
+    """Precomputed nearest neighbour of a note (rank 1 = most similar)"""
+    __tablename__ = "note_neighbors"
+
+    # (note_id, rank) primary key: a note's related list is one index range scan
+    note_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("notes.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    rank = Column(Integer, primary_key=True)
+    # Reverse lookup: whose lists mention a note that changed
+    neighbor_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("notes.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True
+    )
+    user_id = Column(String, nullable=False)
+    similarity = Column(Float, nullable=False)
+
+    def __repr__(self):
+        return f"<NoteNeighbor {self.note_id}#{self.rank} -> {self.neighbor_id}>"
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy.dialects.postgresql import UUID
+from app.core.database import Base
+
+
+class NoteSummary(Base):
+    """LLM-written digest of a note, sent in prompts in place of its full content"""
+    __tablename__ = "note_summaries"
+
+    note_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("notes.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    user_id = Column(String, nullable=False)
+    # SHA-256 of the summarized title and content; a summary is only used (and kept) while it matches the note
+    content_hash = Column(String(64), nullable=True)
+    summary = Column(Text, nullable=True)
+    # notes.updated_at when the worker last looked at the note; later edits make it a candidate again
+    checked_at = Column(DateTime(timezone=True), nullable=True)
+    # Consecutive failed summarizations of the current text
+    attempts = Column(Integer, nullable=False, server_default="0")
+
+    def __repr__(self):
+        return f"<NoteSummary {self.note_id}>"
@@ -2,6 +2,7 @@ from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional, Dict
 from datetime import datetime
 from uuid import UUID
+from app.schemas.search import SearchResultItem
 
 
 class NoteCreate(BaseModel):
@@ -19,11 +20,13 @@ class NoteUpdate(BaseModel):
 
 
 class NoteResponse(BaseModel):
-    """Note response"""
+    """Note response (previews carry a snippet instead of the content)"""
     id: UUID
     title: str
-    content: str
+    content: Optional[str] = None
+    snippet: Optional[str] = None
     tags: List[str]
+    embedding_status: str = "ready"
     created_at: datetime
     updated_at: datetime
     
@@ -38,6 +41,13 @@ class NoteListResponse(BaseModel):
     page_size: int
 
 
+class RelatedNotesResponse(BaseModel):
+    """Notes most similar to a given note"""
+    note_id: UUID
+    results: List[SearchResultItem]
+    total_results: int
+
+
 class NoteDeleteResponse(BaseModel):
     """Delete confirmation"""
     message: str
@@ -2,13 +2,25 @@ from pydantic import BaseModel, Field
 from typing import List, Optional
 from uuid import UUID
 from datetime import datetime
+from app.schemas.search import SearchFilters, SearchMode
 
 
 class QueryRequest(BaseModel):
     """Request for LLM-powered query"""
     query: str = Field(..., min_length=1, description="User's question")
     top_k: int = Field(5, ge=1, le=10, description="Number of notes to retrieve")
-    min_similarity: float = Field(0.3, ge=0.0, le=1.0, description="Minimum similarity")
+    min_similarity: float = Field(
+        0.3, ge=0.0, le=1.0, description="Minimum cosine similarity (keyword-only matches in lexical mode are not filtered)"
+    )
+    mode: SearchMode = Field("semantic", description="Retrieval mode: semantic, hybrid or lexical")
+    rerank: Optional[bool] = Field(None, description="Rerank candidates with the cross-encoder (default: RERANK_ENABLED)")
+    diversity: float = Field(
+        0.0, ge=0.0, le=1.0, description="0 ranks purely by relevance; higher values favour distinct notes (MMR)"
+    )
+    filters: Optional[SearchFilters] = Field(None, description="Tag and date restrictions, applied before ranking")
+    deadline_ms: Optional[int] = Field(
+        None, ge=500, le=60000, description="Time budget for this request (at most QUERY_DEADLINE_MS)"
+    )
     # include_follow_ups: bool = Field(True, description="Generate follow-up questions")
 
 
@@ -18,10 +30,34 @@ class RetrievedNote(BaseModel):
     title: str
     content: str
     tags: List[str]
-    similarity_score: float
+    similarity_score: Optional[float] = Field(None, description="Cosine similarity to the query; None for keyword-only matches")
+    text_rank: Optional[float] = Field(
+        None, description="Full-text rank normalized to 0-1, for keyword-only matches (not comparable with similarity_score)"
+    )
     created_at: datetime
 
 
+class ContextPackingStats(BaseModel):
+    """How the retrieved notes were fitted into the LLM prompt (tokens)"""
+    prompt_tokens: int
+    context_tokens: int
+    context_tokens_unpacked: int = Field(..., description="Note text before trimming to LLM_CONTEXT_MAX_TOKENS")
+    notes_trimmed: int
+    notes_dropped: int
+    notes_summarized: int = Field(0, description="Notes sent as their precomputed summary (LLM_NOTE_CONTEXT)")
+
+
+class QueryTimings(BaseModel):
+    """Where the time of a query went (ms)"""
+    transcription_ms: Optional[float] = None
+    retrieval_ms: float
+    packing_ms: Optional[float] = None
+    first_token_ms: Optional[float] = Field(None, description="Request start to the first streamed answer token")
+    generation_ms: float
+    total_ms: float
+    context: Optional[ContextPackingStats] = Field(None, description="Prompt packing statistics (absent when the answer was cached)")
+
+
 class QueryResponse(BaseModel):
     """Response with LLM-generated answer"""
     query: str
@@ -30,4 +66,26 @@ class QueryResponse(BaseModel):
     retrieved_notes: List[RetrievedNote]
     cited_notes: List[UUID]
     # follow_up_questions: Optional[List[str]] = None
-    execution_time_ms: float
\ No newline at end of file
+    execution_time_ms: float
+    timings: Optional[QueryTimings] = None
+    answer_cached: bool = Field(False, description="Answer reused from an equivalent earlier question over the same notes")
+    degradations: List[str] = Field(
+        default_factory=list,
+        description="Stages cut short to meet the deadline: lexical_fallback, rerank_skipped, answer_skipped, answer_timeout, answer_failed"
+    )
+
+
+class QueryStreamNotes(BaseModel):
+    """First event of /query/text/stream ("notes"), sent right after retrieval"""
+    query: str
+    retrieved_notes: List[RetrievedNote]
+
+
+class QueryStreamDone(BaseModel):
+    """Last event of /query/text/stream ("done"), sent after the final token"""
+    confidence: str
+    cited_notes: List[UUID]
+    execution_time_ms: float
+    timings: QueryTimings
+    answer_cached: bool = False
+    degradations: List[str] = Field(default_factory=list, description="Stages cut short to meet the deadline (as in QueryResponse)")
\ No newline at end of file
@@ -1,24 +1,53 @@
 from pydantic import BaseModel, Field
-from typing import List
+from typing import Annotated, List, Literal, Optional
 from uuid import UUID
 
 from datetime import datetime
 
 
+# "semantic": embeddings only, "lexical": full-text only (no embedding call), "hybrid": both fused with RRF
+SearchMode = Literal["semantic", "hybrid", "lexical"]
+
+
+class SearchFilters(BaseModel):
+    """Restrict results to notes matching every given condition"""
+    tags: Optional[List[str]] = Field(None, description="Notes carrying all of these tags")
+    created_after: Optional[datetime] = Field(None, description="Created at or after this time")
+    created_before: Optional[datetime] = Field(None, description="Created before this time")
+    updated_after: Optional[datetime] = Field(None, description="Last updated at or after this time")
+    
+    @property
+    def is_empty(self) -> bool:
+        return not self.tags and not self.created_after and not self.created_before and not self.updated_after
+
+
 class SearchRequest(BaseModel):
     """Request schema for semantic search"""
     query: str = Field(..., min_length=1, description="Search query text")
     top_k: int = Field(5, ge=1, le=20, description="Number of results")
-    min_similarity: float = Field(0.3, ge=0.0, le=1.0, description="Minimum similarity score")
+    min_similarity: float = Field(
+        0.3, ge=0.0, le=1.0, description="Minimum cosine similarity (keyword-only matches in lexical mode are not filtered)"
+    )
+    mode: SearchMode = Field("semantic", description="Retrieval mode: semantic, hybrid or lexical")
+    preview: bool = Field(False, description="Return a snippet instead of each note's full content")
+    rerank: Optional[bool] = Field(None, description="Rerank candidates with the cross-encoder (default: RERANK_ENABLED)")
+    diversity: float = Field(
+        0.0, ge=0.0, le=1.0, description="0 ranks purely by relevance; higher values favour distinct notes (MMR)"
+    )
+    filters: Optional[SearchFilters] = Field(None, description="Tag and date restrictions, applied before ranking")
 
 
 class SearchResultItem(BaseModel):
     """Individual search result item"""
     id: UUID
     title: str
-    content: str
+    content: Optional[str] = None
+    snippet: Optional[str] = None
     tags: List[str]
-    similarity_score: float
+    similarity_score: Optional[float] = Field(None, description="Cosine similarity to the query; None for keyword-only matches")
+    text_rank: Optional[float] = Field(
+        None, description="Full-text rank normalized to 0-1, for keyword-only matches (not comparable with similarity_score)"
+    )
     created_at: datetime
 
 
@@ -26,4 +55,19 @@ class SearchResponse(BaseModel):
     """Response schema for search results"""
     query: str
     results: List[SearchResultItem]
-    total_results: int
\ No newline at end of file
+    total_results: int
+
+
+class BatchSearchRequest(BaseModel):
+    """Request schema for several semantic searches in one call"""
+    queries: List[Annotated[str, Field(min_length=1)]] = Field(
+        ..., min_length=1, max_length=32, description="Search query texts"
+    )
+    top_k: int = Field(5, ge=1, le=20, description="Number of results per query")
+    min_similarity: float = Field(0.3, ge=0.0, le=1.0, description="Minimum similarity score")
+    preview: bool = Field(False, description="Return a snippet instead of each note's full content")
+
+
+class BatchSearchResponse(BaseModel):
+    """One SearchResponse per query, in request order"""
+    results: List[SearchResponse]
@@ -0,0 +1,180 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+from uuid import UUID
+import numpy as np
+from app.core.metrics import metrics
+from app.core.settings import get_settings
+from app.models.note import Note
+from app.services.search_cache import normalize_query
+
+
+# Retrieved note id -> updated_at when the answer was generated
+NoteVersions = Dict[UUID, Optional[datetime]]
+
+
+@dataclass
+class _Answer:
+    query: str
+    embedding: Optional[np.ndarray]
+    notes: NoteVersions
+    answer: Dict[str, Any]
+    stored_at: float
+
+
+def note_versions(notes: Iterable[Note]) -> NoteVersions:
+    return {note.id: note.updated_at for note in notes}  # type: ignore
+
+
+def _unit(embedding: Optional[List[float]]) -> Optional[np.ndarray]:
+    if embedding is None:
+        return None
+    vector = np.asarray(embedding, dtype=np.float32)
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+class AnswerCache:
+    """
+    Per-user cache of LLM answers for repeated questions
+
+    A question matches a stored one when its normalized text is identical or
+    its embedding is within ANSWER_CACHE_SIMILARITY (cosine), and only if
+    retrieval returned exactly the same notes at the same updated_at as when
+    the answer was generated, i.e. the LLM would see the same context.
+    Entries that share a note whose updated_at has since changed are dropped
+    on lookup; NoteService also forgets answers built on edited or deleted
+    notes right after the write.
+    """
+
+    def __init__(self, entries_per_user: int, max_users: int, ttl_seconds: float, similarity_threshold: float):
+        self.entries_per_user = max(1, entries_per_user)
+        self.max_users = max(1, max_users)
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._users: "OrderedDict[str, List[_Answer]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = metrics.counter("answer_cache_hits", "Query answers served from the answer cache")
+        self.misses = metrics.counter("answer_cache_misses", "Query answers generated by the LLM")
+        self.invalidations = metrics.counter(
+            "answer_cache_invalidations", "Cached answers dropped because a retrieved note changed"
+        )
+        metrics.gauge("answer_cache_hit_ratio", self.hit_ratio, "Share of query answers served from the answer cache")
+
+    def get(
+        self,
+        user_id: str,
+        query: str,
+        embedding: Optional[List[float]],
+        notes: NoteVersions
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Stored answer for an equivalent question over the same notes
+        Args:
+            user_id: Owner of the notes
+            query: Question text
+            embedding: Question vector (None: identical text only, e.g. lexical mode)
+            notes: Versions of the notes retrieval returned for this question
+        Returns:
+            The stored {"answer", "cited_notes"} dict, or None
+        """
+        normalized = normalize_query(query)
+        unit = _unit(embedding)
+        now = time.monotonic()
+        best: Optional[_Answer] = None
+        best_similarity = self.similarity_threshold
+        dropped = 0
+
+        with self._lock:
+            entries = self._users.get(user_id)
+            if entries:
+                kept = []
+                for entry in entries:
+                    if now - entry.stored_at > self.ttl_seconds or any(
+                        note_id in notes and notes[note_id] != updated_at
+                        for note_id, updated_at in entry.notes.items()
+                    ):
+                        dropped += 1
+                        continue
+                    kept.append(entry)
+
+                    if entry.query == normalized:
+                        similarity = 1.0
+                    elif unit is not None and entry.embedding is not None:
+                        similarity = float(np.dot(unit, entry.embedding))
+                    else:
+                        continue
+                    if similarity >= best_similarity and entry.notes == notes:
+                        best, best_similarity = entry, similarity
+                self._users[user_id] = kept
+                self._users.move_to_end(user_id)
+
+        if dropped:
+            self.invalidations.inc(dropped)
+        if best is None:
+            self.misses.inc()
+            return None
+        self.hits.inc()
+        return best.answer
+
+    def put(
+        self,
+        user_id: str,
+        query: str,
+        embedding: Optional[List[float]],
+        notes: NoteVersions,
+        answer: Dict[str, Any]
+    ) -> None:
+        """Store an answer generated from the given note versions"""
+        if not notes:
+            return
+        entry = _Answer(normalize_query(query), _unit(embedding), dict(notes), answer, time.monotonic())
+        with self._lock:
+            entries = [
+                existing for existing in self._users.get(user_id, [])
+                if existing.query != entry.query or existing.notes != entry.notes
+            ]
+            entries.append(entry)
+            self._users[user_id] = entries[-self.entries_per_user:]
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+    def forget_notes(self, user_id: str, note_ids: Iterable[UUID]) -> None:
+        """Drop answers built on any of the given notes (call after an edit or delete commits)"""
+        ids = set(note_ids)
+        with self._lock:
+            entries = self._users.get(user_id)
+            if not entries:
+                return
+            kept = [entry for entry in entries if ids.isdisjoint(entry.notes)]
+            self._users[user_id] = kept
+        if len(kept) < len(entries):
+            self.invalidations.inc(len(entries) - len(kept))
+
+    def clear_user(self, user_id: str) -> None:
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def hit_ratio(self) -> float:
+        lookups = self.hits.value + self.misses.value
+        return round(self.hits.value / lookups, 4) if lookups else 0.0
+
+
+def _build_answer_cache() -> Optional[AnswerCache]:
+    settings = get_settings()
+    if not settings.answer_cache_enabled:
+        return None
+    return AnswerCache(
+        entries_per_user=settings.answer_cache_entries_per_user,
+        max_users=settings.answer_cache_max_users,
+        ttl_seconds=settings.answer_cache_ttl_seconds,
+        similarity_threshold=settings.answer_cache_similarity,
+    )
+
+
+# Shared instance (None when ANSWER_CACHE_ENABLED=false)
+answer_cache = _build_answer_cache()
@@ -0,0 +1,272 @@
+import hashlib
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.core.metrics import metrics
+from app.core.settings import get_settings
+from app.models.note import Note
+from app.models.note_chunk import NoteChunk
+from app.services.embedding_service import embedding_service
+from app.services.transformer_encoder import BertEncoder
+from app.utils.logger import logger
+
+
+# Characters after which a chunk boundary reads naturally
+_SENTENCE_END = ".!?;:"
+_WORD = re.compile(r"\S+")
+
+# Special tokens ([CLS], [SEP]) added by the model around each input
+_SPECIAL_TOKENS = 2
+_MIN_CHUNK_TOKENS = 32
+
+
+@dataclass
+class ChunkDraft:
+    chunk_index: int
+    content: str
+    token_count: int
+    content_hash: str
+    embedded_text: str
+    embedding: Optional[List[float]] = None
+
+
+@dataclass
+class ChunkPlan:
+    """Chunks a note should have, and which of them still need a vector"""
+    note_id: UUID
+    user_id: str
+    drafts: List[ChunkDraft]
+    # chunk_index -> content_hash of rows that are already up to date
+    unchanged: Dict[int, str] = field(default_factory=dict)
+    stale_from: int = 0
+
+    @property
+    def to_embed(self) -> List[ChunkDraft]:
+        return [
+            draft for draft in self.drafts
+            if draft.embedding is None and self.unchanged.get(draft.chunk_index) != draft.content_hash
+        ]
+
+
+class ChunkService:
+    """
+    Token-aware chunking of notes into separately embedded passages
+
+    MiniLM only sees the first ~256 tokens of its input, so a single note
+    vector ignores most of a long note. Notes are split on token boundaries
+    (preferring sentence ends) into overlapping chunks that each fit the
+    model window together with the note title. Every chunk stores the hash
+    of its embedded text, so an edit only re-embeds the chunks it changed.
+    """
+
+    _encoder: Optional[BertEncoder] = None
+    _tokenizer_failed = False
+
+    embedded = metrics.counter("note_chunks_embedded", "Note chunks (re-)embedded")
+    reused = metrics.counter("note_chunks_reused", "Note chunks whose vector was reused after an edit")
+
+    @staticmethod
+    def _get_encoder() -> Optional[BertEncoder]:
+        """Tokenizer of the embedding model (shared with the local backend when possible)"""
+        if ChunkService._tokenizer_failed:
+            return None
+        if ChunkService._encoder is None:
+            encoder = getattr(embedding_service.backend, "encoder", None)
+            if not isinstance(encoder, BertEncoder):
+                settings = get_settings()
+                encoder = BertEncoder(settings.embedding_model, max_length=settings.embedding_max_tokens)
+            try:
+                encoder.load_tokenizer()
+            except Exception as e:
+                logger.warning(f"Tokenizer unavailable, chunking on word boundaries instead: {str(e)}")
+                ChunkService._tokenizer_failed = True
+                return None
+            ChunkService._encoder = encoder
+        return ChunkService._encoder
+
+    @staticmethod
+    def token_offsets(text: str) -> Tuple[List[Tuple[int, int]], bool]:
+        """Character spans of each token; (spans, exact) where exact=False means words"""
+        encoder = ChunkService._get_encoder()
+        if encoder is not None:
+            return encoder.token_offsets(text), True
+        return [match.span() for match in _WORD.finditer(text)], False
+
+    @staticmethod
+    def _chunk_budget(title: str) -> int:
+        """Tokens left for chunk content once the title and special tokens are added"""
+        settings = get_settings()
+        title_offsets, exact = ChunkService.token_offsets(f"{title}\n")
+        title_tokens = len(title_offsets) if exact else int(len(title_offsets) * 1.3) + 1
+        budget = min(settings.chunk_max_tokens, settings.embedding_max_tokens - _SPECIAL_TOKENS - title_tokens)
+        if not exact:
+            # Words average ~1.3 word-piece tokens
+            budget = int(budget / 1.3)
+        return max(_MIN_CHUNK_TOKENS, budget)
+
+    @staticmethod
+    def split_text(title: str, content: str) -> List[Tuple[str, int]]:
+        """
+        Split content into (chunk text, token count) pairs
+        Args:
+            title: Note title (prepended to every chunk when embedding)
+            content: Note content
+        Returns:
+            Chunks in document order; short notes yield a single chunk
+        """
+        offsets, _ = ChunkService.token_offsets(content)
+        if not offsets:
+            return [(content, 0)]
+
+        budget = ChunkService._chunk_budget(title)
+        if len(offsets) <= budget:
+            return [(content, len(offsets))]
+
+        overlap = min(get_settings().chunk_overlap_tokens, budget // 2)
+        chunks: List[Tuple[str, int]] = []
+        start = 0
+        while start < len(offsets):
+            end = min(start + budget, len(offsets))
+            if end < len(offsets):
+                # Prefer to cut after a sentence end in the second half of the window
+                for candidate in range(end, start + budget // 2, -1):
+                    token_end = offsets[candidate - 1][1]
+                    if content[token_end - 1] in _SENTENCE_END or content[token_end:token_end + 1] == "\n":
+                        end = candidate
+                        break
+
+            text = content[offsets[start][0]:offsets[end - 1][1]]
+            chunks.append((text, end - start))
+            if end >= len(offsets):
+                break
+            start = max(end - overlap, start + 1)
+
+        return chunks
+
+    @staticmethod
+    def build_drafts(title: str, content: str) -> List[ChunkDraft]:
+        drafts = []
+        for index, (text, token_count) in enumerate(ChunkService.split_text(title, content)):
+            embedded_text = f"{title}\n{text}"
+            drafts.append(ChunkDraft(
+                chunk_index=index,
+                content=text,
+                token_count=token_count,
+                content_hash=hashlib.sha256(embedded_text.encode("utf-8")).hexdigest(),
+                embedded_text=embedded_text,
+            ))
+        return drafts
+
+    @staticmethod
+    def plan(
+        db: Optional[Session],
+        note_id: UUID,
+        user_id: str,
+        title: str,
+        content: str,
+        note_embedding: Optional[List[float]] = None
+    ) -> ChunkPlan:
+        """
+        Work out which chunks of a note changed
+        Args:
+            db: Database session (read only); None for a note that has no chunks yet
+            note_id / user_id / title / content: The note's current state
+            note_embedding: Vector of the whole note; reused when the note is a single chunk
+        Returns:
+            ChunkPlan whose `to_embed` lists the chunks that need new vectors
+        """
+        drafts = ChunkService.build_drafts(title, content)
+
+        existing = []
+        if db is not None:
+            existing = (
+                db.query(NoteChunk.chunk_index, NoteChunk.content_hash, NoteChunk.embedding)
+                .filter(NoteChunk.note_id == note_id)
+                .all()
+            )
+        by_index = {row.chunk_index: row.content_hash for row in existing}
+        by_hash = {row.content_hash: row.embedding for row in existing if row.embedding is not None}
+
+        plan = ChunkPlan(note_id=note_id, user_id=user_id, drafts=drafts, stale_from=len(drafts))
+        for draft in drafts:
+            if by_index.get(draft.chunk_index) == draft.content_hash:
+                plan.unchanged[draft.chunk_index] = draft.content_hash
+            elif draft.content_hash in by_hash:
+                # Same text moved to another position (e.g. a paragraph inserted above)
+                draft.embedding = list(by_hash[draft.content_hash])
+            elif note_embedding is not None and len(drafts) == 1 and draft.content == content:
+                draft.embedding = list(note_embedding)
+        return plan
+
+    @staticmethod
+    def _pending(plans: List[ChunkPlan]) -> List[ChunkDraft]:
+        pending = [draft for plan in plans for draft in plan.to_embed]
+        reused = sum(len(plan.drafts) for plan in plans) - len(pending)
+        if reused:
+            ChunkService.reused.inc(reused)
+        return pending
+
+    @staticmethod
+    def _fill(pending: List[ChunkDraft], vectors: List[List[float]]) -> None:
+        for draft, vector in zip(pending, vectors):
+            draft.embedding = vector
+        ChunkService.embedded.inc(len(pending))
+
+    @staticmethod
+    def embed_plans(plans: List[ChunkPlan]) -> None:
+        """Embed the changed chunks of all plans in one batched call"""
+        pending = ChunkService._pending(plans)
+        if pending:
+            ChunkService._fill(pending, embedding_service.generate_batch_embeddings([d.embedded_text for d in pending]))
+
+    @staticmethod
+    async def aembed_plans(plans: List[ChunkPlan]) -> None:
+        """Async variant of embed_plans"""
+        pending = ChunkService._pending(plans)
+        if pending:
+            ChunkService._fill(
+                pending, await embedding_service.agenerate_batch_embeddings([d.embedded_text for d in pending])
+            )
+
+    @staticmethod
+    def apply(db: Session, plan: ChunkPlan) -> None:
+        """Write changed chunks and drop surplus ones; committed with the caller's transaction"""
+        rows = [
+            {
+                "note_id": plan.note_id,
+                "user_id": plan.user_id,
+                "chunk_index": draft.chunk_index,
+                "content": draft.content,
+                "content_hash": draft.content_hash,
+                "token_count": draft.token_count,
+                "embedding": draft.embedding,
+            }
+            for draft in plan.drafts
+            if plan.unchanged.get(draft.chunk_index) != draft.content_hash
+        ]
+        if rows:
+            stmt = insert(NoteChunk).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[NoteChunk.note_id, NoteChunk.chunk_index],
+                set_={
+                    "content": stmt.excluded.content,
+                    "content_hash": stmt.excluded.content_hash,
+                    "token_count": stmt.excluded.token_count,
+                    "embedding": stmt.excluded.embedding,
+                },
+            )
+            db.execute(stmt)
+
+        db.query(NoteChunk).filter(
+            NoteChunk.note_id == plan.note_id,
+            NoteChunk.chunk_index >= plan.stale_from,
+        ).delete(synchronize_session=False)
+
+        # Keeps notes with chunks out of the note-level vector search
+        chunked = bool(plan.drafts)
+        db.query(Note).filter(Note.id == plan.note_id, Note.chunked.isnot(chunked)).update(
+            {Note.chunked: chunked}, synchronize_session=False
+        )
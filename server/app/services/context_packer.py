@@ -0,0 +1,251 @@
+import math
+import re
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+from app.core.metrics import metrics
+from app.core.settings import get_settings
+from app.services.chunk_service import ChunkService
+from app.services.llm_service import llm_service
+
+
+# Sentences (or lines) of a note body, with their trailing punctuation
+_SENTENCE = re.compile(r"[^.!?\n]+[.!?]*")
+_TERM = re.compile(r"\w+")
+
+# Words average ~1.3 word-piece tokens when the tokenizer is unavailable
+_TOKENS_PER_WORD = 1.3
+# Slack for tokens merging differently across the joins between prompt parts
+_MARGIN_TOKENS = 16
+# Separator between notes plus the "[...]" marker between excerpts
+_SEPARATOR_TOKENS = 2
+_GAP_TOKENS = 5
+# Minimum share of the budget for a note with zero relevance
+_MIN_WEIGHT = 0.05
+
+
+@dataclass
+class ContextStats:
+    """How retrieved notes were fitted into the LLM prompt"""
+    prompt_tokens: int
+    context_tokens: int
+    context_tokens_unpacked: int
+    notes_trimmed: int
+    notes_dropped: int
+
+
+def _relevance(note: Dict[str, Any]) -> float:
+    """Similarity, or the text rank of a keyword-only match (all notes of one prompt share a scale)"""
+    if note.get("similarity_score") is not None:
+        return note["similarity_score"]
+    return note.get("text_rank") or 0.0
+
+
+def _cost(spans: int, exact: bool) -> int:
+    return spans if exact else math.ceil(spans * _TOKENS_PER_WORD)
+
+
+def _count(text: str) -> int:
+    offsets, exact = ChunkService.token_offsets(text)
+    return _cost(len(offsets), exact)
+
+
+def _terms(text: str) -> Set[str]:
+    return {term for term in _TERM.findall(text.casefold()) if len(term) > 2}
+
+
+class ContextPacker:
+    """
+    Fit retrieved notes into a token-bounded LLM prompt
+
+    Tokens are counted with the embedding model's tokenizer (a local
+    WordPiece vocabulary; it yields more tokens than Llama's BPE for English
+    text, so it errs on the safe side). The template and query are counted
+    first; what is left is split across notes in proportion to their
+    similarity (notes that need less than their share hand the rest to the
+    others). A note over its budget keeps only its sentences sharing the most
+    terms with the query, in document order. If even a minimal excerpt per
+    note does not fit, the least relevant notes are left out.
+    """
+
+    trimmed = metrics.counter("llm_context_notes_trimmed", "Notes cut to their most relevant sentences")
+    dropped = metrics.counter("llm_context_notes_dropped", "Retrieved notes left out of the LLM prompt")
+
+    @staticmethod
+    def allocate(needs: Sequence[int], weights: Sequence[float], budget: int) -> List[int]:
+        """
+        Weighted water-filling: each note gets min(need, weighted share of what is left)
+        Args:
+            needs: Tokens each note would use in full
+            weights: Relative priority of each note
+            budget: Tokens to distribute
+        Returns:
+            Tokens granted to each note
+        """
+        granted = [0] * len(needs)
+        pending = set(range(len(needs)))
+        remaining = max(0, budget)
+        while pending:
+            total_weight = sum(weights[i] for i in pending)
+            satisfied = [i for i in pending if needs[i] <= remaining * weights[i] / total_weight]
+            if not satisfied:
+                for i in pending:
+                    granted[i] = int(remaining * weights[i] / total_weight)
+                break
+            for i in satisfied:
+                granted[i] = needs[i]
+                remaining -= needs[i]
+                pending.remove(i)
+        return granted
+
+    @staticmethod
+    def excerpt(
+        text: str,
+        query_terms: Set[str],
+        budget: int,
+        tokens: Optional[Tuple[List[Tuple[int, int]], bool]] = None
+    ) -> List[str]:
+        """
+        Most query-relevant sentences of text within budget tokens
+        Args:
+            text: Note body
+            query_terms: Terms of the question
+            budget: Tokens available for the excerpt
+            tokens: ChunkService.token_offsets(text), if already computed
+        Returns:
+            Runs of consecutive selected sentences, in document order
+        """
+        offsets, exact = tokens or ChunkService.token_offsets(text)
+        starts = [start for start, _ in offsets]
+        sentences: List[Tuple[int, int, int, int]] = []  # (start, end, tokens, score)
+        for match in _SENTENCE.finditer(text):
+            start, end = match.span()
+            if not _TERM.search(match.group()):
+                continue
+            tokens = _cost(bisect_left(starts, end) - bisect_left(starts, start), exact)
+            sentences.append((start, end, tokens, len(query_terms & _terms(match.group()))))
+        if not sentences:
+            return []
+
+        # Best overlap first, earlier sentences breaking ties
+        ranking = sorted(range(len(sentences)), key=lambda i: (-sentences[i][3], i))
+        chosen: Set[int] = set()
+        used = 0
+        for i in ranking:
+            # A sentence next to a chosen one extends its run; others open a run behind a "[...]" marker
+            cost = sentences[i][2] + (0 if i - 1 in chosen or i + 1 in chosen else _GAP_TOKENS)
+            if used + cost <= budget:
+                chosen.add(i)
+                used += cost
+
+        if not chosen:
+            # Not even one whole sentence fits: cut the best one at a token boundary
+            start, end, _, _ = sentences[ranking[0]]
+            first, last = bisect_left(starts, start), bisect_left(starts, end)
+            keep = min(last - first, budget if exact else int(budget / _TOKENS_PER_WORD))
+            return [text[start:offsets[first + keep - 1][1]].strip()] if keep > 0 else []
+
+        runs: List[str] = []
+        previous = None
+        for i in sorted(chosen):
+            piece = text[sentences[i][0]:sentences[i][1]].strip()
+            if previous is not None and previous == i - 1:
+                runs[-1] = f"{runs[-1]} {piece}"
+            else:
+                runs.append(piece)
+            previous = i
+        return runs
+
+    @staticmethod
+    def pack(
+        query: str,
+        notes: List[Dict[str, Any]],
+        max_tokens: Optional[int] = None
+    ) -> Tuple[List[Dict[str, Any]], ContextStats]:
+        """
+        Notes for LLMService, fitted under the prompt ceiling (blocking; tokenizes)
+        Args:
+            query: User's question
+            notes: Note dicts as passed to LLMService, most relevant first
+            max_tokens: Prompt ceiling (default LLM_CONTEXT_MAX_TOKENS)
+        Returns:
+            (packed note dicts, statistics); trimmed notes carry their excerpts
+            as 'passages'
+        """
+        ceiling = max_tokens or get_settings().llm_context_max_tokens
+        frame = sum(_count(message["content"]) for message in llm_service.build_messages(query, []))
+        bodies = [llm_service.note_body(note) for note in notes]
+        tokens = [ChunkService.token_offsets(body) for body in bodies]
+        needs = [_cost(len(offsets), exact) for offsets, exact in tokens]
+        headers = [
+            _count(llm_service.format_note(i, note, "")) + _SEPARATOR_TOKENS
+            for i, note in enumerate(notes, 1)
+        ]
+
+        budget = ceiling - frame - _MARGIN_TOKENS
+        for _ in range(3):
+            packed, trimmed = ContextPacker._fit(query, notes, bodies, tokens, needs, headers, budget)
+            prompt_tokens = ContextPacker._prompt_tokens(query, packed)
+            if prompt_tokens <= ceiling:
+                break
+            # Token counts are not exactly additive across joins; shrink by the overshoot and refit
+            budget -= prompt_tokens - ceiling
+        while prompt_tokens > ceiling and packed:
+            packed.pop()
+            prompt_tokens = ContextPacker._prompt_tokens(query, packed)
+
+        ContextPacker.trimmed.inc(trimmed)
+        ContextPacker.dropped.inc(len(notes) - len(packed))
+        return packed, ContextStats(
+            prompt_tokens=prompt_tokens,
+            context_tokens=sum(
+                need if note is original else _count(llm_service.note_body(note))
+                for note, original, need in zip(packed, notes, needs)
+            ),
+            context_tokens_unpacked=sum(needs),
+            notes_trimmed=trimmed,
+            notes_dropped=len(notes) - len(packed),
+        )
+
+    @staticmethod
+    def _prompt_tokens(query: str, notes: List[Dict[str, Any]]) -> int:
+        return sum(_count(message["content"]) for message in llm_service.build_messages(query, notes))
+
+    @staticmethod
+    def _fit(
+        query: str,
+        notes: List[Dict[str, Any]],
+        bodies: List[str],
+        tokens: List[Tuple[List[Tuple[int, int]], bool]],
+        needs: List[int],
+        headers: List[int],
+        budget: int
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Packed notes for a context budget, and how many were trimmed"""
+        min_note_tokens = get_settings().llm_context_min_note_tokens
+        # Leave out the least relevant notes until each remaining one gets a minimal excerpt
+        kept = len(notes)
+        while kept and sum(headers[i] + min(needs[i], min_note_tokens) for i in range(kept)) > budget:
+            kept -= 1
+
+        granted = ContextPacker.allocate(
+            needs[:kept],
+            [max(float(_relevance(note)), _MIN_WEIGHT) for note in notes[:kept]],
+            budget - sum(headers[:kept]),
+        )
+
+        query_terms = _terms(query)
+        packed: List[Dict[str, Any]] = []
+        trimmed = 0
+        for note, body, body_tokens, need, allowed in zip(notes, bodies, tokens, needs, granted):
+            if need <= allowed:
+                packed.append(note)
+                continue
+            trimmed += 1
+            excerpt = ContextPacker.excerpt(body, query_terms, allowed, body_tokens)
+            packed.append({**note, "passages": excerpt or [""]})
+        return packed, trimmed
+
+
+# Singleton instance
+context_packer = ContextPacker()
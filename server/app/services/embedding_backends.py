@@ -0,0 +1,115 @@
+import os
+from abc import ABC, abstractmethod
+from typing import List, Optional
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+from app.core.http_clients import http_clients
+from app.core.settings import Settings
+from app.services.transformer_encoder import BertEncoder
+from app.utils.logger import logger
+
+
+class EmbeddingBackend(ABC):
+    """Interface every embedding backend implements"""
+
+    name: str = "base"
+
+    def __init__(self, model: str):
+        self.model = model
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed a batch of texts
+        Args:
+            texts: Non-empty texts to embed
+        Returns:
+            One vector per text, in input order
+        """
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        """Async variant of embed (defaults to running embed in the threadpool)"""
+        return await run_in_threadpool(self.embed, texts)
+
+    def warmup(self) -> None:
+        """Optional hook to load resources ahead of the first request"""
+        return None
+
+
+class HFInferenceBackend(EmbeddingBackend):
+    """Embeddings from the HuggingFace Inference API (pooled HTTP, sync + async)"""
+
+    name = "hf"
+
+    def __init__(self, model: str, base_url: str, timeout: Optional[float] = None):
+        super().__init__(model)
+        api_key = os.getenv("HF_TOKEN")
+        if not api_key:
+            raise ValueError("HF_TOKEN not set")
+
+        self.url = f"{base_url.rstrip('/')}/models/{model}/pipeline/feature-extraction"
+        self.headers = {"Authorization": f"Bearer {api_key}"}
+        self.timeout = timeout
+
+    @staticmethod
+    def _parse(payload) -> List[List[float]]:
+        embeddings = np.asarray(payload, dtype=np.float32)
+        # A single input may come back flat
+        if embeddings.ndim == 1:
+            embeddings = embeddings[None, :]
+        return embeddings.tolist()
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        # One request for the whole batch: the API accepts a list of inputs
+        response = http_clients.get_sync("hf").post(
+            self.url,
+            json={"inputs": texts},
+            headers=self.headers,
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return self._parse(response.json())
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        response = await http_clients.get_async("hf").post(
+            self.url,
+            json={"inputs": texts},
+            headers=self.headers,
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return self._parse(response.json())
+
+
+class LocalEmbeddingBackend(EmbeddingBackend):
+    """In-process sentence embeddings (NumPy forward pass, no network)"""
+
+    name = "local"
+
+    def __init__(self, model: str, max_length: int = 256):
+        super().__init__(model)
+        self.encoder = BertEncoder(model, max_length=max_length)
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return self.encoder.mean_pooled(texts).tolist()
+
+    def warmup(self) -> None:
+        self.encoder.load()
+
+
+def create_embedding_backend(name: str, settings: Settings) -> EmbeddingBackend:
+    """Build the embedding backend selected in settings"""
+    name = name.lower()
+    if name == "local":
+        return LocalEmbeddingBackend(
+            settings.embedding_model,
+            max_length=settings.embedding_max_tokens,
+        )
+    if name == "hf":
+        return HFInferenceBackend(
+            settings.embedding_model,
+            base_url=settings.hf_inference_base_url,
+            timeout=settings.embedding_request_timeout,
+        )
+    logger.error(f"Unknown embedding backend: {name}")
+    raise ValueError(f"Unknown embedding backend '{name}'. Use 'local' or 'hf'.")
@@ -0,0 +1,164 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+from app.core.metrics import metrics
+from app.utils.logger import logger
+
+
+@dataclass
+class _PendingEmbedding:
+    text: str
+    future: Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class EmbeddingBatcher:
+    """
+    Dynamic micro-batching for embedding requests
+
+    Callers (request threads or the event loop) submit single texts; dispatcher
+    threads collect whatever arrives within a short window, up to
+    max_batch_size, and embed it with a single backend call. Each caller's
+    future resolves with its own vector only.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], List[List[float]]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        workers: int = 1,
+        name: str = "embedding",
+    ):
+        self.embed_fn = embed_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.workers = max(1, workers)
+        self.name = name
+
+        self._queue: "queue.Queue[Optional[_PendingEmbedding]]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._stopped = False
+
+        self.batch_size_histogram = metrics.histogram(
+            f"{name}_batch_size",
+            buckets=[1, 2, 4, 8, 16, 32, 64, 128],
+            description="Texts per backend call",
+        )
+        self.wait_time_histogram = metrics.histogram(
+            f"{name}_batch_wait_ms",
+            buckets=[0.5, 1, 2, 5, 10, 20, 50, 100, 250],
+            description="Time a text waited in the queue before dispatch (ms)",
+        )
+        self.backend_latency_histogram = metrics.histogram(
+            f"{name}_batch_latency_ms",
+            buckets=[1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500],
+            description="Backend call duration per batch (ms)",
+        )
+
+    def _ensure_started(self) -> None:
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads or self._stopped:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(
+                    target=self._run,
+                    name=f"{self.name}-batcher-{i}",
+                    daemon=True,
+                )
+                thread.start()
+                self._threads.append(thread)
+            logger.info(
+                f"Started {self.workers} {self.name} batcher thread(s) "
+                f"(max_batch_size={self.max_batch_size}, max_wait_ms={self.max_wait * 1000:g})"
+            )
+
+    def submit(self, text: str) -> Future:
+        """Queue a text for embedding and return a future for its vector"""
+        if self._stopped:
+            raise RuntimeError(f"{self.name} batcher is stopped")
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put(_PendingEmbedding(text=text, future=future))
+        return future
+
+    def embed(self, text: str) -> List[float]:
+        return self.submit(text).result()
+
+    def embed_many(self, texts: List[str]) -> List[List[float]]:
+        futures = [self.submit(text) for text in texts]
+        return [future.result() for future in futures]
+
+    def _collect(self, first: _PendingEmbedding) -> List[_PendingEmbedding]:
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Shutdown sentinel: put it back for the other workers
+                self._queue.put(None)
+                break
+            batch.append(item)
+
+        return batch
+
+    def _dispatch(self, batch: List[_PendingEmbedding]) -> None:
+        dispatched_at = time.perf_counter()
+        for item in batch:
+            self.wait_time_histogram.observe((dispatched_at - item.enqueued_at) * 1000)
+
+        # Identical texts in one window are embedded once
+        unique_texts: Dict[str, int] = {}
+        for item in batch:
+            unique_texts.setdefault(item.text, len(unique_texts))
+        self.batch_size_histogram.observe(len(unique_texts))
+
+        try:
+            vectors = self.embed_fn(list(unique_texts))
+        except Exception as e:
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+        finally:
+            self.backend_latency_histogram.observe((time.perf_counter() - dispatched_at) * 1000)
+
+        for item in batch:
+            if not item.future.done():
+                item.future.set_result(vectors[unique_texts[item.text]])
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                self._queue.put(None)
+                return
+            batch = self._collect(first)
+            try:
+                self._dispatch(batch)
+            except Exception as e:
+                logger.error(f"{self.name} batch dispatch failed: {str(e)}", exc_info=True)
+                for item in batch:
+                    if not item.future.done():
+                        item.future.set_exception(e)
+
+    def stop(self) -> None:
+        """Stop dispatcher threads after the queued work drains"""
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+        self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=5)
@@ -0,0 +1,223 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import func, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from app.core.database import SessionLocal
+from app.core.metrics import metrics
+from app.models.embedding_cache import EmbeddingCacheEntry
+from app.utils.logger import logger
+
+
+CacheKey = Tuple[str, str]  # (model, sha256 of text)
+
+# Approximate per-entry bookkeeping cost (key strings, OrderedDict node, array header)
+_ENTRY_OVERHEAD_BYTES = 256
+
+# Persistent entries read within this window are not re-stamped, so hot keys cost no write per hit
+_TOUCH_INTERVAL = timedelta(days=1)
+
+
+class EmbeddingCache:
+    """
+    Two-tier, content-addressed embedding cache
+
+    - Memory tier: LRU bounded by an approximate byte budget
+    - Persistent tier (opt-in): `embedding_cache` table, survives restarts.
+      Entries unused for ttl_days are pruned, and the table is capped at
+      max_entries (least recently used first), at most every
+      prune_interval_seconds per process.
+
+    Keys are (model name, SHA-256 of the exact text), so any change to the
+    text or the model produces a new key and stale vectors are never served.
+    """
+
+    def __init__(
+        self,
+        max_memory_bytes: int,
+        persistent: bool = False,
+        ttl_days: float = 30.0,
+        max_entries: int = 200000,
+        prune_interval_seconds: float = 3600.0
+    ):
+        self.max_memory_bytes = max_memory_bytes
+        self.persistent = persistent
+        self.ttl = timedelta(days=ttl_days)
+        self.max_entries = max_entries
+        self.prune_interval_seconds = prune_interval_seconds
+        self._last_prune = time.monotonic()
+        self._prune_lock = threading.Lock()
+        self._entries: "OrderedDict[CacheKey, np.ndarray]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+        self.memory_hits = metrics.counter("embedding_cache_memory_hits", "Embedding cache hits (memory tier)")
+        self.persistent_hits = metrics.counter("embedding_cache_persistent_hits", "Embedding cache hits (Postgres tier)")
+        self.misses = metrics.counter("embedding_cache_misses", "Embedding cache misses (both tiers)")
+        self.evictions = metrics.counter("embedding_cache_evictions", "Memory tier LRU evictions")
+        self.persistent_errors = metrics.counter("embedding_cache_persistent_errors", "Failed Postgres tier reads/writes")
+        self.pruned = metrics.counter("embedding_cache_pruned", "Postgres tier entries removed by expiry or the size cap")
+
+    @staticmethod
+    def make_key(model: str, text: str) -> CacheKey:
+        return model, hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    # Memory tier
+
+    def get_memory(self, key: CacheKey) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                return None
+            self._entries.move_to_end(key)
+        self.memory_hits.inc()
+        return vector.tolist()
+
+    def _put_memory(self, key: CacheKey, embedding: Iterable[float]) -> None:
+        vector = np.asarray(embedding, dtype=np.float32)
+        size = vector.nbytes + _ENTRY_OVERHEAD_BYTES
+        if size > self.max_memory_bytes:
+            return
+
+        evicted = 0
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= previous.nbytes + _ENTRY_OVERHEAD_BYTES
+            self._entries[key] = vector
+            self._memory_bytes += size
+
+            while self._memory_bytes > self.max_memory_bytes and self._entries:
+                _, oldest = self._entries.popitem(last=False)
+                self._memory_bytes -= oldest.nbytes + _ENTRY_OVERHEAD_BYTES
+                evicted += 1
+
+        if evicted:
+            self.evictions.inc(evicted)
+
+    # Persistent tier
+
+    def _get_persistent(self, keys: List[CacheKey]) -> Dict[CacheKey, List[float]]:
+        if not self.persistent or not keys:
+            return {}
+        try:
+            with SessionLocal() as db:
+                rows = (
+                    db.query(
+                        EmbeddingCacheEntry.model,
+                        EmbeddingCacheEntry.text_hash,
+                        EmbeddingCacheEntry.embedding,
+                        EmbeddingCacheEntry.last_used_at
+                    )
+                    .filter(tuple_(EmbeddingCacheEntry.model, EmbeddingCacheEntry.text_hash).in_(keys))
+                    .all()
+                )
+                touch_before = datetime.now(timezone.utc) - _TOUCH_INTERVAL
+                stale = [(row.model, row.text_hash) for row in rows if row.last_used_at < touch_before]
+                if stale:
+                    db.query(EmbeddingCacheEntry).filter(
+                        tuple_(EmbeddingCacheEntry.model, EmbeddingCacheEntry.text_hash).in_(stale)
+                    ).update({EmbeddingCacheEntry.last_used_at: func.now()}, synchronize_session=False)
+                    db.commit()
+            return {(row.model, row.text_hash): np.asarray(row.embedding, dtype=np.float32).tolist() for row in rows}
+        except Exception as e:
+            self.persistent_errors.inc()
+            logger.warning(f"Embedding cache read failed: {str(e)}")
+            return {}
+
+    def _put_persistent(self, items: Dict[CacheKey, List[float]]) -> None:
+        if not self.persistent or not items:
+            return
+        try:
+            with SessionLocal() as db:
+                stmt = insert(EmbeddingCacheEntry).values([
+                    {"model": model, "text_hash": text_hash, "embedding": embedding}
+                    for (model, text_hash), embedding in items.items()
+                ]).on_conflict_do_nothing(index_elements=["model", "text_hash"])
+                db.execute(stmt)
+                db.commit()
+        except Exception as e:
+            self.persistent_errors.inc()
+            logger.warning(f"Embedding cache write failed: {str(e)}")
+            return
+        self._maybe_prune()
+
+    def _maybe_prune(self) -> None:
+        if time.monotonic() - self._last_prune < self.prune_interval_seconds:
+            return
+        if not self._prune_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_prune = time.monotonic()
+            self.prune()
+        except Exception as e:
+            self.persistent_errors.inc()
+            logger.warning(f"Embedding cache prune failed: {str(e)}")
+        finally:
+            self._prune_lock.release()
+
+    def prune(self) -> int:
+        """Delete persistent entries unused for the TTL, then the least recently used beyond max_entries"""
+        with SessionLocal() as db:
+            deleted = (
+                db.query(EmbeddingCacheEntry)
+                .filter(EmbeddingCacheEntry.last_used_at < datetime.now(timezone.utc) - self.ttl)
+                .delete(synchronize_session=False)
+            )
+            excess = db.query(func.count()).select_from(EmbeddingCacheEntry).scalar() - self.max_entries
+            if excess > 0:
+                oldest = (
+                    db.query(EmbeddingCacheEntry.model, EmbeddingCacheEntry.text_hash)
+                    .order_by(EmbeddingCacheEntry.last_used_at)
+                    .limit(excess)
+                    .subquery()
+                )
+                deleted += (
+                    db.query(EmbeddingCacheEntry)
+                    .filter(tuple_(EmbeddingCacheEntry.model, EmbeddingCacheEntry.text_hash).in_(
+                        db.query(oldest.c.model, oldest.c.text_hash)
+                    ))
+                    .delete(synchronize_session=False)
+                )
+            db.commit()
+        if deleted:
+            self.pruned.inc(deleted)
+            logger.info(f"Pruned {deleted} embedding cache entries")
+        return deleted
+
+    # Both tiers
+
+    def get_many(self, keys: List[CacheKey]) -> Dict[CacheKey, List[float]]:
+        """Look up keys in memory, then fetch the remainder from Postgres in one query"""
+        found: Dict[CacheKey, List[float]] = {}
+        remaining: List[CacheKey] = []
+        for key in dict.fromkeys(keys):
+            vector = self.get_memory(key)
+            if vector is None:
+                remaining.append(key)
+            else:
+                found[key] = vector
+
+        if remaining:
+            persisted = self._get_persistent(remaining)
+            if persisted:
+                self.persistent_hits.inc(len(persisted))
+                for key, vector in persisted.items():
+                    self._put_memory(key, vector)
+                found.update(persisted)
+            self.misses.inc(len(remaining) - len(persisted))
+
+        return found
+
+    def put_many(self, items: Dict[CacheKey, List[float]]) -> None:
+        for key, vector in items.items():
+            self._put_memory(key, vector)
+        self._put_persistent(items)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "memory_bytes": self._memory_bytes}
@@ -0,0 +1,299 @@
+import random
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from uuid import UUID
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.core.database import SessionLocal
+from app.core.metrics import metrics
+from app.core.settings import get_settings
+from app.models.embedding_job import EmbeddingJob
+from app.models.note import Note
+from app.services.chunk_service import ChunkPlan, ChunkService
+from app.services.embedding_service import embedding_service
+from app.services.memory_index import memory_index
+from app.services.neighbor_service import NeighborService
+from app.services.search_cache import search_cache
+from app.utils.logger import logger
+
+
+@dataclass
+class _ClaimedJob:
+    note_id: UUID
+    enqueued_at: datetime
+    attempts: int
+    user_id: str
+    title: str
+    content: str
+
+    @property
+    def text(self) -> str:
+        return f"{self.title}\n{self.content}"
+
+
+class EmbeddingPipeline:
+    """
+    Background embedding for note writes
+
+    In "async" write mode NoteService commits notes with embedding_status
+    "pending" and an embedding_jobs row in the same transaction. Worker
+    threads claim due jobs (FOR UPDATE SKIP LOCKED + a lease), embed them in
+    one batch, and backfill the vectors. Failed jobs are retried with
+    exponential backoff until embedding_job_max_attempts, then the note is
+    marked "failed". With chunking enabled the note's changed chunks are
+    embedded in the same pass.
+
+    A job is only completed if the note text still matches what was embedded
+    and the job has not been re-enqueued meanwhile, so a concurrent edit is
+    never overwritten with a stale vector.
+    """
+
+    def __init__(self):
+        self.settings = get_settings()
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+        self.completed = metrics.counter("embedding_jobs_completed", "Background embedding jobs completed")
+        self.retried = metrics.counter("embedding_jobs_retried", "Background embedding jobs scheduled for retry")
+        self.failed = metrics.counter("embedding_jobs_failed", "Background embedding jobs that exhausted retries")
+        self.lag = metrics.histogram(
+            "embedding_job_lag_ms",
+            buckets=[10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 60000],
+            description="Time from enqueue to backfilled vector (ms)",
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.settings.embedding_write_mode.lower() == "async"
+
+    # Producer side (called inside NoteService transactions)
+
+    def enqueue(self, db: Session, note_id: UUID) -> None:
+        """Add or reset the job for note_id; committed with the caller's transaction"""
+        now = func.clock_timestamp()
+        stmt = insert(EmbeddingJob).values(
+            note_id=note_id,
+            attempts=0,
+            next_attempt_at=now,
+            enqueued_at=now,
+        ).on_conflict_do_update(
+            index_elements=[EmbeddingJob.note_id],
+            set_={"attempts": 0, "next_attempt_at": now, "enqueued_at": now, "last_error": None},
+        )
+        db.execute(stmt)
+
+    def notify(self) -> None:
+        """Wake an idle worker (call after the enqueuing transaction commits)"""
+        self._wake.set()
+
+    # Consumer side
+
+    def _claim(self, limit: int, user_id: Optional[str] = None) -> List[_ClaimedJob]:
+        lease_until = datetime.now(timezone.utc) + timedelta(seconds=self.settings.embedding_job_lease_seconds)
+
+        with SessionLocal() as db:
+            query = (
+                db.query(EmbeddingJob)
+                .filter(EmbeddingJob.next_attempt_at <= func.now())
+            )
+            if user_id is not None:
+                query = query.join(Note, Note.id == EmbeddingJob.note_id).filter(Note.user_id == user_id)
+
+            jobs = (
+                query.order_by(EmbeddingJob.next_attempt_at)
+                .limit(limit)
+                .with_for_update(skip_locked=True, of=EmbeddingJob)
+                .all()
+            )
+            if not jobs:
+                return []
+
+            notes = {
+                row.id: row
+                for row in db.query(Note.id, Note.user_id, Note.title, Note.content)
+                .filter(Note.id.in_([job.note_id for job in jobs]))
+                .all()
+            }
+
+            claimed = []
+            for job in jobs:
+                note = notes.get(job.note_id)
+                if note is None:
+                    db.delete(job)
+                    continue
+                job.attempts += 1
+                job.next_attempt_at = lease_until
+                claimed.append(_ClaimedJob(
+                    note_id=job.note_id,  # type: ignore
+                    enqueued_at=job.enqueued_at,  # type: ignore
+                    attempts=job.attempts,  # type: ignore
+                    user_id=note.user_id,
+                    title=note.title,
+                    content=note.content,
+                ))
+            db.commit()
+            return claimed
+
+    def _plan_chunks(self, jobs: List[_ClaimedJob], vectors: List[List[float]]) -> Dict[UUID, ChunkPlan]:
+        """Chunk the claimed notes and embed their changed chunks (outside any write transaction)"""
+        if not self.settings.chunking_enabled:
+            return {}
+        with SessionLocal() as db:
+            plans = {
+                job.note_id: ChunkService.plan(db, job.note_id, job.user_id, job.title, job.content, vector)
+                for job, vector in zip(jobs, vectors)
+            }
+        ChunkService.embed_plans(list(plans.values()))
+        return plans
+
+    def _complete(
+        self,
+        jobs: List[_ClaimedJob],
+        vectors: List[List[float]],
+        chunk_plans: Optional[Dict[UUID, ChunkPlan]] = None
+    ) -> None:
+        chunk_plans = chunk_plans or {}
+        updated_users = set()
+        updated_notes = set()
+        with SessionLocal() as db:
+            for job, vector in zip(jobs, vectors):
+                updated = db.query(Note).filter(
+                    Note.id == job.note_id,
+                    Note.title == job.title,
+                    Note.content == job.content,
+                ).update(
+                    {
+                        Note.embedding: vector,
+                        Note.embedding_status: "ready",
+                        # Backfilling is not a user edit
+                        Note.updated_at: Note.updated_at,
+                    },
+                    synchronize_session=False,
+                )
+                # Chunks follow the note: skip them if the text changed since the claim
+                if updated and job.note_id in chunk_plans:
+                    ChunkService.apply(db, chunk_plans[job.note_id])
+                if updated:
+                    updated_users.add(job.user_id)
+                    updated_notes.add(job.note_id)
+                db.query(EmbeddingJob).filter(
+                    EmbeddingJob.note_id == job.note_id,
+                    EmbeddingJob.enqueued_at == job.enqueued_at,
+                ).delete(synchronize_session=False)
+            NeighborService.on_notes_changed(db, updated_notes)
+            db.commit()
+
+        for user_id in updated_users:
+            if memory_index is not None:
+                memory_index.invalidate(user_id)
+            # Newly embedded notes change search results
+            if search_cache is not None:
+                search_cache.bump(user_id)
+
+        now = datetime.now(timezone.utc)
+        for job in jobs:
+            self.lag.observe((now - job.enqueued_at).total_seconds() * 1000)
+        self.completed.inc(len(jobs))
+
+    def _backoff(self, attempts: int) -> float:
+        delay = self.settings.embedding_job_backoff_base * (2 ** (attempts - 1))
+        delay = min(delay, self.settings.embedding_job_backoff_max)
+        return delay * random.uniform(0.8, 1.2)
+
+    def _fail(self, jobs: List[_ClaimedJob], error: Exception) -> None:
+        message = str(error)[:2000]
+        now = datetime.now(timezone.utc)
+
+        with SessionLocal() as db:
+            for job in jobs:
+                job_filter = (
+                    EmbeddingJob.note_id == job.note_id,
+                    EmbeddingJob.enqueued_at == job.enqueued_at,
+                )
+                if job.attempts >= self.settings.embedding_job_max_attempts:
+                    db.query(Note).filter(
+                        Note.id == job.note_id,
+                        Note.embedding_status == "pending",
+                    ).update(
+                        {Note.embedding_status: "failed", Note.updated_at: Note.updated_at},
+                        synchronize_session=False,
+                    )
+                    db.query(EmbeddingJob).filter(*job_filter).delete(synchronize_session=False)
+                    self.failed.inc()
+                    logger.error(f"Embedding job for note {job.note_id} failed after {job.attempts} attempts: {message}")
+                else:
+                    db.query(EmbeddingJob).filter(*job_filter).update(
+                        {
+                            EmbeddingJob.next_attempt_at: now + timedelta(seconds=self._backoff(job.attempts)),
+                            EmbeddingJob.last_error: message,
+                        },
+                        synchronize_session=False,
+                    )
+                    self.retried.inc()
+            db.commit()
+
+    def process_batch(self, limit: Optional[int] = None, user_id: Optional[str] = None) -> int:
+        """Claim, embed and backfill one batch of due jobs; returns jobs handled"""
+        jobs = self._claim(limit or self.settings.embedding_worker_batch_size, user_id=user_id)
+        if not jobs:
+            return 0
+
+        try:
+            vectors = embedding_service.generate_batch_embeddings([job.text for job in jobs])
+            chunk_plans = self._plan_chunks(jobs, vectors)
+        except Exception as e:
+            logger.warning(f"Embedding batch of {len(jobs)} jobs failed: {str(e)}")
+            self._fail(jobs, e)
+            return len(jobs)
+
+        self._complete(jobs, vectors, chunk_plans)
+        logger.debug(f"Backfilled embeddings for {len(jobs)} notes")
+        return len(jobs)
+
+    def drain_user(self, user_id: str, limit: int) -> int:
+        """Embed up to `limit` of a user's due jobs inline (pending_search_policy=wait)"""
+        handled = 0
+        while handled < limit:
+            processed = self.process_batch(limit=limit - handled, user_id=user_id)
+            if processed == 0:
+                break
+            handled += processed
+        return handled
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                processed = self.process_batch()
+            except Exception as e:
+                logger.error(f"Embedding worker error: {str(e)}", exc_info=True)
+                processed = 0
+                self._stop.wait(self.settings.embedding_worker_poll_interval)
+
+            if processed == 0:
+                self._wake.wait(self.settings.embedding_worker_poll_interval)
+                self._wake.clear()
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        self._stop.clear()
+        for i in range(max(1, self.settings.embedding_worker_count)):
+            thread = threading.Thread(target=self._run, name=f"embedding-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started {len(self._threads)} background embedding worker(s)")
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout=10)
+        self._threads = []
+
+
+# Singleton instance
+embedding_pipeline = EmbeddingPipeline()
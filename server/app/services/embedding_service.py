@@ -1,59 +1,172 @@
-import os
-from huggingface_hub import InferenceClient
-from typing import List
+import asyncio
+from typing import List, Optional
+from starlette.concurrency import run_in_threadpool
+from app.core.settings import get_settings
+from app.core.single_flight import SingleFlight
+from app.services.embedding_backends import EmbeddingBackend, create_embedding_backend
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.embedding_cache import EmbeddingCache
 from app.utils.logger import logger
 from app.utils.exceptions import EmbeddingGenerationError
 
 class EmbeddingService:
-    """Generate embeddings using HuggingFace Inference API"""
+    """Generate embeddings through the configured backend (local model or HuggingFace API)"""
 
     def __init__(self):
-        api_key = os.getenv("HF_TOKEN")
-        if not api_key:
-            raise ValueError("HF_TOKEN not set")
-         # Store client as instance variable
-        self.client = InferenceClient(
-            provider="hf-inference",
-            api_key=os.getenv("HF_TOKEN")
+        settings = get_settings()
+
+        self.backend: EmbeddingBackend = create_embedding_backend(settings.embedding_backend, settings)
+        self.fallback_backend: Optional[EmbeddingBackend] = None
+        if settings.embedding_fallback_backend and settings.embedding_fallback_backend != settings.embedding_backend:
+            self.fallback_backend = create_embedding_backend(settings.embedding_fallback_backend, settings)
+
+        self.model = settings.embedding_model
+        self.dimensions = settings.embedding_dimensions
+
+        self.cache: Optional[EmbeddingCache] = None
+        if settings.embedding_cache_enabled:
+            self.cache = EmbeddingCache(
+                max_memory_bytes=int(settings.embedding_cache_memory_mb * 1024 * 1024),
+                persistent=settings.embedding_cache_persistent,
+                ttl_days=settings.embedding_cache_persistent_ttl_days,
+                max_entries=settings.embedding_cache_persistent_max_entries,
+                prune_interval_seconds=settings.embedding_cache_prune_interval_seconds,
+            )
+
+        # Concurrent requests for the same text share one embedding
+        self.flight = SingleFlight("embedding")
+
+        # Concurrent single-text requests are coalesced into one backend call
+        self.batcher: Optional[EmbeddingBatcher] = None
+        if settings.embedding_batching_enabled:
+            self.batcher = EmbeddingBatcher(
+                self._embed,
+                max_batch_size=settings.embedding_batch_max_size,
+                max_wait_ms=settings.embedding_batch_max_wait_ms,
+                workers=settings.embedding_batch_workers,
+            )
+        logger.info(
+            f"Initialized EmbeddingService with model: {self.model} "
+            f"(backend: {self.backend.name}, fallback: {self.fallback_backend.name if self.fallback_backend else 'none'})"
         )
-        
-        self.model = "sentence-transformers/all-MiniLM-L6-v2"
-        logger.info(f"Initialized EmbeddingService with model: {self.model}")
-    
-    def generate_embedding(self, text: str) -> List[float]:
 
-        """Generate embedding for text"""
-        
-        if not text or not text.strip():
-            logger.error("Empty text provided for embedding")
-            raise ValueError("Text cannot be empty")
-        
+    def warmup(self) -> None:
+        """Load backend resources (e.g. local model weights) before serving"""
+        self.backend.warmup()
+        if self.fallback_backend:
+            self.fallback_backend.warmup()
+
+    def shutdown(self) -> None:
+        """Stop batcher threads"""
+        if self.batcher:
+            self.batcher.stop()
+
+    def _embed_with_backends(self, texts: List[str]) -> List[List[float]]:
         try:
-            logger.debug(f"Generating embedding for text (length: {len(text)})")
-            embedding = self.client.feature_extraction(
-                text=text,
-                model=self.model
+            return self.backend.embed(texts)
+        except Exception as e:
+            if not self.fallback_backend:
+                raise
+            logger.warning(
+                f"Embedding backend '{self.backend.name}' failed ({str(e)}), "
+                f"using fallback '{self.fallback_backend.name}'"
             )
-            
-            # Flatten if nested (API sometimes returns [[embedding]])
-            if isinstance(embedding[0], list):
-                embedding = embedding[0]
-            
-            # Validate dimensions
-            if len(embedding) != 384:
+            return self.fallback_backend.embed(texts)
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, serving what we can from the cache (runs on batcher threads)"""
+        if not self.cache:
+            return self._embed_uncached(texts)
+
+        keys = [EmbeddingCache.make_key(self.model, text) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        missing = list(dict.fromkeys(key for key in keys if key not in cached))
+        if missing:
+            text_by_key = dict(zip(keys, texts))
+            vectors = self._embed_uncached([text_by_key[key] for key in missing])
+            fresh = dict(zip(missing, vectors))
+            self.cache.put_many(fresh)
+            cached.update(fresh)
+
+        return [cached[key] for key in keys]
+
+    def _validate(self, embeddings: List[List[float]]) -> List[List[float]]:
+        for embedding in embeddings:
+            if len(embedding) != self.dimensions:
                 logger.error(f"Unexpected embedding dimensions: {len(embedding)}")
                 raise EmbeddingGenerationError(
-                    f"Expected 384 dimensions, got {len(embedding)}"
+                    f"Expected {self.dimensions} dimensions, got {len(embedding)}"
                 )
-            logger.debug(f"Successfully generated embedding")
-            return embedding # type: ignore
-            
+        return embeddings
+
+    def _embed_uncached(self, texts: List[str]) -> List[List[float]]:
+        try:
+            logger.debug(f"Generating embeddings for {len(texts)} texts")
+            embeddings = self._validate(self._embed_with_backends(texts))
+            logger.debug(f"Successfully generated embeddings")
+            return embeddings
+
         except Exception as e:
             logger.error(f"Embedding generation failed: {str(e)}", exc_info=True)
             raise EmbeddingGenerationError(
                 f"Failed to generate embedding: {str(e)}"
             )
-    
+
+    async def _aembed_with_backends(self, texts: List[str]) -> List[List[float]]:
+        try:
+            return await self.backend.aembed(texts)
+        except Exception as e:
+            if not self.fallback_backend:
+                raise
+            logger.warning(
+                f"Embedding backend '{self.backend.name}' failed ({str(e)}), "
+                f"using fallback '{self.fallback_backend.name}'"
+            )
+            return await self.fallback_backend.aembed(texts)
+
+    async def _aembed(self, texts: List[str]) -> List[List[float]]:
+        """Async counterpart of _embed, used when batching is disabled"""
+        keys = [EmbeddingCache.make_key(self.model, text) for text in texts]
+        cached = await run_in_threadpool(self.cache.get_many, keys) if self.cache else {}
+
+        missing = list(dict.fromkeys(key for key in keys if key not in cached))
+        if missing:
+            text_by_key = dict(zip(keys, texts))
+            try:
+                vectors = self._validate(
+                    await self._aembed_with_backends([text_by_key[key] for key in missing])
+                )
+            except Exception as e:
+                logger.error(f"Embedding generation failed: {str(e)}", exc_info=True)
+                raise EmbeddingGenerationError(
+                    f"Failed to generate embedding: {str(e)}"
+                )
+            fresh = dict(zip(missing, vectors))
+            if self.cache:
+                await run_in_threadpool(self.cache.put_many, fresh)
+            cached.update(fresh)
+
+        return [cached[key] for key in keys]
+
+    def generate_embedding(self, text: str) -> List[float]:
+
+        """Generate embedding for text"""
+
+        if not text or not text.strip():
+            logger.error("Empty text provided for embedding")
+            raise ValueError("Text cannot be empty")
+
+        # Memory-tier hits skip the batcher queue entirely
+        if self.cache:
+            cached = self.cache.get_memory(EmbeddingCache.make_key(self.model, text))
+            if cached is not None:
+                return cached
+
+        if self.batcher:
+            return self.batcher.embed(text)
+        return self._embed([text])[0]
+
     def generate_batch_embeddings(self, texts: List[str]) -> List[List[float]]:
         """
         Generate embeddings for multiple texts
@@ -62,9 +175,49 @@ class EmbeddingService:
         Returns:
             List of embeddings
         """
+        if any(not text or not text.strip() for text in texts):
+            logger.error("Empty text provided for embedding")
+            raise ValueError("Text cannot be empty")
+
         logger.info(f"Generating embeddings for {len(texts)} texts")
-        return [self.generate_embedding(text) for text in texts]
+        if not texts:
+            return []
+        if self.batcher:
+            return self.batcher.embed_many(texts)
+        return self._embed(texts)
+
+
+    async def agenerate_embedding(self, text: str) -> List[float]:
+        """Async variant of generate_embedding (does not hold a threadpool worker)"""
+        if not text or not text.strip():
+            logger.error("Empty text provided for embedding")
+            raise ValueError("Text cannot be empty")
+
+        if self.cache:
+            cached = self.cache.get_memory(EmbeddingCache.make_key(self.model, text))
+            if cached is not None:
+                return cached
+
+        return await self.flight.run(text, self._aembed_one, text)
+
+    async def _aembed_one(self, text: str) -> List[float]:
+        if self.batcher:
+            return await asyncio.wrap_future(self.batcher.submit(text))
+        return (await self._aembed([text]))[0]
+
+    async def agenerate_batch_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Async variant of generate_batch_embeddings"""
+        if any(not text or not text.strip() for text in texts):
+            logger.error("Empty text provided for embedding")
+            raise ValueError("Text cannot be empty")
+
+        if not texts:
+            return []
+        if self.batcher:
+            futures = [asyncio.wrap_future(self.batcher.submit(text)) for text in texts]
+            return list(await asyncio.gather(*futures))
+        return await self._aembed(texts)
 
 
 # Singleton instance
-embedding_service = EmbeddingService()
\ No newline at end of file
+embedding_service = EmbeddingService()
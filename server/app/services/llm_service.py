@@ -1,7 +1,20 @@
 import os
-from groq import Groq
-from typing import List, Dict, Any
-from tenacity import retry, wait_exponential, stop_after_attempt
+from groq import Groq, AsyncGroq
+from typing import AsyncIterator, List, Dict, Any, Optional
+from tenacity import RetryCallState, retry, wait_exponential, stop_after_attempt
+from app.core.deadline import Deadline
+from app.core.http_clients import http_clients
+from app.core.settings import get_settings
+from app.utils.exceptions import LLMReasoningError
+
+
+def _out_of_time(retry_state: RetryCallState) -> bool:
+    """Stop retrying when the caller's deadline leaves no room for the backoff plus another attempt"""
+    deadline: Optional[Deadline] = retry_state.kwargs.get("deadline")
+    if deadline is None:
+        return False
+    needed_ms = (retry_state.upcoming_sleep or 0) * 1000 + get_settings().query_answer_min_ms
+    return deadline.remaining_ms() < needed_ms
 
 
 class LLMService:
@@ -12,9 +25,97 @@ class LLMService:
         if not api_key:
             raise ValueError("GROQ_API_KEY not set in environment")
         
-        self.client = Groq(api_key=api_key)
+        self.api_key = api_key
+        self.client = Groq(api_key=api_key, http_client=http_clients.get_sync("groq"))
+        self._async_client: Optional[AsyncGroq] = None
         self.model = "llama-3.1-8b-instant"  
     
+    @property
+    def async_client(self) -> AsyncGroq:
+        """Async Groq client on the shared connection pool (created on first use)"""
+        if self._async_client is None:
+            self._async_client = AsyncGroq(api_key=self.api_key, http_client=http_clients.get_async("groq"))
+        return self._async_client
+    
+    def _no_notes_response(self) -> Dict[str, Any]:
+        return {
+            "answer": "I couldn't find any relevant notes to answer your question. Try adding more notes or rephrasing your query.",
+            "cited_notes": []
+        }
+    
+    @staticmethod
+    def note_body(note: Dict[str, Any]) -> str:
+        """Text of a note as it appears in the prompt"""
+        # Long notes are represented by their best-matching passages only
+        passages = note.get('passages')
+        return "\n[...]\n".join(passages) if passages else note['content']
+    
+    @staticmethod
+    def format_note(i: int, note: Dict[str, Any], body: str) -> str:
+        # Keyword-only matches have a text rank instead of a similarity
+        if note.get('similarity_score') is None:
+            match = f"Keyword match: {note.get('text_rank')}"
+        else:
+            match = f"Similarity: {note['similarity_score']}"
+        return (
+            f"Note {i} ({match}):\n"
+            f"Title: {note['title']}\n"
+            f"Content: {body}\n"
+            f"Tags: {', '.join(note['tags'])}"
+        )
+    
+    def build_messages(self, query: str, retrieved_notes: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """Format retrieved notes into the chat prompt"""
+        # Format context from retrieved notes
+        context = "\n\n".join(
+            self.format_note(i, note, self.note_body(note)) for i, note in enumerate(retrieved_notes, 1)
+        )
+        
+        # Prompt
+        prompt = f"""You are a helpful assistant that synthesizes information from personal notes.
+
+            Retrieved Notes:
+            {context}
+
+            User Question: {query}
+
+            Instructions:
+            1. Answer the question using ONLY information from the notes above
+            2. Cite specific notes by their TITLE when making claims (e.g., "According to 'Python Tips'..." or "'Database Design' mentions...")
+            3. If notes don't fully answer the question, acknowledge limitations
+            4. Keep the answer concise and well-organized
+            5. Do not mention internal IDs or system metadata
+            6. Use a friendly, conversational tone
+
+            Answer:"""
+
+        return [
+            {
+                "role": "system",
+                "content": "You are a personal knowledge assistant that helps users understand their own notes."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+    
+    def cited_notes(self, answer: str, retrieved_notes: List[Dict[str, Any]]) -> List[str]:
+        """Extract cited note IDs (simple heuristic: look for "Note X" patterns)"""
+        cited_notes = []
+        for i, note in enumerate(retrieved_notes, 1):
+            if f"Note {i}" in answer:
+                cited_notes.append(str(note['id']))
+        return cited_notes
+    
+    def _parse_response(self, response, retrieved_notes: List[Dict[str, Any]]) -> Dict[str, Any]:
+        answer = response.choices[0].message.content.strip() if response.choices[0].message.content else "Sorry, I couldn't generate a response."
+        
+        return {
+            "answer": answer,
+            "cited_notes": self.cited_notes(answer, retrieved_notes)
+        }
+    
     @retry(wait=wait_exponential(min=1, max=10), stop=stop_after_attempt(3))
     def reason_over_notes(
         self,
@@ -27,79 +128,169 @@ class LLMService:
         Args:
             query: User's original question
             retrieved_notes: List of note dicts with title, content, similarity
+                (and optional 'passages' used in place of the full content)
             max_tokens: Maximum response length
         Returns:
             Dict with 'answer' and 'cited_notes' (list of note IDs used)
         """
         if not retrieved_notes:
-            return {
-                "answer": "I couldn't find any relevant notes to answer your question. Try adding more notes or rephrasing your query.",
-                "cited_notes": []
+            return self._no_notes_response()
+
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=self.build_messages(query, retrieved_notes),  # type: ignore
+                temperature=0.4,
+                max_tokens=max_tokens,
+                top_p=0.2
+            )
+            return self._parse_response(response, retrieved_notes)
+        
+        except Exception as e:
+            raise Exception(f"LLM reasoning failed: {str(e)}")
+    
+    @staticmethod
+    def _summary_messages(title: str, content: str) -> List[Dict[str, str]]:
+        return [
+            {
+                "role": "system",
+                "content": "You condense personal notes into short summaries that another assistant will answer questions from."
+            },
+            {
+                "role": "user",
+                "content": (
+                    "Summarize this note in at most a few sentences. Keep names, numbers, dates, "
+                    "decisions and other specific facts someone might ask about. "
+                    "Reply with the summary only.\n\n"
+                    f"Title: {title}\n"
+                    f"Content: {content}"
+                )
             }
+        ]
+    
+    @staticmethod
+    def _summary_text(response) -> str:
+        summary = (response.choices[0].message.content or "").strip()
+        if not summary:
+            raise LLMReasoningError("Note summarization returned no text")
+        return summary
+    
+    @retry(wait=wait_exponential(min=1, max=10), stop=stop_after_attempt(3), reraise=True)
+    def summarize_note(self, title: str, content: str, max_tokens: int = 150) -> str:
+        """
+        Compact summary of a note for use in prompts (blocking; scripts outside the app)
+        Args:
+            title: Note title
+            content: Note body
+            max_tokens: Maximum summary length
+        Returns:
+            Summary text
+        """
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=self._summary_messages(title, content),  # type: ignore
+                temperature=0.2,
+                max_tokens=max_tokens
+            )
+        except Exception as e:
+            raise LLMReasoningError(f"Note summarization failed: {str(e)}")
+        return self._summary_text(response)
+    
+    async def asummarize_note(self, title: str, content: str, max_tokens: int = 150) -> str:
+        """
+        summarize_note on the async client (background worker, through groq_scheduler)
         
-        # Format context from retrieved notes
-        context_parts = []
-        for i, note in enumerate(retrieved_notes, 1):
-            context_parts.append(
-                f"Note {i} (Similarity: {note['similarity_score']}):\n"
-                f"Title: {note['title']}\n"
-                f"Content: {note['content']}\n"
-                f"Tags: {', '.join(note['tags'])}"
+        Not retried here: a backoff would hold a scheduler slot, and the worker
+        retries failed notes on later polls (NOTE_SUMMARY_MAX_ATTEMPTS).
+        """
+        try:
+            response = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=self._summary_messages(title, content),  # type: ignore
+                temperature=0.2,
+                max_tokens=max_tokens
             )
+        except Exception as e:
+            raise LLMReasoningError(f"Note summarization failed: {str(e)}")
+        return self._summary_text(response)
+    
+    async def astream_answer(
+        self,
+        query: str,
+        retrieved_notes: List[Dict[str, Any]],
+        max_tokens: int = 500
+    ) -> AsyncIterator[str]:
+        """
+        Stream the synthesized answer as Groq generates it
+        Args:
+            query: User's original question
+            retrieved_notes: Same note dicts as reason_over_notes
+            max_tokens: Maximum response length
+        Yields:
+            Answer text fragments, in order
         
-        context = "\n\n".join(context_parts)
+        Not retried: fragments already sent to the client cannot be taken back.
+        Closing the generator (client disconnect) closes the Groq stream.
+        """
+        if not retrieved_notes:
+            yield self._no_notes_response()["answer"]
+            return
         
-        # Prompt
-        prompt = f"""You are a helpful assistant that synthesizes information from personal notes.
-
-            Retrieved Notes:
-            {context}
-
-            User Question: {query}
-
-            Instructions:
-            1. Answer the question using ONLY information from the notes above
-            2. Cite specific notes by their TITLE when making claims (e.g., "According to 'Python Tips'..." or "'Database Design' mentions...")
-            3. If notes don't fully answer the question, acknowledge limitations
-            4. Keep the answer concise and well-organized
-            5. Do not mention internal IDs or system metadata
-            6. Use a friendly, conversational tone
-
-            Answer:"""
+        try:
+            stream = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=self.build_messages(query, retrieved_notes),  # type: ignore
+                temperature=0.4,
+                max_tokens=max_tokens,
+                top_p=0.2,
+                stream=True
+            )
+        except Exception as e:
+            raise LLMReasoningError(f"LLM reasoning failed: {str(e)}")
+        
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            raise LLMReasoningError(f"LLM streaming failed: {str(e)}")
+        finally:
+            await stream.close()
+    
+    @retry(wait=wait_exponential(min=1, max=10), stop=stop_after_attempt(3) | _out_of_time, reraise=True)
+    async def areason_over_notes(
+        self,
+        query: str,
+        retrieved_notes: List[Dict[str, Any]],
+        max_tokens: int = 500,
+        deadline: Optional[Deadline] = None
+    ) -> Dict[str, Any]:
+        """
+        Async variant of reason_over_notes (awaits Groq, no threadpool worker held)
+        
+        With a deadline (pass it by keyword), each attempt is limited to the time
+        left, the client's own retries are off, and a retry is only made if its
+        backoff still leaves QUERY_ANSWER_MIN_MS.
+        """
+        if not retrieved_notes:
+            return self._no_notes_response()
 
+        client = self.async_client
+        if deadline is not None:
+            client = client.with_options(timeout=deadline.remaining(), max_retries=0)
         try:
-            response = self.client.chat.completions.create(
+            response = await client.chat.completions.create(
                 model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a personal knowledge assistant that helps users understand their own notes."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
+                messages=self.build_messages(query, retrieved_notes),  # type: ignore
                 temperature=0.4,
                 max_tokens=max_tokens,
                 top_p=0.2
             )
-            
-            answer = response.choices[0].message.content.strip() if response.choices[0].message.content else "Sorry, I couldn't generate a response."
-            
-            # Extract cited note IDs (simple heuristic: look for "Note X" patterns)
-            cited_notes = []
-            for i, note in enumerate(retrieved_notes, 1):
-                if f"Note {i}" in answer:
-                    cited_notes.append(str(note['id']))
-            
-            return {
-                "answer": answer,
-                "cited_notes": cited_notes
-            }
+            return self._parse_response(response, retrieved_notes)
         
         except Exception as e:
-            raise Exception(f"LLM reasoning failed: {str(e)}")
+            raise LLMReasoningError(f"LLM reasoning failed: {str(e)}")
     
     # def generate_follow_up_questions(
     #     self,
@@ -0,0 +1,265 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+from uuid import UUID
+import numpy as np
+from sqlalchemy.orm import Session
+from app.core.metrics import metrics
+from app.core.settings import get_settings
+from app.models.note import Note
+from app.models.note_chunk import NoteChunk
+from app.utils.logger import logger
+
+
+IndexKey = Tuple[str, str]  # (kind, user_id) with kind "notes" or "chunks"
+
+# Approximate per-row bookkeeping cost (UUID objects + list slots)
+_ROW_OVERHEAD_BYTES = 120
+
+
+@dataclass
+class _UserIndex:
+    ids: List[Any]          # note ids ("notes") or chunk ids ("chunks")
+    owners: List[UUID]      # note id each row belongs to
+    matrix: np.ndarray      # (rows, dims) float32, L2-normalized rows
+    loaded_at: float
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes + len(self.ids) * _ROW_OVERHEAD_BYTES
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class MemoryVectorIndex:
+    """
+    In-process exact vector index for active users
+
+    Each (kind, user) entry is a contiguous float32 matrix of normalized
+    embeddings, so top-k is one matmul plus argpartition. Entries are loaded
+    lazily from Postgres, patched or invalidated by NoteService writes, expire
+    after MEMORY_INDEX_TTL_SECONDS (bounding staleness from writes served by
+    other processes), and are evicted LRU once the memory budget is exceeded.
+    """
+
+    def __init__(self, max_memory_bytes: int, ttl_seconds: float, max_rows: int):
+        self.max_memory_bytes = max_memory_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_rows = max_rows
+        self._entries: "OrderedDict[IndexKey, _UserIndex]" = OrderedDict()
+        self._memory_bytes = 0
+        # Bumped by every patch/invalidation; a load started before a bump is discarded
+        self._generations: Dict[IndexKey, int] = {}
+        # Users whose collection exceeded max_rows; searched in Postgres until invalidated
+        self._oversized: Set[IndexKey] = set()
+        self._lock = threading.Lock()
+
+        self.hits = metrics.counter("memory_index_hits", "Searches served by the in-memory vector index")
+        self.loads = metrics.counter("memory_index_loads", "Per-user vector index loads from Postgres")
+        self.evictions = metrics.counter("memory_index_evictions", "Per-user vector indexes evicted (LRU)")
+
+    # Entry management
+
+    def _get(self, key: IndexKey) -> Optional[_UserIndex]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry.loaded_at > self.ttl_seconds:
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _drop(self, key: IndexKey) -> None:
+        """Remove an entry (caller holds the lock)"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= entry.nbytes
+
+    def _store(self, key: IndexKey, entry: _UserIndex) -> None:
+        """Insert/replace an entry and evict LRU entries over budget (caller holds the lock)"""
+        self._drop(key)
+        if entry.nbytes > self.max_memory_bytes:
+            return
+        self._entries[key] = entry
+        self._memory_bytes += entry.nbytes
+
+        evicted = 0
+        while self._memory_bytes > self.max_memory_bytes and self._entries:
+            oldest_key = next(iter(self._entries))
+            self._drop(oldest_key)
+            evicted += 1
+        if evicted:
+            self.evictions.inc(evicted)
+
+    def _bump(self, key: IndexKey) -> None:
+        self._generations[key] = self._generations.get(key, 0) + 1
+        self._oversized.discard(key)
+
+    def _load(self, db: Session, kind: str, user_id: str) -> Optional[_UserIndex]:
+        key = (kind, user_id)
+        with self._lock:
+            if key in self._oversized:
+                return None
+            generation = self._generations.get(key, 0)
+
+        if kind == "notes":
+            query = db.query(Note.id, Note.id, Note.embedding).filter(Note.user_id == user_id, Note.embedding.isnot(None))
+        else:
+            query = db.query(NoteChunk.id, NoteChunk.note_id, NoteChunk.embedding).filter(
+                NoteChunk.user_id == user_id, NoteChunk.embedding.isnot(None)
+            )
+        rows = query.limit(self.max_rows + 1).all()
+
+        if len(rows) > self.max_rows:
+            with self._lock:
+                self._oversized.add(key)
+            logger.info(f"User {user_id} has more than {self.max_rows} {kind}; not indexing in memory")
+            return None
+
+        dims = get_settings().embedding_dimensions
+        matrix = np.empty((len(rows), dims), dtype=np.float32)
+        for i, row in enumerate(rows):
+            matrix[i] = row[2]
+        entry = _UserIndex(
+            ids=[row[0] for row in rows],
+            owners=[row[1] for row in rows],
+            matrix=_normalize(matrix),
+            loaded_at=time.monotonic(),
+        )
+
+        with self._lock:
+            if self._generations.get(key, 0) == generation:
+                self._store(key, entry)
+        self.loads.inc()
+        return entry
+
+    # Search
+
+    def search(
+        self,
+        db: Session,
+        kind: str,
+        user_id: str,
+        query_embedding: List[float],
+        limit: int,
+        similarity_threshold: float = 0.0,
+        exclude_owners: Optional[Set[UUID]] = None,
+        only_owners: Optional[Set[UUID]] = None
+    ) -> Optional[List[Tuple[Any, UUID, float]]]:
+        """
+        Exact top-k over one user's vectors
+        Args:
+            db: Database session (used only to load a cold entry)
+            kind: "notes" or "chunks"
+            user_id: Owner of the vectors
+            query_embedding: Query vector
+            limit: Number of rows to return
+            similarity_threshold: Minimum cosine similarity
+            exclude_owners: Note ids whose rows must be skipped
+            only_owners: If given, only rows of these note ids (search filters)
+        Returns:
+            List of (row id, note id, similarity) ordered by similarity, or
+            None if the user is not indexed in memory (search Postgres instead)
+        """
+        entry = self._get((kind, user_id)) or self._load(db, kind, user_id)
+        if entry is None:
+            return None
+        self.hits.inc()
+        if not entry.ids or limit <= 0:
+            return []
+
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+        similarities = entry.matrix @ query
+
+        valid = similarities > similarity_threshold
+        if exclude_owners:
+            valid &= np.fromiter((owner not in exclude_owners for owner in entry.owners), dtype=bool, count=len(entry.owners))
+        if only_owners is not None:
+            valid &= np.fromiter((owner in only_owners for owner in entry.owners), dtype=bool, count=len(entry.owners))
+        candidates = np.flatnonzero(valid)
+        if len(candidates) > limit:
+            top = np.argpartition(-similarities[candidates], limit - 1)[:limit]
+            candidates = candidates[top]
+        candidates = candidates[np.argsort(-similarities[candidates], kind="stable")]
+
+        return [(entry.ids[i], entry.owners[i], float(similarities[i])) for i in candidates]
+
+    def owners(self, kind: str, user_id: str) -> Optional[Set[UUID]]:
+        """Note ids present in a warm entry (e.g. notes that have chunks)"""
+        entry = self._get((kind, user_id))
+        return set(entry.owners) if entry is not None else None
+
+    # Write-through hooks (called by NoteService / the embedding pipeline after commit)
+
+    def patch_note(self, user_id: str, note_id: UUID, embedding: List[float]) -> None:
+        """Insert or replace one note's vector in a warm entry"""
+        key = ("notes", user_id)
+        vector = _normalize(np.asarray(embedding, dtype=np.float32))
+        with self._lock:
+            self._bump(key)
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            if note_id in entry.owners:
+                matrix = entry.matrix.copy()
+                matrix[entry.owners.index(note_id)] = vector
+                patched = _UserIndex(entry.ids, entry.owners, matrix, entry.loaded_at)
+            else:
+                patched = _UserIndex(
+                    entry.ids + [note_id],
+                    entry.owners + [note_id],
+                    np.vstack([entry.matrix, vector[None, :]]),
+                    entry.loaded_at,
+                )
+            self._store(key, patched)
+
+    def remove_note(self, user_id: str, note_id: UUID) -> None:
+        """Drop a note's rows from warm entries"""
+        with self._lock:
+            for kind in ("notes", "chunks"):
+                key = (kind, user_id)
+                self._bump(key)
+                entry = self._entries.get(key)
+                if entry is None or note_id not in entry.owners:
+                    continue
+                keep = [i for i, owner in enumerate(entry.owners) if owner != note_id]
+                self._store(key, _UserIndex(
+                    [entry.ids[i] for i in keep],
+                    [entry.owners[i] for i in keep],
+                    entry.matrix[keep],
+                    entry.loaded_at,
+                ))
+
+    def invalidate(self, user_id: str, kind: Optional[str] = None) -> None:
+        """Forget a user's entries; the next search reloads them"""
+        with self._lock:
+            for index_kind in ((kind,) if kind else ("notes", "chunks")):
+                key = (index_kind, user_id)
+                self._bump(key)
+                self._drop(key)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "memory_bytes": self._memory_bytes}
+
+
+def _build_memory_index() -> Optional[MemoryVectorIndex]:
+    settings = get_settings()
+    if not settings.memory_index_enabled:
+        return None
+    return MemoryVectorIndex(
+        max_memory_bytes=int(settings.memory_index_memory_mb * 1024 * 1024),
+        ttl_seconds=settings.memory_index_ttl_seconds,
+        max_rows=settings.memory_index_max_rows_per_user,
+    )
+
+
+# Shared instance (None unless MEMORY_INDEX_ENABLED)
+memory_index = _build_memory_index()
@@ -0,0 +1,154 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
+from sqlalchemy import func, select, true
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, aliased
+from app.core.metrics import metrics
+from app.core.settings import get_settings
+from app.models.note import Note, PREVIEW_LOAD_OPTIONS
+from app.models.note_neighbor import NoteNeighbor
+
+
+class NeighborService:
+    """
+    Precomputed related-notes lists (note_neighbors)
+
+    Each note keeps its NOTE_NEIGHBORS_COUNT most similar notes of the same
+    user. When a note's vector changes (or the note is deleted), the lists
+    that can change with it are recomputed in one statement: the note's
+    own list, every list that mentioned it, and the lists of its new
+    neighbours (the notes it is most likely to enter). Lists of more distant
+    notes may miss the change until their next refresh;
+    scripts/backfill_note_neighbors.py rebuilds everything.
+    """
+
+    refreshed = metrics.counter("note_neighbor_lists_refreshed", "Related-note lists recomputed")
+
+    @staticmethod
+    def enabled() -> bool:
+        return get_settings().note_neighbors_enabled
+
+    @staticmethod
+    def refresh(db: Session, note_ids: Iterable[UUID]) -> None:
+        """
+        Recompute the lists of the given notes (caller commits)
+
+        Rows are upserted on (note_id, rank) in key order, then ranks past the
+        new list length are deleted, so concurrent refreshes of overlapping
+        lists wait on each other's row locks instead of both inserting the
+        same keys after a DELETE.
+        """
+        ids = sorted(set(note_ids))
+        if not ids:
+            return
+        count = get_settings().note_neighbors_count
+
+        source = aliased(Note, name="source")
+        candidate = aliased(Note, name="candidate")
+        distance = candidate.embedding.cosine_distance(source.embedding)
+        # Per source note: an index-served `ORDER BY distance LIMIT count` over the same user's notes
+        nearest = (
+            select(candidate.id.label("neighbor_id"), distance.label("distance"))
+            .where(
+                candidate.user_id == source.user_id,
+                candidate.id != source.id,
+                candidate.embedding.isnot(None),
+            )
+            .order_by(distance)
+            .limit(count)
+            .correlate(source)
+            .lateral("nearest")
+        )
+        rows = (
+            select(
+                source.id,
+                func.row_number().over(partition_by=source.id, order_by=nearest.c.distance),
+                nearest.c.neighbor_id,
+                source.user_id,
+                1 - nearest.c.distance,
+            )
+            .select_from(source)
+            .join(nearest, true())
+            .where(source.id.in_(ids), source.embedding.isnot(None))
+            .order_by(source.id, nearest.c.distance)
+        )
+        upsert = insert(NoteNeighbor).from_select(
+            ["note_id", "rank", "neighbor_id", "user_id", "similarity"], rows
+        )
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[NoteNeighbor.note_id, NoteNeighbor.rank],
+            set_={
+                "neighbor_id": upsert.excluded.neighbor_id,
+                "user_id": upsert.excluded.user_id,
+                "similarity": upsert.excluded.similarity,
+            },
+        ).returning(NoteNeighbor.note_id, NoteNeighbor.rank)
+
+        lengths: Dict[UUID, int] = {}
+        for note_id, rank in db.execute(upsert):
+            lengths[note_id] = max(rank, lengths.get(note_id, 0))
+        # Drop what is left of longer old lists (all of it for notes without a vector)
+        by_length: Dict[int, List[UUID]] = defaultdict(list)
+        for note_id in ids:
+            by_length[lengths.get(note_id, 0)].append(note_id)
+        for length, group in by_length.items():
+            db.query(NoteNeighbor).filter(
+                NoteNeighbor.note_id.in_(group), NoteNeighbor.rank > length
+            ).delete(synchronize_session=False)
+        NeighborService.refreshed.inc(len(ids))
+
+    @staticmethod
+    def referrers(db: Session, note_ids: Iterable[UUID]) -> Set[UUID]:
+        """Notes whose lists mention any of the given notes"""
+        ids = list(note_ids)
+        if not ids:
+            return set()
+        rows = db.query(NoteNeighbor.note_id).filter(NoteNeighbor.neighbor_id.in_(ids)).distinct().all()
+        return {row[0] for row in rows}
+
+    @staticmethod
+    def on_notes_changed(db: Session, note_ids: Iterable[UUID]) -> None:
+        """Maintain lists after the given notes got new vectors (same transaction as the write)"""
+        if not NeighborService.enabled():
+            return
+        ids = set(note_ids)
+        if not ids:
+            return
+        stale = NeighborService.referrers(db, ids)
+        NeighborService.refresh(db, ids)
+        new_neighbors = {
+            row[0]
+            for row in db.query(NoteNeighbor.neighbor_id).filter(NoteNeighbor.note_id.in_(ids)).all()
+        }
+        NeighborService.refresh(db, (stale | new_neighbors) - ids)
+
+    @staticmethod
+    def lookup(
+        db: Session,
+        note_id: UUID,
+        user_id: str,
+        limit: int,
+        similarity_threshold: float = 0.0,
+        preview: bool = False
+    ) -> Optional[List[Tuple[Note, float]]]:
+        """
+        Stored related notes (one index range scan on note_neighbors)
+        Returns:
+            List of (Note, similarity_score) tuples, most similar first
+            (possibly empty after the threshold); None if the note has no stored list
+        """
+        query = (
+            db.query(Note, NoteNeighbor.similarity)
+            .join(NoteNeighbor, NoteNeighbor.neighbor_id == Note.id)
+            .filter(NoteNeighbor.note_id == note_id, NoteNeighbor.user_id == user_id)
+            .order_by(NoteNeighbor.rank)
+            .limit(limit)
+        )
+        if preview:
+            query = query.options(*PREVIEW_LOAD_OPTIONS)
+        rows = query.all()
+        if not rows:
+            return None
+        # Ranks follow similarity, so the threshold keeps a prefix of the list
+        return [(note, float(similarity)) for note, similarity in rows if similarity > similarity_threshold]
@@ -1,36 +1,156 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import desc, func
-from typing import List, Optional
-from uuid import UUID
-from app.models.note import Note
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID, uuid4
+from app.core.bulkhead import embedding_bulkhead, database_bulkhead
+from app.core.settings import get_settings
+from app.models.note import Note, PREVIEW_LOAD_OPTIONS
 from app.schemas.note import NoteCreate, NoteUpdate
 from app.services.embedding_service import embedding_service
+from app.services.embedding_pipeline import embedding_pipeline
+from app.services.chunk_service import ChunkPlan, ChunkService
+from app.services.memory_index import memory_index
+from app.services.neighbor_service import NeighborService
+from app.services.vector_service import vector_service
+from app.services.search_cache import search_cache
+from app.services.answer_cache import answer_cache
 
 
 class NoteService:
     """Logic for note operations"""
     
     @staticmethod
-    def create_note(db: Session, note_data: NoteCreate, user_id: str) -> Note:
-        """Create new note with embedding for specific user"""
-        # Combine title and content for embedding
-        text_to_embed = f"{note_data.title}\n{note_data.content}"
-        
-        # Generate embedding
-        embedding = embedding_service.generate_embedding(text_to_embed)
-        
+    def _plan_chunks(
+        db: Optional[Session],
+        note_id: UUID,
+        user_id: str,
+        title: str,
+        content: str,
+        embedding: List[float]
+    ) -> Optional[ChunkPlan]:
+        """
+        Chunks of a note about to be written, with the changed ones embedded
+        (before the write transaction; db=None for a new note)
+        """
+        if not get_settings().chunking_enabled:
+            return None
+        plan = ChunkService.plan(db, note_id, user_id, title, content, note_embedding=embedding)
+        ChunkService.embed_plans([plan])
+        return plan
+    
+    @staticmethod
+    async def _aplan_chunks(
+        db: Optional[Session],
+        note_id: UUID,
+        user_id: str,
+        title: str,
+        content: str,
+        embedding: List[float]
+    ) -> Optional[ChunkPlan]:
+        """Async variant of _plan_chunks: reads on the database bulkhead, embeds on the embedding bulkhead"""
+        if not get_settings().chunking_enabled:
+            return None
+        if db is None:
+            plan = await embedding_bulkhead.run_sync(
+                ChunkService.plan, None, note_id, user_id, title, content, embedding
+            )
+        else:
+            plan = await database_bulkhead.run_sync(
+                ChunkService.plan, db, note_id, user_id, title, content, embedding
+            )
+        if plan.to_embed:
+            await embedding_bulkhead.run(ChunkService.aembed_plans, [plan])
+        else:
+            ChunkService.embed_plans([plan])  # nothing to embed; counts the reused chunks
+        return plan
+    
+    @staticmethod
+    def _bump_write_version(user_id: str, changed_note_ids: Iterable[UUID] = ()) -> None:
+        """Invalidate the user's cached search results, and cached answers built on changed notes (after commit)"""
+        if search_cache is not None:
+            search_cache.bump(user_id)
+        if answer_cache is not None and changed_note_ids:
+            answer_cache.forget_notes(user_id, changed_note_ids)
+    
+    @staticmethod
+    def _patch_memory_index(note: Note, embedding: List[float]) -> None:
+        """Write-through for the in-memory vector index (after commit)"""
+        if memory_index is None:
+            return
+        memory_index.patch_note(note.user_id, note.id, embedding)  # type: ignore
+        if get_settings().chunking_enabled:
+            memory_index.invalidate(note.user_id, "chunks")  # type: ignore
+    
+    @staticmethod
+    def _insert_note(
+        db: Session,
+        note_id: UUID,
+        note_data: NoteCreate,
+        user_id: str,
+        embedding: Optional[List[float]],
+        chunk_plan: Optional[ChunkPlan] = None
+    ) -> Note:
+        """Insert note; without an embedding it is queued for the background pipeline"""
         note = Note(
+            id=note_id,
             user_id=user_id,  # Add user_id
             title=note_data.title,
             content=note_data.content,
             tags=note_data.tags,
-            embedding=embedding
+            embedding=embedding,
+            embedding_status="ready" if embedding is not None else "pending"
         )
         db.add(note)
+        db.flush()
+        if embedding is None:
+            embedding_pipeline.enqueue(db, note.id)  # type: ignore
+        else:
+            if chunk_plan is not None:
+                ChunkService.apply(db, chunk_plan)
+            NeighborService.on_notes_changed(db, [note.id])  # type: ignore
         db.commit()
         db.refresh(note)
+        NoteService._bump_write_version(user_id)
+        if embedding is None:
+            embedding_pipeline.notify()
+        else:
+            NoteService._patch_memory_index(note, embedding)
         return note
     
+    @staticmethod
+    def create_note(db: Session, note_data: NoteCreate, user_id: str) -> Note:
+        """Create new note with embedding for specific user"""
+        # Combine title and content for embedding
+        text_to_embed = f"{note_data.title}\n{note_data.content}"
+        
+        # Generate embedding (unless the background pipeline owns it)
+        note_id = uuid4()
+        embedding = None
+        chunk_plan = None
+        if not embedding_pipeline.enabled:
+            embedding = embedding_service.generate_embedding(text_to_embed)
+            chunk_plan = NoteService._plan_chunks(
+                None, note_id, user_id, note_data.title, note_data.content, embedding
+            )
+        
+        return NoteService._insert_note(db, note_id, note_data, user_id, embedding, chunk_plan)
+    
+    @staticmethod
+    async def acreate_note(db: Session, note_data: NoteCreate, user_id: str) -> Note:
+        """Async variant of create_note: awaits the embedding, runs DB work in the threadpool"""
+        text_to_embed = f"{note_data.title}\n{note_data.content}"
+        note_id = uuid4()
+        embedding = None
+        chunk_plan = None
+        if not embedding_pipeline.enabled:
+            embedding = await embedding_bulkhead.run(embedding_service.agenerate_embedding, text_to_embed)
+            chunk_plan = await NoteService._aplan_chunks(
+                None, note_id, user_id, note_data.title, note_data.content, embedding
+            )
+        return await database_bulkhead.run_sync(
+            NoteService._insert_note, db, note_id, note_data, user_id, embedding, chunk_plan
+        )
+    
     @staticmethod
     def get_note(db: Session, note_id: UUID, user_id: str) -> Optional[Note]:
         """Get single note by ID (must belong to user)"""
@@ -45,46 +165,118 @@ class NoteService:
         user_id: str,  # Add user_id parameter
         skip: int = 0, 
         limit: int = 20,
-        tag: Optional[str] = None
+        tag: Optional[str] = None,
+        preview: bool = False
     ) -> tuple[List[Note], int]:
-        """Get paginated notes for specific user with optional tag filter"""
+        """
+        Get paginated notes for specific user with optional tag filter
+        (preview=True loads content_preview instead of the full content)
+        """
         query = db.query(Note).filter(Note.user_id == user_id)
         
         if tag:
             query = query.filter(Note.tags.contains([tag]))
         
-        total = query.count()
+        # count(id) directly; Query.count() would wrap a SELECT of every column
+        total = query.with_entities(func.count(Note.id)).scalar()
+        if preview:
+            query = query.options(*PREVIEW_LOAD_OPTIONS)
         notes = query.order_by(desc(Note.created_at)).offset(skip).limit(limit).all()
         
         return notes, total
     
+    @staticmethod
+    def _text_to_embed_after_update(note: Note, update_data: Dict[str, Any]) -> Optional[str]:
+        """
+        Text to re-embed after applying update_data, or None if the embedded text is unchanged
+        (reads loaded columns only: safe on the event loop)
+        """
+        previous_text = f"{note.title}\n{note.content}"
+        text_to_embed = f"{update_data.get('title', note.title)}\n{update_data.get('content', note.content)}"
+        # embedding_status rather than the deferred vector, which would lazy-load
+        if text_to_embed != previous_text or note.embedding_status != "ready":
+            return text_to_embed
+        return None
+    
+    @staticmethod
+    def _apply_update(
+        db: Session,
+        note: Note,
+        update_data: Dict[str, Any],
+        needs_embedding: bool,
+        embedding: Optional[List[float]],
+        chunk_plan: Optional[ChunkPlan] = None
+    ) -> Note:
+        for field, value in update_data.items():
+            setattr(note, field, value)
+        
+        if embedding is not None:
+            note.embedding = embedding  # type: ignore
+            note.embedding_status = "ready"  # type: ignore
+            if chunk_plan is not None:
+                ChunkService.apply(db, chunk_plan)
+            db.flush()
+            NeighborService.on_notes_changed(db, [note.id])  # type: ignore
+        elif needs_embedding:
+            # Previous vector keeps serving search until the worker backfills
+            note.embedding_status = "pending"  # type: ignore
+            embedding_pipeline.enqueue(db, note.id)  # type: ignore
+        
+        db.commit()
+        db.refresh(note)
+        NoteService._bump_write_version(note.user_id, [note.id])  # type: ignore
+        if needs_embedding and embedding is None:
+            embedding_pipeline.notify()
+        elif embedding is not None:
+            NoteService._patch_memory_index(note, embedding)
+        return note
+    
     @staticmethod
     def update_note(db: Session, note_id: UUID, note_data: NoteUpdate, user_id: str) -> Optional[Note]:
         """Update existing note (must belong to user) and regenerate embedding if content changed"""
-        note = db.query(Note).filter(
-            Note.id == note_id,
-            Note.user_id == user_id
-        ).first()
+        note = NoteService.get_note(db, note_id, user_id)
         
         if not note:
             return None
         
         update_data = note_data.model_dump(exclude_unset=True)
         
-        # Check if title or content changed (need to regenerate embedding)
-        content_changed = 'title' in update_data or 'content' in update_data
+        # Regenerate embedding only if the embedded text actually changed
+        text_to_embed = NoteService._text_to_embed_after_update(note, update_data)
+        embedding = None
+        chunk_plan = None
+        if text_to_embed and not embedding_pipeline.enabled:
+            embedding = embedding_service.generate_embedding(text_to_embed)
+            chunk_plan = NoteService._plan_chunks(
+                db, note.id, user_id,  # type: ignore
+                update_data.get("title", note.title), update_data.get("content", note.content), embedding
+            )
         
-        for field, value in update_data.items():
-            setattr(note, field, value)
+        return NoteService._apply_update(db, note, update_data, text_to_embed is not None, embedding, chunk_plan)
+    
+    @staticmethod
+    async def aupdate_note(db: Session, note_id: UUID, note_data: NoteUpdate, user_id: str) -> Optional[Note]:
+        """Async variant of update_note"""
+        note = await database_bulkhead.run_sync(NoteService.get_note, db, note_id, user_id)
         
-        # Regenerate embedding if content changed
-        if content_changed:
-            text_to_embed = f"{note.title}\n{note.content}"
-            note.embedding = embedding_service.generate_embedding(text_to_embed)  # type: ignore
+        if not note:
+            return None
         
-        db.commit()
-        db.refresh(note)
-        return note
+        update_data = note_data.model_dump(exclude_unset=True)
+        
+        text_to_embed = NoteService._text_to_embed_after_update(note, update_data)
+        embedding = None
+        chunk_plan = None
+        if text_to_embed and not embedding_pipeline.enabled:
+            embedding = await embedding_bulkhead.run(embedding_service.agenerate_embedding, text_to_embed)
+            chunk_plan = await NoteService._aplan_chunks(
+                db, note.id, user_id,  # type: ignore
+                update_data.get("title", note.title), update_data.get("content", note.content), embedding
+            )
+        
+        return await database_bulkhead.run_sync(
+            NoteService._apply_update, db, note, update_data, text_to_embed is not None, embedding, chunk_plan
+        )
     
     @staticmethod
     def delete_note(db: Session, note_id: UUID, user_id: str) -> bool:
@@ -97,8 +289,15 @@ class NoteService:
         if not note:
             return False
         
+        # Lists that mention the note lose it with the cascade and are refilled
+        referrers = NeighborService.referrers(db, [note_id]) if NeighborService.enabled() else set()
         db.delete(note)
+        db.flush()
+        NeighborService.refresh(db, referrers - {note_id})
         db.commit()
+        NoteService._bump_write_version(user_id, [note_id])
+        if memory_index is not None:
+            memory_index.remove_note(user_id, note_id)
         return True
 
     @staticmethod
@@ -110,8 +309,49 @@ class NoteService:
             .delete(synchronize_session=False)
         )
         db.commit()
+        NoteService._bump_write_version(user_id)
+        if answer_cache is not None:
+            answer_cache.clear_user(user_id)
+        if memory_index is not None:
+            memory_index.invalidate(user_id)
         return deleted_count
     
+    @staticmethod
+    def get_related_notes(
+        db: Session,
+        note_id: UUID,
+        user_id: str,
+        limit: int = 5,
+        similarity_threshold: float = 0.0,
+        preview: bool = False
+    ) -> Optional[List[Tuple[Note, float]]]:
+        """
+        Notes most similar to an existing note, using its stored vector (no embedding call)
+        Returns:
+            List of (Note, similarity_score) tuples, or None if the note does not exist
+        
+        With NOTE_NEIGHBORS_ENABLED the precomputed list is read in a single
+        indexed lookup; otherwise (or for notes without a list yet) the
+        vector index is searched with the note's own embedding.
+        """
+        settings = get_settings()
+        if settings.note_neighbors_enabled and limit <= settings.note_neighbors_count:
+            related = NeighborService.lookup(db, note_id, user_id, limit, similarity_threshold, preview)
+            if related is not None:
+                return related
+        
+        row = db.query(Note.embedding).filter(Note.id == note_id, Note.user_id == user_id).first()
+        if row is None:
+            return None
+        if row.embedding is None:
+            # Still waiting for the embedding pipeline
+            return []
+        
+        results = vector_service.search_similar_notes(
+            db, user_id, list(row.embedding), limit + 1, similarity_threshold, preview
+        )
+        return [(note, similarity) for note, similarity in results if note.id != note_id][:limit]
+    
     @staticmethod
     def get_all_tags(db: Session, user_id: str) -> List[str]:
         """Get all unique tags across user's notes"""
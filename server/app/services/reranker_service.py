@@ -0,0 +1,83 @@
+import time
+from typing import List, Optional
+from app.core.metrics import metrics
+from app.core.settings import get_settings
+from app.services.transformer_encoder import BertEncoder
+from app.utils.logger import logger
+
+
+class RerankerService:
+    """
+    Second-stage relevance scoring with a local cross-encoder
+
+    The bi-encoder compares a query and a note through two independent
+    vectors; a cross-encoder reads them together and orders a small
+    candidate pool much more precisely. Inference runs on the NumPy
+    BertEncoder in batches of similar length (less padding), and stops as
+    soon as the per-request time budget is spent.
+    """
+
+    def __init__(self):
+        settings = get_settings()
+        self.encoder = BertEncoder(settings.reranker_model, max_length=settings.reranker_max_tokens)
+        self.batch_size = max(1, settings.reranker_batch_size)
+        self._failed = False
+
+        self.requests = metrics.counter("rerank_requests", "Candidate pools scored by the cross-encoder")
+        self.fallbacks = metrics.counter(
+            "rerank_fallbacks", "Reranks abandoned (time budget or model unavailable); vector order kept"
+        )
+        self.latency = metrics.histogram(
+            "rerank_latency_ms",
+            buckets=[10, 25, 50, 100, 200, 300, 500, 1000, 2500],
+            description="Cross-encoder scoring time per request (ms)",
+        )
+
+    def warmup(self) -> None:
+        self.encoder.load()
+
+    def score(self, query: str, documents: List[str], budget_ms: float) -> Optional[List[float]]:
+        """
+        Relevance of each document to the query (blocking; run on a worker thread)
+        Args:
+            query: Query text
+            documents: Candidate texts
+            budget_ms: Time allowed for scoring (model loading excluded)
+        Returns:
+            One score per document (higher is more relevant), or None when the
+            budget ran out or the model is unavailable
+        """
+        if self._failed or not documents:
+            return None
+        try:
+            self.encoder.load()
+        except Exception as e:
+            logger.warning(f"Reranker model unavailable, keeping vector order: {str(e)}")
+            self._failed = True
+            self.fallbacks.inc()
+            return None
+
+        started = time.monotonic()
+        deadline = started + budget_ms / 1000
+        # Similar lengths share a batch, so little time goes into padding
+        order = sorted(range(len(documents)), key=lambda i: len(documents[i]))
+        scores: List[float] = [0.0] * len(documents)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            logits = self.encoder.classify([(query, documents[i]) for i in batch])
+            for i, logit in zip(batch, logits[:, 0]):
+                scores[i] = float(logit)
+            # Checked after every batch, so an overrun costs at most one (small) batch
+            if time.monotonic() > deadline:
+                self.fallbacks.inc()
+                scored = start + len(batch)
+                logger.info(f"Rerank budget of {budget_ms:.0f} ms exceeded after {scored}/{len(documents)} candidates")
+                return None
+
+        self.requests.inc()
+        self.latency.observe((time.monotonic() - started) * 1000)
+        return scores
+
+
+# Singleton instance (weights are loaded on first use or at startup warmup)
+reranker_service = RerankerService()
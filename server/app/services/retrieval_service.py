@@ -0,0 +1,468 @@
+import asyncio
+import numpy as np
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+from app.core.bulkhead import embedding_bulkhead, database_bulkhead
+from app.core.deadline import Deadline
+from app.core.settings import get_settings
+from app.core.single_flight import SingleFlight
+from app.models.note import Note
+from app.schemas.search import SearchFilters
+from app.services.embedding_service import embedding_service
+from app.services.reranker_service import reranker_service
+from app.services.search_cache import SearchResultCache, search_cache, snapshot_note
+from app.services.text_search_service import text_search_service
+from app.services.vector_service import vector_service
+from app.utils.logger import logger
+
+# (Note, similarity_score, best passages) as returned by VectorService.search_similar_passages
+Retrieved = Tuple[Note, float, List[str]]
+# Results, degradations and the query vector, as shared by retrieval_flight
+RetrievalResult = Tuple[List[Retrieved], List[str], Optional[List[float]]]
+
+
+def _detached(result: RetrievalResult) -> RetrievalResult:
+    """A retrieval result for other requests: the leader's Notes belong to its own Session"""
+    results, degraded, query_embedding = result
+    return (
+        [(snapshot_note(note), score, list(passages)) for note, score, passages in results],
+        list(degraded),
+        query_embedding,
+    )
+
+
+# Identical concurrent searches (same user and request) share one retrieval
+retrieval_flight = SingleFlight("retrieval", share=_detached)
+
+
+class RetrievalService:
+    """
+    Find a user's notes for a query text
+
+    Modes:
+    - semantic: embedding + vector search (chunk-level when enabled)
+    - lexical: Postgres full-text search only; no embedding call
+    - hybrid: both candidate lists merged with reciprocal rank fusion
+
+    With reranking and/or diversity, a wider candidate pool is retrieved,
+    reordered by the local cross-encoder and then thinned out with maximal
+    marginal relevance. Results are served from the per-user search cache
+    when enabled.
+
+    Under a request Deadline, a query embedding that is not ready within
+    QUERY_EMBEDDING_BUDGET_MS is abandoned for a lexical search, and the
+    rerank budget shrinks to the time left. Such results are not cached.
+    """
+
+    @staticmethod
+    def reciprocal_rank_fusion(rankings: List[List[UUID]], k: int) -> Dict[UUID, float]:
+        """RRF: score(d) = sum over rankings of 1 / (k + rank of d), ranks starting at 1"""
+        scores: Dict[UUID, float] = {}
+        for ranking in rankings:
+            for rank, note_id in enumerate(ranking, 1):
+                scores[note_id] = scores.get(note_id, 0.0) + 1.0 / (k + rank)
+        return scores
+
+    @staticmethod
+    def maximal_marginal_relevance(
+        relevance: Sequence[float],
+        embeddings: np.ndarray,
+        k: int,
+        diversity: float
+    ) -> List[int]:
+        """
+        Greedy MMR: repeatedly pick argmax (1 - diversity) * relevance - diversity * redundancy
+        Args:
+            relevance: Relevance of each candidate to the query
+            embeddings: (candidates, dims) vectors; zero rows are never redundant
+            k: Number of candidates to select
+            diversity: 0 keeps the relevance order, 1 only avoids redundancy
+        Returns:
+            Indices of the selected candidates, in selection order
+        
+        Redundancy is the highest cosine similarity to an already selected
+        candidate; all pairwise similarities come from one matrix product.
+        """
+        count = len(relevance)
+        k = min(k, count)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        unit = embeddings / np.maximum(norms, 1e-12)
+        pairwise = unit @ unit.T
+        
+        weighted_relevance = (1.0 - diversity) * np.asarray(relevance, dtype=np.float32)
+        redundancy = np.zeros(count, dtype=np.float32)
+        available = np.ones(count, dtype=bool)
+        selected: List[int] = []
+        for _ in range(k):
+            scores = np.where(available, weighted_relevance - diversity * redundancy, -np.inf)
+            best = int(np.argmax(scores))
+            selected.append(best)
+            available[best] = False
+            np.maximum(redundancy, pairwise[best], out=redundancy)
+        return selected
+
+    @staticmethod
+    def diversify(
+        db: Session,
+        candidates: List[Retrieved],
+        relevance: Sequence[float],
+        top_k: int,
+        diversity: float
+    ) -> List[Retrieved]:
+        """MMR selection of top_k candidates using their note vectors (one query)"""
+        vectors = vector_service.note_embeddings(db, [note.id for note, _, _ in candidates])  # type: ignore
+        embeddings = np.zeros((len(candidates), get_settings().embedding_dimensions), dtype=np.float32)
+        for i, (note, _, _) in enumerate(candidates):
+            vector = vectors.get(note.id)  # type: ignore
+            if vector is not None:
+                embeddings[i] = vector
+        selected = RetrievalService.maximal_marginal_relevance(relevance, embeddings, top_k, diversity)
+        return [candidates[i] for i in selected]
+
+    @staticmethod
+    def lexical(
+        db: Session,
+        user_id: str,
+        query: str,
+        top_k: int,
+        query_embedding: Optional[List[float]] = None,
+        preview: bool = False,
+        filters: Optional[SearchFilters] = None
+    ) -> List[Retrieved]:
+        """Full-text matches with their matching passages"""
+        settings = get_settings()
+        results = text_search_service.search_notes(db, user_id, query, top_k, query_embedding, preview, filters)
+        passages: Dict[UUID, List[str]] = {}
+        if settings.chunking_enabled:
+            passages = text_search_service.best_passages(
+                db, [note.id for note, _ in results], query, settings.chunk_passages_per_note  # type: ignore
+            )
+        return [(note, score, passages.get(note.id, [])) for note, score in results]  # type: ignore
+
+    @staticmethod
+    def hybrid(
+        db: Session,
+        user_id: str,
+        query: str,
+        query_embedding: List[float],
+        top_k: int,
+        similarity_threshold: float,
+        preview: bool = False,
+        filters: Optional[SearchFilters] = None
+    ) -> List[Retrieved]:
+        """
+        Merge semantic and lexical candidates with reciprocal rank fusion
+        Returns:
+            Top_k notes by fused rank; similarity_score stays the cosine
+            similarity. Keyword matches are kept even below the threshold.
+        """
+        settings = get_settings()
+        candidates = top_k * max(1, settings.hybrid_candidates)
+
+        semantic = vector_service.search_similar_passages(
+            db, user_id, query_embedding, candidates, similarity_threshold, preview, filters
+        )
+        lexical = RetrievalService.lexical(db, user_id, query, candidates, query_embedding, preview, filters)
+
+        fused = RetrievalService.reciprocal_rank_fusion(
+            [[note.id for note, _, _ in semantic], [note.id for note, _, _ in lexical]],  # type: ignore
+            k=settings.hybrid_rrf_k,
+        )
+
+        # Semantic hits carry the passages closest to the query embedding
+        by_id: Dict[UUID, Retrieved] = {item[0].id: item for item in lexical}  # type: ignore
+        by_id.update({item[0].id: item for item in semantic})  # type: ignore
+
+        ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [by_id[note_id] for note_id, _ in ranked]
+
+    @staticmethod
+    async def aretrieve(
+        db: Session,
+        user_id: str,
+        query: str,
+        top_k: int = 5,
+        similarity_threshold: float = 0.0,
+        mode: str = "semantic",
+        preview: bool = False,
+        rerank: Optional[bool] = None,
+        diversity: float = 0.0,
+        filters: Optional[SearchFilters] = None,
+        deadline: Optional[Deadline] = None
+    ) -> List[Retrieved]:
+        """Retrieve notes for a query in the given mode (see aretrieve_with_embedding)"""
+        results, _ = await RetrievalService.aretrieve_with_embedding(
+            db, user_id, query, top_k, similarity_threshold, mode, preview, rerank, diversity, filters, deadline
+        )
+        return results
+    
+    @staticmethod
+    async def aretrieve_with_embedding(
+        db: Session,
+        user_id: str,
+        query: str,
+        top_k: int = 5,
+        similarity_threshold: float = 0.0,
+        mode: str = "semantic",
+        preview: bool = False,
+        rerank: Optional[bool] = None,
+        diversity: float = 0.0,
+        filters: Optional[SearchFilters] = None,
+        deadline: Optional[Deadline] = None
+    ) -> Tuple[List[Retrieved], Optional[List[float]]]:
+        """
+        Retrieve notes for a query in the given mode
+        Args:
+            db: Database session
+            user_id: User ID to filter notes
+            query: Query text
+            top_k: Number of notes to return
+            similarity_threshold: Minimum cosine similarity (semantic candidates only)
+            mode: "semantic", "hybrid" or "lexical"
+            preview: Load content_preview instead of the full content
+            rerank: Rerank with the cross-encoder (None: RERANK_ENABLED)
+            diversity: MMR trade-off between relevance (0) and covering distinct notes (1)
+            filters: Tag/date restrictions, applied inside every candidate search
+            deadline: Request time budget; stages that fall back are recorded on it
+        Returns:
+            List of (Note, similarity_score, passages) tuples, ordered by relevance,
+            and the query vector the search used (None if it used none, or the
+            results came from the search cache). Without a query vector (lexical
+            mode, or a lexical fallback) the score is the normalized text rank,
+            not a cosine similarity.
+        """
+        if rerank is None:
+            rerank = get_settings().rerank_enabled
+        
+        key = SearchResultCache.make_key(
+            user_id, query, top_k, similarity_threshold, mode, preview, rerank, diversity, filters
+        )
+        if search_cache is not None:
+            cached = search_cache.get(key)
+            if cached is not None:
+                return cached, None
+        
+        # Only requests under the same budget share a retrieval: a leader without a deadline never
+        # applies QUERY_EMBEDDING_BUDGET_MS, and a leader with one may return a lexical fallback
+        flight_key = (key, deadline.budget_ms if deadline is not None else None)
+        results, degraded, query_embedding = await retrieval_flight.run(
+            flight_key, RetrievalService._aretrieve_and_cache, key,
+            db, user_id, query, top_k, similarity_threshold, mode, preview, rerank, diversity, filters, deadline
+        )
+        if deadline is not None:
+            deadline.degrade(*degraded)
+        return results, query_embedding
+
+    @staticmethod
+    async def aretrieve_batch(
+        db: Session,
+        user_id: str,
+        queries: List[str],
+        top_k: int = 5,
+        similarity_threshold: float = 0.0,
+        preview: bool = False
+    ) -> List[List[Retrieved]]:
+        """
+        Semantic retrieval (no rerank or diversity) for several queries, in request order
+
+        Each query is looked up in the search cache under the same key as the
+        equivalent /search request; the misses are embedded in one batched call
+        and searched in one statement (VectorService.search_similar_passages_batch).
+        """
+        keys = [
+            SearchResultCache.make_key(user_id, query, top_k, similarity_threshold, "semantic", preview, False, 0.0)
+            for query in queries
+        ]
+        grouped: List[Optional[List[Retrieved]]] = [
+            search_cache.get(key) if search_cache is not None else None for key in keys
+        ]
+        misses = [i for i, results in enumerate(grouped) if results is None]
+        if not misses:
+            return grouped  # type: ignore
+
+        # Read before searching: a write committed meanwhile makes these results unusable
+        version = search_cache.version(user_id) if search_cache is not None else 0
+        query_embeddings = await embedding_bulkhead.run(
+            embedding_service.agenerate_batch_embeddings, [queries[i] for i in misses]
+        )
+        searched = await database_bulkhead.run_sync(
+            vector_service.search_similar_passages_batch,
+            db=db,
+            user_id=user_id,
+            query_embeddings=query_embeddings,
+            top_k=top_k,
+            similarity_threshold=similarity_threshold,
+            preview=preview
+        )
+        for i, results in zip(misses, searched):
+            grouped[i] = results
+            if search_cache is not None:
+                search_cache.put(keys[i], version, results)
+        return grouped  # type: ignore
+
+    @staticmethod
+    async def _aretrieve_and_cache(
+        key: Tuple,
+        db: Session,
+        user_id: str,
+        query: str,
+        top_k: int,
+        similarity_threshold: float,
+        mode: str,
+        preview: bool,
+        rerank: bool,
+        diversity: float,
+        filters: Optional[SearchFilters],
+        deadline: Optional[Deadline]
+    ) -> RetrievalResult:
+        # Read before searching: a write committed meanwhile makes this result unusable
+        version = search_cache.version(user_id) if search_cache is not None else 0
+        results, degraded, query_embedding = await RetrievalService._aretrieve_uncached(
+            db, user_id, query, top_k, similarity_threshold, mode, preview, rerank, diversity, filters, deadline
+        )
+        # A lexical fallback or a rerank that kept vector order is not cached
+        if search_cache is not None and not degraded:
+            search_cache.put(key, version, results)
+        return results, degraded, query_embedding
+    
+    @staticmethod
+    async def _aretrieve_uncached(
+        db: Session,
+        user_id: str,
+        query: str,
+        top_k: int,
+        similarity_threshold: float,
+        mode: str,
+        preview: bool,
+        rerank: bool,
+        diversity: float,
+        filters: Optional[SearchFilters] = None,
+        deadline: Optional[Deadline] = None
+    ) -> Tuple[List[Retrieved], List[str], Optional[List[float]]]:
+        """Results, the stages that fell back to a cheaper result (none: complete), and the query vector"""
+        settings = get_settings()
+        pool = top_k
+        if rerank:
+            pool = max(pool, top_k * max(1, settings.rerank_candidates))
+        if diversity > 0:
+            pool = max(pool, top_k * max(1, settings.mmr_candidates))
+        
+        candidates, degraded, query_embedding = await RetrievalService._asearch(
+            db, user_id, query, pool, similarity_threshold, mode, preview, filters, deadline
+        )
+        if len(candidates) <= 1:
+            return candidates, degraded, query_embedding
+        
+        relevance = [score for _, score, _ in candidates]
+        if rerank:
+            budget_ms = settings.rerank_budget_ms
+            if deadline is not None:
+                budget_ms = deadline.remaining_ms(budget_ms)
+            reranked = await RetrievalService._arerank(query, candidates, preview, budget_ms)
+            if reranked is None:
+                degraded.append("rerank_skipped")
+            else:
+                candidates, relevance = reranked
+        
+        if diversity > 0:
+            candidates = await database_bulkhead.run_sync(
+                RetrievalService.diversify, db, candidates, relevance, top_k, diversity
+            )
+        return candidates[:top_k], degraded, query_embedding
+    
+    @staticmethod
+    def _rerank_text(note: Note, passages: List[str], preview: bool) -> str:
+        """What the cross-encoder reads for a candidate: title plus matched passages or the body"""
+        if passages:
+            body = "\n".join(passages)
+        else:
+            body = note.content_preview if preview else note.content  # type: ignore
+        return f"{note.title}\n{body or ''}"
+    
+    @staticmethod
+    async def _arerank(
+        query: str,
+        candidates: List[Retrieved],
+        preview: bool,
+        budget_ms: float
+    ) -> Optional[Tuple[List[Retrieved], List[float]]]:
+        """
+        Candidates ordered by cross-encoder score, with the scores squashed to 0-1
+        (the relevance used by MMR), or None to keep the vector order
+        """
+        documents = [RetrievalService._rerank_text(note, passages, preview) for note, _, passages in candidates]
+        try:
+            # Also bounds the wait for a bulkhead slot; the abandoned scoring stops after its current batch
+            scores = await asyncio.wait_for(
+                embedding_bulkhead.run_sync(reranker_service.score, query, documents, budget_ms), budget_ms / 1000
+            )
+        except asyncio.TimeoutError:
+            reranker_service.fallbacks.inc()
+            logger.info(f"Rerank not done within {budget_ms:.0f} ms, keeping vector order")
+            return None
+        if scores is None:
+            return None
+        order = sorted(range(len(candidates)), key=lambda i: scores[i], reverse=True)
+        return [candidates[i] for i in order], [float(1.0 / (1.0 + np.exp(-scores[i]))) for i in order]
+    
+    @staticmethod
+    async def _asearch(
+        db: Session,
+        user_id: str,
+        query: str,
+        top_k: int,
+        similarity_threshold: float,
+        mode: str,
+        preview: bool,
+        filters: Optional[SearchFilters] = None,
+        deadline: Optional[Deadline] = None
+    ) -> Tuple[List[Retrieved], List[str], Optional[List[float]]]:
+        degraded: List[str] = []
+        query_embedding = None
+        if mode != "lexical":
+            query_embedding = await RetrievalService.aembed_query(query, deadline)
+            if query_embedding is None:
+                degraded.append("lexical_fallback")
+
+        if query_embedding is None:
+            # Fast path: no embedding call at all
+            results = await database_bulkhead.run_sync(
+                RetrievalService.lexical, db, user_id, query, top_k, None, preview, filters
+            )
+        elif mode == "hybrid":
+            results = await database_bulkhead.run_sync(
+                RetrievalService.hybrid, db, user_id, query, query_embedding, top_k, similarity_threshold, preview,
+                filters
+            )
+        else:
+            results = await database_bulkhead.run_sync(
+                vector_service.search_similar_passages,
+                db=db,
+                user_id=user_id,
+                query_embedding=query_embedding,
+                top_k=top_k,
+                similarity_threshold=similarity_threshold,
+                preview=preview,
+                filters=filters
+            )
+        return results, degraded, query_embedding
+
+    @staticmethod
+    async def aembed_query(query: str, deadline: Optional[Deadline]) -> Optional[List[float]]:
+        """Query vector, or None if it is not ready within the deadline's embedding budget"""
+        if deadline is None:
+            return await embedding_bulkhead.run(embedding_service.agenerate_embedding, query)
+        budget_ms = deadline.remaining_ms(get_settings().query_embedding_budget_ms)
+        try:
+            # Abandoned work still finishes in the background and lands in the embedding cache
+            return await asyncio.wait_for(
+                embedding_bulkhead.run(embedding_service.agenerate_embedding, query), budget_ms / 1000
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Query embedding not ready within {budget_ms:.0f} ms, falling back to lexical search")
+            return None
+
+
+# Singleton instance
+retrieval_service = RetrievalService()
@@ -0,0 +1,175 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import inspect
+from app.core.metrics import metrics
+from app.core.settings import get_settings
+from app.models.note import Note
+from app.schemas.search import SearchFilters
+
+
+# (user_id, mode, normalized query, top_k, min_similarity, preview, rerank, diversity, filters)
+CacheKey = Tuple[str, str, str, int, float, bool, bool, float, str]
+# (Note, similarity_score, passages), as returned by RetrievalService
+CachedResult = Tuple[Note, float, List[str]]
+
+# Columns copied into cached note snapshots (never the vector)
+_SNAPSHOT_FIELDS = (
+    "id", "user_id", "title", "content", "content_preview", "tags",
+    "embedding_status", "created_at", "updated_at",
+)
+
+# Approximate bookkeeping cost per entry and per cached note (objects, dicts, tuples)
+_ENTRY_OVERHEAD_BYTES = 512
+_RESULT_OVERHEAD_BYTES = 1024
+
+
+@dataclass
+class _Entry:
+    version: int
+    results: List[CachedResult]
+    nbytes: int
+    stored_at: float
+
+
+def normalize_query(query: str) -> str:
+    """Case and whitespace insensitive form of a query (the embedding model is uncased)"""
+    return " ".join(query.casefold().split())
+
+
+def snapshot_note(note: Note) -> Note:
+    """Detached copy of the loaded columns, safe to share across sessions and requests"""
+    loaded = inspect(note).dict
+    return Note(**{field: loaded[field] for field in _SNAPSHOT_FIELDS if field in loaded})
+
+
+def _result_bytes(note: Note, passages: List[str]) -> int:
+    text = [note.title, note.content, note.content_preview, *(note.tags or []), *passages]
+    return _RESULT_OVERHEAD_BYTES + sum(len(value) for value in text if value)
+
+
+class SearchResultCache:
+    """
+    Per-user cache of retrieval results
+
+    Every entry records the user's write version when its search started.
+    NoteService (and the embedding pipeline) bump the version after each
+    committed write, so a lookup never returns results older than the
+    user's last write in this process. Entries also expire after
+    SEARCH_CACHE_TTL_SECONDS (bounding staleness from writes handled by other
+    worker processes) and are evicted LRU once the memory budget is exceeded.
+    """
+
+    def __init__(self, max_memory_bytes: int, ttl_seconds: float):
+        self.max_memory_bytes = max_memory_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        self._memory_bytes = 0
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        self.hits = metrics.counter("search_cache_hits", "Searches served from the result cache")
+        self.misses = metrics.counter("search_cache_misses", "Searches that ran retrieval")
+        self.evictions = metrics.counter("search_cache_evictions", "Result cache LRU evictions")
+        metrics.gauge("search_cache_hit_ratio", self.hit_ratio, "Share of searches served from the result cache")
+
+    @staticmethod
+    def make_key(
+        user_id: str,
+        query: str,
+        top_k: int,
+        min_similarity: float,
+        mode: str,
+        preview: bool,
+        rerank: bool,
+        diversity: float,
+        filters: Optional[SearchFilters] = None
+    ) -> CacheKey:
+        return (
+            user_id, mode, normalize_query(query), top_k, round(min_similarity, 6), preview, rerank, round(diversity, 6),
+            filters.model_dump_json() if filters is not None and not filters.is_empty else "",
+        )
+
+    # Write versions
+
+    def version(self, user_id: str) -> int:
+        """Current write version; read it before searching and pass it to put()"""
+        with self._lock:
+            return self._versions.get(user_id, 0)
+
+    def bump(self, user_id: str) -> None:
+        """Invalidate every cached result of a user (call after the write commits)"""
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+
+    # Entries
+
+    def _drop(self, key: CacheKey) -> None:
+        """Remove an entry (caller holds the lock)"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= entry.nbytes
+
+    def get(self, key: CacheKey) -> Optional[List[CachedResult]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (
+                entry.version != self._versions.get(key[0], 0)
+                or time.monotonic() - entry.stored_at > self.ttl_seconds
+            ):
+                self._drop(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is None:
+            self.misses.inc()
+            return None
+        self.hits.inc()
+        return list(entry.results)
+
+    def put(self, key: CacheKey, version: int, results: List[CachedResult]) -> None:
+        """Store results computed at `version`; dropped if the user wrote since"""
+        snapshots = [(snapshot_note(note), similarity, list(passages)) for note, similarity, passages in results]
+        nbytes = _ENTRY_OVERHEAD_BYTES + sum(_result_bytes(note, passages) for note, _, passages in snapshots)
+        if nbytes > self.max_memory_bytes:
+            return
+
+        evicted = 0
+        with self._lock:
+            if version != self._versions.get(key[0], 0):
+                return
+            self._drop(key)
+            self._entries[key] = _Entry(version, snapshots, nbytes, time.monotonic())
+            self._memory_bytes += nbytes
+
+            while self._memory_bytes > self.max_memory_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+                evicted += 1
+
+        if evicted:
+            self.evictions.inc(evicted)
+
+    def hit_ratio(self) -> float:
+        lookups = self.hits.value + self.misses.value
+        return round(self.hits.value / lookups, 4) if lookups else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {"entries": len(self._entries), "memory_bytes": self._memory_bytes, "hit_ratio": self.hit_ratio()}
+
+
+def _build_search_cache() -> Optional[SearchResultCache]:
+    settings = get_settings()
+    if not settings.search_cache_enabled:
+        return None
+    return SearchResultCache(
+        max_memory_bytes=int(settings.search_cache_memory_mb * 1024 * 1024),
+        ttl_seconds=settings.search_cache_ttl_seconds,
+    )
+
+
+# Shared instance (None when SEARCH_CACHE_ENABLED=false)
+search_cache = _build_search_cache()
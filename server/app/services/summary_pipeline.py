@@ -0,0 +1,265 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+from sqlalchemy import func, or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.core.database import SessionLocal
+from app.core.metrics import metrics
+from app.core.scheduler import SUMMARY_TENANT, groq_scheduler
+from app.core.settings import get_settings
+from app.models.note import Note
+from app.models.note_summary import NoteSummary
+from app.services.llm_service import llm_service
+from app.utils.exceptions import BulkheadFullError, UserQueueFullError
+from app.utils.logger import logger
+
+# Leading characters of a note sent to the LLM for summarization
+_SUMMARY_INPUT_CHARS = 16000
+
+
+def content_hash(title: str, content: str) -> str:
+    return hashlib.sha256(f"{title}\n{content}".encode("utf-8")).hexdigest()
+
+
+def _sql_content_hash():
+    """content_hash() computed by Postgres"""
+    return func.encode(func.sha256(func.convert_to(Note.title + "\n" + Note.content, "UTF8")), "hex")
+
+
+@dataclass
+class _Candidate:
+    note_id: UUID
+    user_id: str
+    title: str
+    content: str
+    content_hash: str
+    attempts: int
+
+
+class SummaryPipeline:
+    """
+    Background summaries of long notes (note_summaries)
+
+    A worker thread polls for notes of at least NOTE_SUMMARY_MIN_CHARS that
+    were edited since it last looked at them (and not within the last
+    NOTE_SUMMARY_SETTLE_SECONDS, so a note being typed is summarized once).
+    Claiming a note records its updated_at; the LLM is only called when the
+    hash of the title and content differs from the stored summary's, so tag
+    edits cost nothing. A summary is stored only if the note still has the
+    summarized text, and is only used while its hash matches the note.
+
+    A note whose summarization fails is retried up to
+    NOTE_SUMMARY_MAX_ATTEMPTS times, then left unsummarized until its next
+    edit (or scripts/backfill_note_summaries.py --retry-failed).
+
+    Inside the app, LLM calls go through groq_scheduler on the app's event
+    loop as one low-weight tenant (NOTE_SUMMARY_SCHEDULER_WEIGHT), so
+    summaries only use Groq capacity that interactive requests leave free.
+    A batch the scheduler rejects is handed back without counting as an
+    attempt.
+    """
+
+    def __init__(self):
+        self.settings = get_settings()
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop = threading.Event()
+
+        self.generated = metrics.counter("note_summaries_generated", "Note summaries written by the LLM")
+        self.unchanged = metrics.counter(
+            "note_summaries_unchanged", "Edited notes whose summarized text was unchanged (no LLM call)"
+        )
+        self.failed = metrics.counter("note_summaries_failed", "Note summarizations that failed")
+
+    @property
+    def enabled(self) -> bool:
+        return self.settings.note_summaries_enabled
+
+    @staticmethod
+    def lookup(db: Session, notes: Iterable[Note]) -> Dict[UUID, str]:
+        """Current summaries of the given notes (notes without one, or edited since, are left out)"""
+        hashes = {note.id: content_hash(note.title, note.content) for note in notes}  # type: ignore
+        if not hashes:
+            return {}
+        rows = (
+            db.query(NoteSummary.note_id, NoteSummary.content_hash, NoteSummary.summary)
+            .filter(NoteSummary.note_id.in_(list(hashes)), NoteSummary.summary.isnot(None))
+            .all()
+        )
+        return {row.note_id: row.summary for row in rows if hashes.get(row.note_id) == row.content_hash}
+
+    def _claim(
+        self,
+        limit: int,
+        settle_seconds: float,
+        user_id: Optional[str] = None,
+        retry_failed: bool = False
+    ) -> Tuple[int, List[_Candidate]]:
+        """Mark up to `limit` due notes as checked; returns how many, and those whose text needs a new summary"""
+        settled_before = datetime.now(timezone.utc) - timedelta(seconds=settle_seconds)
+        edited_at = func.coalesce(Note.updated_at, Note.created_at)
+        due = or_(NoteSummary.note_id.is_(None), NoteSummary.checked_at.is_(None), NoteSummary.checked_at < edited_at)
+        if retry_failed:
+            # Also notes given up on: their summary is missing or older than their text
+            due = or_(due, NoteSummary.content_hash.is_(None), NoteSummary.content_hash != _sql_content_hash())
+
+        with SessionLocal() as db:
+            query = (
+                db.query(
+                    Note.id, Note.user_id, Note.title, Note.content, edited_at.label("edited_at"),
+                    NoteSummary.content_hash, NoteSummary.attempts
+                )
+                .outerjoin(NoteSummary, NoteSummary.note_id == Note.id)
+                .filter(func.length(Note.content) >= self.settings.note_summary_min_chars, edited_at <= settled_before, due)
+            )
+            if user_id is not None:
+                query = query.filter(Note.user_id == user_id)
+            rows = query.order_by(edited_at).limit(limit).with_for_update(skip_locked=True, of=Note).all()
+            if not rows:
+                return 0, []
+
+            candidates = []
+            for row in rows:
+                db.execute(
+                    insert(NoteSummary)
+                    .values(note_id=row.id, user_id=row.user_id, checked_at=row.edited_at)
+                    .on_conflict_do_update(index_elements=[NoteSummary.note_id], set_={"checked_at": row.edited_at})
+                )
+                current = content_hash(row.title, row.content)
+                if current == row.content_hash:
+                    self.unchanged.inc()
+                    continue
+                candidates.append(_Candidate(
+                    note_id=row.id,
+                    user_id=row.user_id,
+                    title=row.title,
+                    content=row.content,
+                    content_hash=current,
+                    attempts=row.attempts or 0,
+                ))
+            db.commit()
+            return len(rows), candidates
+
+    def _store(self, candidate: _Candidate, summary: str) -> None:
+        with SessionLocal() as db:
+            note = db.query(Note.title, Note.content).filter(Note.id == candidate.note_id).first()
+            # Edited (or deleted) meanwhile: the newer text gets its own turn
+            if note is None or content_hash(note.title, note.content) != candidate.content_hash:
+                return
+            db.query(NoteSummary).filter(NoteSummary.note_id == candidate.note_id).update(
+                {
+                    NoteSummary.summary: summary,
+                    NoteSummary.content_hash: candidate.content_hash,
+                    NoteSummary.attempts: 0,
+                },
+                synchronize_session=False,
+            )
+            db.commit()
+        self.generated.inc()
+
+    def _release(self, candidates: List[_Candidate], failed: Optional[_Candidate] = None) -> None:
+        """Make claimed notes due again; the failed one gives up after NOTE_SUMMARY_MAX_ATTEMPTS"""
+        with SessionLocal() as db:
+            for candidate in candidates:
+                values: Dict = {NoteSummary.checked_at: None}
+                if candidate is failed:
+                    attempts = candidate.attempts + 1
+                    if attempts >= self.settings.note_summary_max_attempts:
+                        # Stays checked until the note is edited again
+                        values = {NoteSummary.attempts: 0}
+                    else:
+                        values[NoteSummary.attempts] = attempts
+                db.query(NoteSummary).filter(NoteSummary.note_id == candidate.note_id).update(
+                    values, synchronize_session=False
+                )
+            db.commit()
+
+    def process_batch(
+        self,
+        limit: Optional[int] = None,
+        settle_seconds: Optional[float] = None,
+        user_id: Optional[str] = None,
+        retry_failed: bool = False
+    ) -> int:
+        """
+        Summarize one batch of due notes
+        Returns:
+            Notes looked at (0: nothing due)
+        Raises:
+            LLMReasoningError: summarization failed; the unfinished notes are due again
+        """
+        settings = self.settings
+        claimed, candidates = self._claim(
+            limit or settings.note_summary_batch_size,
+            settings.note_summary_settle_seconds if settle_seconds is None else settle_seconds,
+            user_id=user_id,
+            retry_failed=retry_failed,
+        )
+        for i, candidate in enumerate(candidates):
+            try:
+                summary = self._summarize(candidate)
+            except (BulkheadFullError, UserQueueFullError, concurrent.futures.CancelledError):
+                # Groq is busy with interactive calls (or the app is stopping): try again on the next poll
+                self._release(candidates[i:])
+                raise
+            except Exception:
+                self.failed.inc()
+                # Likely the provider rather than the note: hand the rest back for the next poll
+                self._release(candidates[i:], failed=candidate)
+                raise
+            self._store(candidate, summary)
+        return claimed
+
+    def _summarize(self, candidate: _Candidate) -> str:
+        args = (candidate.title, candidate.content[:_SUMMARY_INPUT_CHARS], self.settings.note_summary_max_tokens)
+        if self._loop is None:
+            # Outside the app (scripts/backfill_note_summaries.py): no other Groq callers in this process
+            return llm_service.summarize_note(*args)
+        future = asyncio.run_coroutine_threadsafe(
+            groq_scheduler.run(SUMMARY_TENANT, llm_service.asummarize_note, *args), self._loop
+        )
+        while True:
+            try:
+                return future.result(timeout=1.0)
+            except concurrent.futures.TimeoutError:
+                # stop() joins this thread from the event loop the call needs
+                if self._stop.is_set():
+                    future.cancel()
+                    raise concurrent.futures.CancelledError()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                processed = self.process_batch()
+            except Exception as e:
+                logger.warning(f"Summary worker: {str(e)}")
+                processed = 0
+            if processed == 0:
+                self._stop.wait(self.settings.note_summary_poll_interval)
+
+    def start(self) -> None:
+        """Start the worker thread (from the app's event loop, which runs its LLM calls)"""
+        if self._thread is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="summary-worker", daemon=True)
+        self._thread.start()
+        logger.info("Started background note summary worker")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        self._loop = None
+
+
+# Singleton instance
+summary_pipeline = SummaryPipeline()
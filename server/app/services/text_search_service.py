@@ -0,0 +1,98 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+from app.models.note import Note, PREVIEW_LOAD_OPTIONS, SEARCH_TEXT_CONFIG
+from app.models.note_chunk import NoteChunk
+from app.schemas.search import SearchFilters
+from app.services.vector_service import VectorService
+
+
+class TextSearchService:
+    """Full-text (lexical) search over notes using the generated search_vector column"""
+
+    @staticmethod
+    def _tsquery(query: str):
+        # websearch syntax: quoted phrases, OR, -exclusions; never raises on user input
+        return func.websearch_to_tsquery(SEARCH_TEXT_CONFIG, query)
+
+    @staticmethod
+    def search_notes(
+        db: Session,
+        user_id: str,
+        query: str,
+        limit: int = 5,
+        query_embedding: Optional[List[float]] = None,
+        preview: bool = False,
+        filters: Optional[SearchFilters] = None
+    ) -> List[Tuple[Note, float]]:
+        """
+        Notes matching the query text, best match first
+        Args:
+            db: Database session
+            user_id: User ID to filter notes
+            query: Raw query text
+            limit: Number of results to return
+            query_embedding: When given, the returned score is cosine similarity
+                instead of the text rank (so hybrid results share one scale)
+            preview: Load content_preview instead of the full content
+            filters: Tag/date restrictions
+        Returns:
+            List of (Note, score) tuples; the score is ts_rank_cd normalized to 0-1
+            when no query embedding is given
+        """
+        tsquery = TextSearchService._tsquery(query)
+        # Normalization 32 maps the rank into [0, 1): rank / (rank + 1)
+        rank = func.ts_rank_cd(Note.search_vector, tsquery, 32)
+        score = rank
+        if query_embedding is not None:
+            score = func.coalesce(1 - Note.embedding.cosine_distance(query_embedding), 0.0)
+
+        results = (
+            db.query(Note, score.label('score'))
+            .options(*(PREVIEW_LOAD_OPTIONS if preview else ()))
+            .filter(Note.user_id == user_id, *VectorService.note_filter_clauses(filters))
+            .filter(Note.search_vector.op('@@')(tsquery))
+            .order_by(rank.desc(), Note.created_at.desc())
+            .limit(limit)
+            .all()
+        )
+        return [(note, float(value)) for note, value in results]
+
+    @staticmethod
+    def best_passages(
+        db: Session,
+        note_ids: List[UUID],
+        query: str,
+        per_note: int
+    ) -> Dict[UUID, List[str]]:
+        """
+        Chunks of the given notes that match the query text
+        Returns:
+            note_id -> up to per_note matching chunks, in document order.
+            Notes without matching chunks are absent (use the full content).
+        """
+        if not note_ids:
+            return {}
+
+        tsquery = TextSearchService._tsquery(query)
+        document = func.to_tsvector(SEARCH_TEXT_CONFIG, NoteChunk.content)
+        rank = func.ts_rank_cd(document, tsquery)
+        rows = (
+            db.query(NoteChunk.note_id, NoteChunk.chunk_index, NoteChunk.content)
+            .filter(NoteChunk.note_id.in_(note_ids))
+            .filter(document.op('@@')(tsquery))
+            .order_by(NoteChunk.note_id, rank.desc())
+            .all()
+        )
+
+        selected: Dict[UUID, List[Tuple[int, str]]] = {}
+        for note_id, chunk_index, content in rows:
+            passages = selected.setdefault(note_id, [])
+            if len(passages) < per_note:
+                passages.append((chunk_index, content))
+        return {note_id: [content for _, content in sorted(passages)] for note_id, passages in selected.items()}
+
+
+# Singleton instance
+text_search_service = TextSearchService()
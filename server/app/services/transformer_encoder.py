@@ -0,0 +1,212 @@
+import json
+import math
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from huggingface_hub import hf_hub_download
+from safetensors.numpy import load_file
+from tokenizers import Tokenizer
+from app.utils.logger import logger
+
+
+TextInput = Union[str, Tuple[str, str]]
+
+
+def _gelu(x: np.ndarray) -> np.ndarray:
+    """Exact (erf based) GELU, matching BERT's default activation"""
+    # Abramowitz & Stegun 7.1.26, max error 1.5e-7
+    z = x / math.sqrt(2.0)
+    sign = np.sign(z)
+    a = np.abs(z)
+    t = 1.0 / (1.0 + 0.3275911 * a)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erf = sign * (1.0 - poly * np.exp(-a * a))
+    return (0.5 * x * (1.0 + erf)).astype(np.float32)
+
+
+def _layer_norm(x: np.ndarray, weight: np.ndarray, bias: np.ndarray, eps: float) -> np.ndarray:
+    mean = x.mean(axis=-1, keepdims=True)
+    var = x.var(axis=-1, keepdims=True)
+    return (x - mean) / np.sqrt(var + eps) * weight + bias
+
+
+class BertEncoder:
+    """
+    CPU-only BERT encoder running on NumPy
+
+    Loads a Hugging Face BERT checkpoint (config.json, tokenizer.json,
+    model.safetensors) and runs the forward pass in-process, so no deep
+    learning framework is needed at runtime. Weights are loaded lazily
+    on first use.
+    """
+
+    def __init__(self, model_id: str, max_length: int = 256, revision: Optional[str] = None):
+        self.model_id = model_id
+        self.max_length = max_length
+        self.revision = revision
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.tokenizer: Optional[Tokenizer] = None
+        self.raw_tokenizer: Optional[Tokenizer] = None
+        self.weights: Dict[str, np.ndarray] = {}
+        self.config: Dict = {}
+
+    def _download(self, filename: str) -> str:
+        return hf_hub_download(self.model_id, filename, revision=self.revision)
+
+    def load_tokenizer(self) -> None:
+        """Load only the tokenizers (enough for token counting and chunking)"""
+        if self.tokenizer is not None:
+            return
+
+        with self._lock:
+            if self.tokenizer is not None:
+                return
+
+            with open(self._download("config.json")) as f:
+                self.config = json.load(f)
+
+            # Untruncated copy for counting tokens and computing chunk offsets
+            self.raw_tokenizer = Tokenizer.from_file(self._download("tokenizer.json"))
+
+            tokenizer = Tokenizer.from_file(self._download("tokenizer.json"))
+            tokenizer.enable_truncation(max_length=self.max_length)
+            tokenizer.enable_padding(pad_id=self.config.get("pad_token_id", 0))
+            self.tokenizer = tokenizer
+
+    def load(self) -> None:
+        """Download (or read from the local HF cache) and load weights"""
+        if self._loaded:
+            return
+
+        self.load_tokenizer()
+        with self._lock:
+            if self._loaded:
+                return
+
+            logger.info(f"Loading local encoder weights: {self.model_id}")
+            raw = load_file(self._download("model.safetensors"))
+            # Checkpoints saved from task heads prefix the encoder with "bert."
+            weights = {
+                (key[len("bert."):] if key.startswith("bert.") else key): value.astype(np.float32)
+                for key, value in raw.items()
+            }
+            # Store dense kernels as contiguous (in, out) so matmuls hit BLAS directly
+            for key, value in weights.items():
+                if key.endswith(".weight") and value.ndim == 2 and "embeddings" not in key:
+                    weights[key] = np.ascontiguousarray(value.T)
+            self.weights = weights
+            self._loaded = True
+            logger.info(
+                f"Local encoder ready: {self.model_id} "
+                f"({self.config.get('num_hidden_layers')} layers, hidden={self.config.get('hidden_size')})"
+            )
+
+    def tokenize(self, inputs: Sequence[TextInput]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Tokenize texts (or text pairs) into padded id, type and mask arrays"""
+        self.load()
+        assert self.tokenizer is not None
+        encodings = self.tokenizer.encode_batch(list(inputs))
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        type_ids = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.float32)
+        return input_ids, type_ids, attention_mask
+
+    def count_tokens(self, text: str) -> int:
+        """Number of tokens for text, without truncation or special tokens"""
+        self.load_tokenizer()
+        assert self.raw_tokenizer is not None
+        return len(self.raw_tokenizer.encode(text, add_special_tokens=False).ids)
+
+    def token_offsets(self, text: str) -> List[Tuple[int, int]]:
+        """Character (start, end) offsets of each token in text, untruncated"""
+        self.load_tokenizer()
+        assert self.raw_tokenizer is not None
+        return list(self.raw_tokenizer.encode(text, add_special_tokens=False).offsets)
+
+    def _linear(self, x: np.ndarray, name: str) -> np.ndarray:
+        kernel = self.weights[f"{name}.weight"]
+        out = x.reshape(-1, x.shape[-1]) @ kernel + self.weights[f"{name}.bias"]
+        return out.reshape(*x.shape[:-1], kernel.shape[1])
+
+    def _norm(self, x: np.ndarray, name: str) -> np.ndarray:
+        return _layer_norm(
+            x,
+            self.weights[f"{name}.weight"],
+            self.weights[f"{name}.bias"],
+            self.config.get("layer_norm_eps", 1e-12),
+        )
+
+    def forward(self, input_ids: np.ndarray, type_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        """Run the encoder and return last hidden states (batch, seq, hidden)"""
+        w = self.weights
+        batch, seq_len = input_ids.shape
+        hidden = self.config["hidden_size"]
+        heads = self.config["num_attention_heads"]
+        head_dim = hidden // heads
+
+        positions = np.arange(seq_len)
+        x = (
+            w["embeddings.word_embeddings.weight"][input_ids]
+            + w["embeddings.position_embeddings.weight"][positions][None, :, :]
+            + w["embeddings.token_type_embeddings.weight"][type_ids]
+        )
+        x = self._norm(x, "embeddings.LayerNorm")
+
+        # Padding positions get a large negative bias before softmax
+        mask_bias = ((1.0 - attention_mask) * np.finfo(np.float32).min)[:, None, None, :]
+        scale = 1.0 / math.sqrt(head_dim)
+
+        def split_heads(t: np.ndarray) -> np.ndarray:
+            return t.reshape(batch, seq_len, heads, head_dim).transpose(0, 2, 1, 3)
+
+        for i in range(self.config["num_hidden_layers"]):
+            prefix = f"encoder.layer.{i}"
+            q = split_heads(self._linear(x, f"{prefix}.attention.self.query"))
+            k = split_heads(self._linear(x, f"{prefix}.attention.self.key"))
+            v = split_heads(self._linear(x, f"{prefix}.attention.self.value"))
+
+            scores = (q @ k.transpose(0, 1, 3, 2)) * scale + mask_bias
+            scores = scores - scores.max(axis=-1, keepdims=True)
+            probs = np.exp(scores)
+            probs /= probs.sum(axis=-1, keepdims=True)
+
+            context = (probs @ v).transpose(0, 2, 1, 3).reshape(batch, seq_len, hidden)
+            attn_out = self._linear(context, f"{prefix}.attention.output.dense")
+            x = self._norm(attn_out + x, f"{prefix}.attention.output.LayerNorm")
+
+            intermediate = _gelu(self._linear(x, f"{prefix}.intermediate.dense"))
+            out = self._linear(intermediate, f"{prefix}.output.dense")
+            x = self._norm(out + x, f"{prefix}.output.LayerNorm")
+
+        return x.astype(np.float32)
+
+    def mean_pooled(self, texts: List[str], normalize: bool = True) -> np.ndarray:
+        """
+        Sentence embeddings via attention-masked mean pooling
+        (same pooling as sentence-transformers all-MiniLM-L6-v2)
+        """
+        input_ids, type_ids, attention_mask = self.tokenize(texts)
+        hidden_states = self.forward(input_ids, type_ids, attention_mask)
+
+        mask = attention_mask[:, :, None]
+        summed = (hidden_states * mask).sum(axis=1)
+        counts = np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled = summed / counts
+
+        if normalize:
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            pooled = pooled / np.clip(norms, 1e-12, None)
+        return pooled.astype(np.float32)
+
+    def classify(self, inputs: Sequence[TextInput]) -> np.ndarray:
+        """
+        Sequence classification logits (batch, num_labels) for checkpoints
+        with a BertForSequenceClassification head, e.g. cross-encoders
+        scoring (query, passage) pairs
+        """
+        input_ids, type_ids, attention_mask = self.tokenize(inputs)
+        hidden_states = self.forward(input_ids, type_ids, attention_mask)
+        # BERT pooler: tanh(dense([CLS])), then the linear classifier
+        pooled = np.tanh(self._linear(hidden_states[:, 0], "pooler.dense"))
+        return self._linear(pooled, "classifier").astype(np.float32)
@@ -1,18 +1,264 @@
+from sqlalchemy import Integer, cast, column, func, literal, null, select, text, true, union_all, values
 from sqlalchemy.orm import Session
-from typing import List, Tuple
-from app.models.note import Note
+from pgvector.sqlalchemy import BIT, HALFVEC, Vector
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+from uuid import UUID
+from app.core.settings import get_settings
+from app.models.note import EMBEDDING_DIMENSIONS, Note, PREVIEW_LOAD_OPTIONS
+from app.models.note_chunk import NoteChunk
+from app.schemas.search import SearchFilters
+from app.services.embedding_pipeline import embedding_pipeline
+from app.services.memory_index import memory_index
+from app.utils.logger import logger
+
+
+# Compact storage modes quantize `embedding` in the query; migration f2c8a1d7b394 indexes the same expression
+_COMPACT_MODES = ("halfvec", "binary")
 
 
 class VectorService:
     """Handle vector similarity search operations"""
     
+    _vector_version: Optional[Tuple[int, ...]] = None
+    _compact_unavailable_logged = False
+    
+    @staticmethod
+    def _pgvector_version(db: Session) -> Tuple[int, ...]:
+        if VectorService._vector_version is None:
+            version = db.execute(text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")).scalar()
+            VectorService._vector_version = tuple(int(part) for part in (version or "0.0").split(".")[:2])
+        return VectorService._vector_version
+    
+    @staticmethod
+    def _apply_search_settings(db: Session, scan_limit: int) -> None:
+        """Per-transaction ANN knobs (SET LOCAL semantics via set_config)"""
+        settings = get_settings()
+        # HNSW returns at most ef_search rows per scan, so never go below the LIMIT (pgvector caps it at 1000)
+        values = {
+            "hnsw.ef_search": min(1000, max(settings.vector_hnsw_ef_search, scan_limit)),
+            "ivfflat.probes": settings.vector_ivfflat_probes,
+        }
+        iterative_scan = settings.vector_iterative_scan.lower()
+        if iterative_scan != "off" and VectorService._pgvector_version(db) >= (0, 8):
+            values["hnsw.iterative_scan"] = iterative_scan
+            values["ivfflat.iterative_scan"] = iterative_scan
+        
+        # One round trip for all knobs
+        params = {f"value_{i}": str(value) for i, value in enumerate(values.values())}
+        calls = ", ".join(f"set_config('{name}', :value_{i}, true)" for i, name in enumerate(values))
+        db.execute(text(f"SELECT {calls}"), params)
+    
+    @staticmethod
+    def _query_vector(query_embedding: List[float]):
+        return cast(literal(query_embedding, type_=Vector(EMBEDDING_DIMENSIONS)), Vector(EMBEDDING_DIMENSIONS))
+    
+    @staticmethod
+    def _compact_distance(db: Session, model: Any, query_vector: Any, mode: str):
+        """
+        Distance on the quantized embedding for the first search stage, or None for exact-only search
+        (query_vector: a vector SQL expression, e.g. _query_vector(...) or a VALUES column)
+        """
+        if mode not in _COMPACT_MODES:
+            return None
+        if VectorService._pgvector_version(db) < (0, 7):
+            if not VectorService._compact_unavailable_logged:
+                logger.warning("VECTOR_STORAGE_MODE needs pgvector >= 0.7; searching full-precision vectors instead")
+                VectorService._compact_unavailable_logged = True
+            return None
+        
+        # Same expressions as the compact ANN indexes, so the planner can use them
+        if mode == "halfvec":
+            return cast(model.embedding, HALFVEC(EMBEDDING_DIMENSIONS)).cosine_distance(
+                cast(query_vector, HALFVEC(EMBEDDING_DIMENSIONS))
+            )
+        return cast(func.binary_quantize(model.embedding), BIT(EMBEDDING_DIMENSIONS)).hamming_distance(
+            cast(func.binary_quantize(query_vector), BIT(EMBEDDING_DIMENSIONS))
+        )
+    
+    @staticmethod
+    def note_filter_clauses(filters: Optional[SearchFilters]) -> List[Any]:
+        """WHERE clauses on notes for tag/date search filters (served by ix_notes_tags / ix_notes_user_id_created_at)"""
+        if filters is None:
+            return []
+        clauses: List[Any] = []
+        if filters.tags:
+            clauses.append(Note.tags.op("@>")(cast(filters.tags, Note.tags.type)))
+        if filters.created_after:
+            clauses.append(Note.created_at >= filters.created_after)
+        if filters.created_before:
+            clauses.append(Note.created_at < filters.created_before)
+        if filters.updated_after:
+            clauses.append(Note.updated_at >= filters.updated_after)
+        return clauses
+    
+    @staticmethod
+    def _matching_note_ids(db: Session, user_id: str, clauses: Sequence[Any]) -> Optional[Set[UUID]]:
+        """Ids of the user's notes matching the filters, or None if more than VECTOR_FILTER_EXACT_MAX_ROWS do"""
+        cap = get_settings().vector_filter_exact_max_rows
+        ids = {row[0] for row in db.query(Note.id).filter(Note.user_id == user_id, *clauses).limit(cap + 1).all()}
+        return ids if len(ids) <= cap else None
+    
+    @staticmethod
+    def _nearest(
+        db: Session,
+        model: Any,
+        columns: Sequence[Any],
+        filters: Sequence[Any],
+        query_embedding: List[float],
+        limit: int,
+        similarity_threshold: float,
+        storage_mode: Optional[str] = None,
+        options: Sequence[Any] = (),
+        filtered: bool = False
+    ) -> List[Any]:
+        """
+        Rows of `columns` (+ similarity) for the nearest embeddings of `model`
+        Args:
+            db: Database session
+            model: Note or NoteChunk
+            columns: Entities/columns to select
+            filters: Extra WHERE clauses (e.g. user_id)
+            query_embedding: Query vector (EMBEDDING_DIMENSIONS)
+            limit: Number of rows to return
+            similarity_threshold: Minimum exact cosine similarity
+            storage_mode: Override of VECTOR_STORAGE_MODE ("full", "halfvec", "binary")
+            options: Loader options for the selected entities (e.g. PREVIEW_LOAD_OPTIONS)
+            filtered: filters include search filters (tags/dates) beyond the user
+        Returns:
+            Rows ordered by exact cosine distance
+        
+        In a compact storage mode the quantized copy is searched first for
+        limit * VECTOR_RERANK_FACTOR candidates, which are then reranked
+        exactly against the full-precision vectors.
+        
+        Search filters are applied inside the scan, never to its output, so
+        top_k stays exact. A filtered search first scans at most
+        VECTOR_FILTER_EXACT_MAX_ROWS + 1 matching rows exactly (via the filter
+        indexes), counting them in the same query; if the filter matched more,
+        the ANN index is used instead, with an exact fallback if the index scan
+        runs out of matching rows before reaching the limit.
+        """
+        settings = get_settings()
+        mode = (storage_mode or settings.vector_storage_mode).lower()
+        filters = [*filters, model.embedding.isnot(None)]
+        
+        if filtered:
+            cap = settings.vector_filter_exact_max_rows
+            rows = VectorService._nearest_rows(
+                db, model, columns, filters, query_embedding, limit, mode, options, True, cap
+            )
+            if not rows or rows[0].matched <= cap:
+                # Drop the trailing `matched` column
+                return [row[:-1] for row in rows if row.similarity > similarity_threshold]
+        
+        rows = VectorService._nearest_rows(db, model, columns, filters, query_embedding, limit, mode, options, False)
+        if filtered and len(rows) < limit:
+            # Without iterative index scans (pgvector < 0.8) the ANN scan stops after ef_search rows
+            rows = VectorService._nearest_rows(db, model, columns, filters, query_embedding, limit, mode, options, True)
+        
+        # Threshold applied to the top rows, so a short result above is never mistaken for a sparse index scan
+        return [row for row in rows if row.similarity > similarity_threshold]
+    
+    @staticmethod
+    def _nearest_rows(
+        db: Session,
+        model: Any,
+        columns: Sequence[Any],
+        filters: Sequence[Any],
+        query_embedding: List[float],
+        limit: int,
+        mode: str,
+        options: Sequence[Any],
+        exact: bool,
+        cap: Optional[int] = None
+    ) -> List[Any]:
+        """
+        Nearest rows of one scan (see _nearest); with exact and cap, only the first
+        cap + 1 matching rows are ranked and each row carries their count as `matched`
+        """
+        settings = get_settings()
+        distance = model.embedding.cosine_distance(query_embedding)
+        
+        # Inner query: plain `ORDER BY <distance> LIMIT k` with the user filter,
+        # the shape an HNSW/IVFFlat index can serve. The threshold is applied
+        # outside so it never turns the index scan into a filtered full scan.
+        compact_distance = None if exact else VectorService._compact_distance(
+            db, model, VectorService._query_vector(query_embedding), mode
+        )
+        if exact and cap is not None:
+            # No ORDER BY in the candidate scan: it stops after cap + 1 rows from the filter indexes
+            scan_limit = limit
+            matching = select(model.id, model.embedding).where(*filters).limit(cap + 1).subquery("matching")
+            matching_distance = matching.c.embedding.cosine_distance(query_embedding)
+            nearest = (
+                select(
+                    matching.c.id.label("id"),
+                    matching_distance.label("distance"),
+                    func.count().over().label("matched"),
+                )
+                .order_by(matching_distance)
+                .limit(limit)
+            )
+        elif exact:
+            # `+ 0` keeps the planner off the ANN index: matching rows come from
+            # the filter indexes and are sorted by exact distance
+            scan_limit = limit
+            nearest = (
+                select(model.id.label("id"), distance.label("distance"))
+                .where(*filters)
+                .order_by(distance + 0)
+                .limit(limit)
+            )
+        elif compact_distance is not None:
+            scan_limit = limit * max(1, settings.vector_rerank_factor)
+            candidates = (
+                select(model.id)
+                .where(*filters)
+                .order_by(compact_distance)
+                .limit(scan_limit)
+            )
+            nearest = (
+                select(model.id.label("id"), distance.label("distance"))
+                .where(model.id.in_(candidates.scalar_subquery()))
+                .order_by(distance)
+                .limit(limit)
+            )
+        else:
+            scan_limit = limit
+            nearest = (
+                select(model.id.label("id"), distance.label("distance"))
+                .where(*filters)
+                .order_by(distance)
+                .limit(limit)
+            )
+        nearest = nearest.subquery("nearest")
+        extra = [nearest.c.matched] if exact and cap is not None else []
+        
+        VectorService._apply_search_settings(db, scan_limit)
+        
+        return (
+            db.query(*columns, (1 - nearest.c.distance).label('similarity'), *extra)
+            .options(*options)
+            .join(nearest, model.id == nearest.c.id)
+            .order_by(nearest.c.distance)
+            .all()
+        )
+    
+    @staticmethod
+    def _drain_pending(user_id: str) -> None:
+        settings = get_settings()
+        if embedding_pipeline.enabled and settings.pending_search_policy == "wait":
+            embedding_pipeline.drain_user(user_id, limit=settings.pending_search_wait_limit)
+    
     @staticmethod
     def search_similar_notes(
         db: Session,
         user_id: str,  
         query_embedding: List[float],
         top_k: int = 5,
-        similarity_threshold: float = 0.0
+        similarity_threshold: float = 0.0,
+        preview: bool = False,
+        filters: Optional[SearchFilters] = None
     ) -> List[Tuple[Note, float]]:
         """
         Search for notes similar to query embedding using cosine similarity
@@ -20,30 +266,378 @@ class VectorService:
         Args:
             db: Database session
             user_id: User ID to filter notes
-            query_embedding: Query vector (384 dimensions)
+            query_embedding: Query vector (EMBEDDING_DIMENSIONS)
             top_k: Number of results to return
             similarity_threshold: Minimum similarity score (0-1)
+            preview: Load content_preview instead of the full content
+            filters: Tag/date restrictions, applied before ranking
         Returns:
             List of (Note, similarity_score) tuples, ordered by relevance
+        
+        Notes still waiting for the background embedding pipeline have no
+        vector and are excluded, unless PENDING_SEARCH_POLICY=wait, in which
+        case the user's due jobs are embedded inline before searching.
+        
+        With MEMORY_INDEX_ENABLED the user's vectors are searched in process
+        (loaded on first use) and only the top_k notes are read from Postgres.
         """
+        VectorService._drain_pending(user_id)
+        clauses = VectorService.note_filter_clauses(filters)
         
-        # Calculate similarity: 1 - cosine_distance = cosine_similarity
-        similarity_expr = 1 - Note.embedding.cosine_distance(query_embedding)
+        if memory_index is not None:
+            allowed = VectorService._matching_note_ids(db, user_id, clauses) if clauses else None
+            # Broad filters (allowed is None) are searched in Postgres, through the ANN index
+            hits = None
+            if allowed is not None or not clauses:
+                hits = memory_index.search(
+                    db, "notes", user_id, query_embedding, top_k, similarity_threshold, only_owners=allowed
+                )
+            if hits is not None:
+                notes = VectorService._load_notes(db, [note_id for note_id, _, _ in hits], preview)
+                return [(notes[note_id], similarity) for note_id, _, similarity in hits if note_id in notes]
         
-        # Query with similarity score (filtered by user_id)
-        results = (
-            db.query(Note, similarity_expr.label('similarity'))
-            .filter(Note.user_id == user_id)  
-            .filter(Note.embedding.isnot(None))
-            .filter(similarity_expr > similarity_threshold)
-            .order_by(Note.embedding.cosine_distance(query_embedding))
-            .limit(top_k)
-            .all()
+        # Similarity = 1 - cosine_distance (filtered by user_id)
+        results = VectorService._nearest(
+            db,
+            Note,
+            columns=[Note],
+            filters=[Note.user_id == user_id, *clauses],
+            query_embedding=query_embedding,
+            limit=top_k,
+            similarity_threshold=similarity_threshold,
+            options=PREVIEW_LOAD_OPTIONS if preview else (),
+            filtered=bool(clauses)
         )
         
         # Return as (Note object, similarity) tuples
         return [(note, float(sim)) for note, sim in results]
-
+    
+    @staticmethod
+    def search_similar_passages(
+        db: Session,
+        user_id: str,
+        query_embedding: List[float],
+        top_k: int = 5,
+        similarity_threshold: float = 0.0,
+        preview: bool = False,
+        filters: Optional[SearchFilters] = None
+    ) -> List[Tuple[Note, float, List[str]]]:
+        """
+        Chunk-level search, grouped back into notes
+        Args:
+            db: Database session
+            user_id: User ID to filter notes
+            query_embedding: Query vector (EMBEDDING_DIMENSIONS)
+            top_k: Number of notes to return
+            similarity_threshold: Minimum similarity score (0-1)
+            preview: Load content_preview instead of the full content
+            filters: Tag/date restrictions, applied before ranking
+        Returns:
+            List of (Note, similarity_score, passages) tuples, ordered by relevance.
+            A note scores as its best chunk; passages are its best-matching
+            chunks in document order (empty when the note has no chunks yet,
+            meaning the whole note was matched).
+        
+        Notes that predate chunking (no note_chunks rows) are matched on their
+        note-level vector, so they stay searchable until they are re-chunked.
+        """
+        settings = get_settings()
+        if not settings.chunking_enabled:
+            return [
+                (note, similarity, [])
+                for note, similarity in VectorService.search_similar_notes(
+                    db, user_id, query_embedding, top_k, similarity_threshold, preview, filters
+                )
+            ]
+        
+        VectorService._drain_pending(user_id)
+        clauses = VectorService.note_filter_clauses(filters)
+        
+        candidate_limit = top_k * max(1, settings.chunk_search_candidates)
+        hits = VectorService._memory_passage_hits(
+            db, user_id, query_embedding, top_k, candidate_limit, similarity_threshold, clauses
+        )
+        if hits is not None:
+            chunk_hits, unchunked, notes = hits
+        else:
+            chunk_hits = VectorService._nearest(
+                db,
+                NoteChunk,
+                columns=[NoteChunk.note_id, NoteChunk.chunk_index, NoteChunk.content],
+                filters=[NoteChunk.user_id == user_id] + (
+                    [NoteChunk.note_id.in_(select(Note.id).where(Note.user_id == user_id, *clauses))]
+                    if clauses else []
+                ),
+                query_embedding=query_embedding,
+                limit=candidate_limit,
+                similarity_threshold=similarity_threshold,
+                filtered=bool(clauses)
+            )
+            # Notes without chunks (none once backfilled): filtered=True scans them exactly through
+            # ix_notes_unchunked, so this costs one index probe rather than an ANN scan that matches nothing
+            unchunked_rows = VectorService._nearest(
+                db,
+                Note,
+                columns=[Note],
+                filters=[Note.user_id == user_id, Note.chunked.is_(False), *clauses],
+                query_embedding=query_embedding,
+                limit=top_k,
+                similarity_threshold=similarity_threshold,
+                options=PREVIEW_LOAD_OPTIONS if preview else (),
+                filtered=True
+            )
+            unchunked = [(note.id, float(sim)) for note, sim in unchunked_rows]
+            notes = {note.id: note for note, _ in unchunked_rows}
+        
+        # Hits arrive best-first: the first hit per note is its score
+        scores: Dict[UUID, float] = {}
+        passages: Dict[UUID, List[Tuple[int, str]]] = {}
+        for note_id, chunk_index, content, similarity in chunk_hits:
+            scores.setdefault(note_id, float(similarity))
+            note_passages = passages.setdefault(note_id, [])
+            if len(note_passages) < settings.chunk_passages_per_note:
+                note_passages.append((chunk_index, content))
+        
+        ranked = sorted(
+            list(scores.items()) + [(note_id, score) for note_id, score in unchunked if note_id not in scores],
+            key=lambda item: item[1],
+            reverse=True
+        )[:top_k]
+        
+        missing = [note_id for note_id, _ in ranked if note_id not in notes]
+        if missing:
+            notes.update(VectorService._load_notes(db, missing, preview))
+        
+        return [
+            (notes[note_id], score, [content for _, content in sorted(passages.get(note_id, []))])
+            for note_id, score in ranked
+            if note_id in notes
+        ]
+    
+    @staticmethod
+    def _lateral_nearest(
+        db: Session,
+        model: Any,
+        columns: Sequence[Any],
+        filters: Sequence[Any],
+        query_vector: Any,
+        limit: int,
+        mode: str,
+        queries: Any
+    ) -> Tuple[Any, int]:
+        """
+        Per-query `ORDER BY distance LIMIT k` (+ distance) correlated to the VALUES list `queries`,
+        with the same compact first stage as _nearest_rows; also returns the ANN scan size
+        """
+        filters = [*filters, model.embedding.isnot(None)]
+        distance = model.embedding.cosine_distance(query_vector)
+        nearest = select(*columns, distance.label("distance"))
+        compact_distance = VectorService._compact_distance(db, model, query_vector, mode)
+        if compact_distance is not None:
+            scan_limit = limit * max(1, get_settings().vector_rerank_factor)
+            candidates = (
+                select(model.id)
+                .where(*filters)
+                .order_by(compact_distance)
+                .limit(scan_limit)
+                .correlate(queries)
+            )
+            nearest = nearest.where(model.id.in_(candidates.scalar_subquery()))
+        else:
+            scan_limit = limit
+            nearest = nearest.where(*filters)
+        return nearest.order_by(distance).limit(limit).correlate(queries), scan_limit
+    
+    @staticmethod
+    def search_similar_passages_batch(
+        db: Session,
+        user_id: str,
+        query_embeddings: List[List[float]],
+        top_k: int = 5,
+        similarity_threshold: float = 0.0,
+        preview: bool = False
+    ) -> List[List[Tuple[Note, float, List[str]]]]:
+        """
+        search_similar_passages for several query vectors, in one SQL statement
+        Args:
+            db: Database session
+            user_id: User ID to filter notes
+            query_embeddings: Query vectors (EMBEDDING_DIMENSIONS each)
+            top_k: Number of results per query
+            similarity_threshold: Minimum similarity score (0-1)
+            preview: Load content_preview instead of the full content
+        Returns:
+            One list of (Note, similarity_score, passages) tuples per query, in input order
+        
+        The queries are a VALUES list joined LATERAL to the per-query candidate
+        scans of search_similar_passages (best chunks, plus unchunked notes on
+        their note-level vector, with the VECTOR_STORAGE_MODE first stage).
+        Notes and passages are then read with one `IN` query each, so the cost
+        does not grow in round trips with the number of queries. With the
+        in-memory index there is no database scan to share, and each query
+        takes the single-query path.
+        """
+        if not query_embeddings:
+            return []
+        if memory_index is not None:
+            return [
+                VectorService.search_similar_passages(db, user_id, embedding, top_k, similarity_threshold, preview)
+                for embedding in query_embeddings
+            ]
+        settings = get_settings()
+        mode = settings.vector_storage_mode.lower()
+        VectorService._drain_pending(user_id)
+        
+        queries = values(
+            column("idx", Integer), column("embedding", Vector(EMBEDDING_DIMENSIONS)), name="queries"
+        ).data([(i, embedding) for i, embedding in enumerate(query_embeddings)])
+        query_vector = cast(queries.c.embedding, Vector(EMBEDDING_DIMENSIONS))
+        
+        if settings.chunking_enabled:
+            chunk_hits, chunk_scan = VectorService._lateral_nearest(
+                db, NoteChunk, [NoteChunk.note_id.label("note_id"), NoteChunk.id.label("chunk_id")],
+                [NoteChunk.user_id == user_id], query_vector,
+                top_k * max(1, settings.chunk_search_candidates), mode, queries
+            )
+            note_hits, note_scan = VectorService._lateral_nearest(
+                db, Note, [Note.id.label("note_id"), null().label("chunk_id")],
+                [Note.user_id == user_id, Note.chunked.is_(False)], query_vector, top_k, mode, queries
+            )
+            candidates = union_all(chunk_hits, note_hits).subquery("candidates")
+            hits = select(candidates).lateral("hits")
+            scan_limit = max(chunk_scan, note_scan)
+        else:
+            note_hits, scan_limit = VectorService._lateral_nearest(
+                db, Note, [Note.id.label("note_id"), null().label("chunk_id")],
+                [Note.user_id == user_id], query_vector, top_k, mode, queries
+            )
+            hits = note_hits.lateral("hits")
+        
+        VectorService._apply_search_settings(db, scan_limit)
+        
+        rows = db.execute(
+            select(queries.c.idx, hits.c.note_id, hits.c.chunk_id, (1 - hits.c.distance).label("similarity"))
+            .select_from(queries)
+            .join(hits, true())
+            .order_by(queries.c.idx, hits.c.distance)
+        ).all()
+        
+        # Per query, best-first: a note scores as its first (best) row, passages are its first chunks
+        ranked: List[List[Tuple[UUID, float]]] = []
+        chunk_ids: Dict[Tuple[int, UUID], List[UUID]] = {}
+        scores: List[Dict[UUID, float]] = [{} for _ in query_embeddings]
+        for idx, note_id, chunk_id, similarity in rows:
+            # Same rule as _nearest: the threshold applies to the scanned rows
+            if similarity <= similarity_threshold:
+                continue
+            scores[idx].setdefault(note_id, float(similarity))
+            if chunk_id is not None:
+                note_chunks = chunk_ids.setdefault((idx, note_id), [])
+                if len(note_chunks) < settings.chunk_passages_per_note:
+                    note_chunks.append(chunk_id)
+        for query_scores in scores:
+            ranked.append(sorted(query_scores.items(), key=lambda item: item[1], reverse=True)[:top_k])
+        
+        notes = VectorService._load_notes(db, list({note_id for hits_ in ranked for note_id, _ in hits_}), preview)
+        wanted = [
+            chunk_id
+            for idx, hits_ in enumerate(ranked)
+            for note_id, _ in hits_
+            for chunk_id in chunk_ids.get((idx, note_id), [])
+        ]
+        passages: Dict[UUID, Tuple[int, str]] = {}
+        if wanted:
+            passages = {
+                row.id: (row.chunk_index, row.content)
+                for row in db.query(NoteChunk.id, NoteChunk.chunk_index, NoteChunk.content)
+                .filter(NoteChunk.id.in_(list(set(wanted))))
+                .all()
+            }
+        
+        return [
+            [
+                (
+                    notes[note_id],
+                    score,
+                    [
+                        content for _, content in sorted(
+                            passages[chunk_id] for chunk_id in chunk_ids.get((idx, note_id), []) if chunk_id in passages
+                        )
+                    ],
+                )
+                for note_id, score in hits_
+                if note_id in notes
+            ]
+            for idx, hits_ in enumerate(ranked)
+        ]
+    
+    @staticmethod
+    def note_embeddings(db: Session, note_ids: List[UUID]) -> Dict[UUID, List[float]]:
+        """Note-level vectors for the given notes (notes without one are absent)"""
+        if not note_ids:
+            return {}
+        rows = (
+            db.query(Note.id, Note.embedding)
+            .filter(Note.id.in_(note_ids), Note.embedding.isnot(None))
+            .all()
+        )
+        return {note_id: embedding for note_id, embedding in rows}
+    
+    @staticmethod
+    def _load_notes(db: Session, note_ids: List[UUID], preview: bool = False) -> Dict[UUID, Note]:
+        if not note_ids:
+            return {}
+        query = db.query(Note).filter(Note.id.in_(note_ids))
+        if preview:
+            query = query.options(*PREVIEW_LOAD_OPTIONS)
+        return {note.id: note for note in query.all()}  # type: ignore
+    
+    @staticmethod
+    def _memory_passage_hits(
+        db: Session,
+        user_id: str,
+        query_embedding: List[float],
+        top_k: int,
+        candidate_limit: int,
+        similarity_threshold: float,
+        clauses: Sequence[Any] = ()
+    ) -> Optional[Tuple[List[Tuple[UUID, int, str, float]], List[Tuple[UUID, float]], Dict[UUID, Note]]]:
+        """Chunk and unchunked-note hits from the in-memory index, or None to search Postgres"""
+        if memory_index is None:
+            return None
+        allowed = VectorService._matching_note_ids(db, user_id, clauses) if clauses else None
+        if clauses and allowed is None:
+            return None
+        chunk_hits = memory_index.search(
+            db, "chunks", user_id, query_embedding, candidate_limit, similarity_threshold, only_owners=allowed
+        )
+        if chunk_hits is None:
+            return None
+        note_hits = memory_index.search(
+            db, "notes", user_id, query_embedding, top_k, similarity_threshold,
+            exclude_owners=memory_index.owners("chunks", user_id) or set(),
+            only_owners=allowed
+        )
+        if note_hits is None:
+            return None
+        
+        chunks = {}
+        if chunk_hits:
+            chunks = {
+                row.id: row
+                for row in db.query(NoteChunk.id, NoteChunk.chunk_index, NoteChunk.content)
+                .filter(NoteChunk.id.in_([chunk_id for chunk_id, _, _ in chunk_hits]))
+                .all()
+            }
+        return (
+            [
+                (note_id, chunks[chunk_id].chunk_index, chunks[chunk_id].content, similarity)
+                for chunk_id, note_id, similarity in chunk_hits
+                if chunk_id in chunks
+            ],
+            [(note_id, similarity) for note_id, _, similarity in note_hits],
+            {},
+        )
 
 # Singleton instance
 vector_service = VectorService()
\ No newline at end of file
@@ -1,9 +1,10 @@
 import os
 import os as os_module
-from groq import Groq
+from groq import Groq, AsyncGroq
 from fastapi import UploadFile
 import tempfile
 from typing import Optional
+from app.core.http_clients import http_clients
 
 
 class VoiceService:
@@ -14,7 +15,9 @@ class VoiceService:
         if not api_key:
             raise ValueError("GROQ_API_KEY not set in environment")
         
-        self.client = Groq(api_key=api_key)
+        self.api_key = api_key
+        self.client = Groq(api_key=api_key, http_client=http_clients.get_sync("groq"))
+        self._async_client: Optional[AsyncGroq] = None
         self.model = "whisper-large-v3"
         
         # Supported audio formats
@@ -25,6 +28,20 @@ class VoiceService:
             "audio/flac", "audio/m4a"
         }
     
+    @property
+    def async_client(self) -> AsyncGroq:
+        """Async Groq client on the shared connection pool (created on first use)"""
+        if self._async_client is None:
+            self._async_client = AsyncGroq(api_key=self.api_key, http_client=http_clients.get_async("groq"))
+        return self._async_client
+    
+    def _validate_format(self, audio_file: UploadFile) -> None:
+        if audio_file.content_type not in self.supported_formats:
+            raise ValueError(
+                f"Unsupported audio format: {audio_file.content_type}. "
+                f"Supported: {', '.join(self.supported_formats)}"
+            )
+    
     def transcribe_audio(
         self, 
         audio_file: UploadFile,
@@ -39,11 +56,7 @@ class VoiceService:
             Transcribed text
         """
         # Validate file type
-        if audio_file.content_type not in self.supported_formats:
-            raise ValueError(
-                f"Unsupported audio format: {audio_file.content_type}. "
-                f"Supported: {', '.join(self.supported_formats)}"
-            )
+        self._validate_format(audio_file)
         
         # Save uploaded file to temporary location
         # Groq API requires a file path, not bytes
@@ -75,6 +88,27 @@ class VoiceService:
             except Exception:
                 pass  # Ignore cleanup errors
     
+    async def atranscribe_audio(
+        self,
+        audio_file: UploadFile,
+        language: Optional[str] = None
+    ) -> str:
+        """
+        Async variant of transcribe_audio
+        Uploads the audio bytes directly (no temp file) over the shared async pool
+        """
+        self._validate_format(audio_file)
+        
+        content = await audio_file.read()
+        transcription = await self.async_client.audio.transcriptions.create(
+            file=(audio_file.filename or f"audio{self._get_file_extension(None)}", content),
+            model=self.model,
+            language=language,  # type: ignore
+            response_format="text"
+        )
+        
+        return transcription.strip() # type: ignore
+    
     def _get_file_extension(self, filename: Optional[str]) -> str:
         """Extract file extension from filename"""
         if not filename:
@@ -30,6 +30,16 @@ class NoteNotFoundError(MnemonicException):
     pass
 
 
+class BulkheadFullError(MnemonicException):
+    """Raised when a provider bulkhead has no free slot or queue space"""
+    pass
+
+
+class UserQueueFullError(MnemonicException):
+    """Raised when a user already has as many calls queued as the scheduler allows"""
+    pass
+
+
 # HTTP Exception helpers
 def raise_not_found(resource: str, resource_id: str):
     """Raise 404 error"""
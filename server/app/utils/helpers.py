@@ -0,0 +1,23 @@
+from typing import Optional
+
+
+def make_snippet(text: Optional[str], max_chars: int) -> Optional[str]:
+    """
+    Short single-line preview of a text
+    Args:
+        text: Source text (may already be a prefix longer than max_chars)
+        max_chars: Maximum snippet length, excluding the ellipsis
+    Returns:
+        Whitespace-collapsed text, cut at a word boundary with "…" when longer
+    """
+    if text is None:
+        return None
+    truncated = len(text) > max_chars
+    snippet = " ".join(text[:max_chars].split())
+    if truncated:
+        # Drop the partial last word unless that would lose most of the snippet
+        space = snippet.rfind(" ")
+        if space > max_chars // 2:
+            snippet = snippet[:space]
+        snippet = snippet.rstrip(" ,;:-") + "…"
+    return snippet
@@ -0,0 +1,42 @@
+"""Add embedding cache
+
+Revision ID: 7c1d9e4a2b6f
+Revises: 263d0217e2fa
+Create Date: 2026-10-18 17:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.settings import get_settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1d9e4a2b6f'
+down_revision: Union[str, Sequence[str], None] = '263d0217e2fa'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # IF NOT EXISTS: the app also runs create_all() on startup
+    op.execute("CREATE EXTENSION IF NOT EXISTS vector")
+    op.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS embedding_cache (
+            model VARCHAR(255) NOT NULL,
+            text_hash VARCHAR(64) NOT NULL,
+            embedding VECTOR({get_settings().embedding_dimensions}) NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            PRIMARY KEY (model, text_hash)
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TABLE IF EXISTS embedding_cache")
@@ -0,0 +1,42 @@
+"""Add full-text search vector on notes
+
+Revision ID: a6d3e8b1c047
+Revises: f2c8a1d7b394
+Create Date: 2026-10-18 21:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6d3e8b1c047'
+down_revision: Union[str, Sequence[str], None] = 'f2c8a1d7b394'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Generated column: the ALTER backfills existing notes, Postgres keeps it in sync afterwards
+    op.execute(
+        "ALTER TABLE notes ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        "GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(content, '')), 'B')"
+        ") STORED"
+    )
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_notes_search_vector "
+            "ON notes USING gin (search_vector)"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_notes_search_vector")
+    op.execute("ALTER TABLE notes DROP COLUMN IF EXISTS search_vector")
@@ -0,0 +1,36 @@
+"""Add notes.chunked
+
+Revision ID: a7e3c9f1b254
+Revises: c2a9d7e4f816
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7e3c9f1b254'
+down_revision: Union[str, Sequence[str], None] = 'c2a9d7e4f816'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # A constant default does not rewrite the table
+    op.execute("ALTER TABLE notes ADD COLUMN IF NOT EXISTS chunked BOOLEAN NOT NULL DEFAULT false")
+    op.execute(
+        "UPDATE notes SET chunked = true "
+        "WHERE EXISTS (SELECT 1 FROM note_chunks WHERE note_chunks.note_id = notes.id)"
+    )
+    # Unchunked notes are searched on their note-level vector; after the backfill there are none
+    op.execute("CREATE INDEX IF NOT EXISTS ix_notes_unchunked ON notes (user_id) WHERE NOT chunked")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_notes_unchunked")
+    op.execute("ALTER TABLE notes DROP COLUMN IF EXISTS chunked")
@@ -0,0 +1,55 @@
+"""Add background embedding jobs
+
+Revision ID: b3e58f0c1a92
+Revises: 7c1d9e4a2b6f
+Create Date: 2026-10-18 17:45:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e58f0c1a92'
+down_revision: Union[str, Sequence[str], None] = '7c1d9e4a2b6f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        "ALTER TABLE notes ADD COLUMN IF NOT EXISTS "
+        "embedding_status VARCHAR(16) NOT NULL DEFAULT 'ready'"
+    )
+    # Notes that never got a vector should be picked up by the pipeline
+    op.execute("UPDATE notes SET embedding_status = 'pending' WHERE embedding IS NULL")
+
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS embedding_jobs (
+            note_id UUID PRIMARY KEY REFERENCES notes(id) ON DELETE CASCADE,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            enqueued_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            last_error TEXT
+        )
+        """
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_embedding_jobs_next_attempt_at "
+        "ON embedding_jobs (next_attempt_at)"
+    )
+    op.execute(
+        "INSERT INTO embedding_jobs (note_id) "
+        "SELECT id FROM notes WHERE embedding IS NULL "
+        "ON CONFLICT (note_id) DO NOTHING"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TABLE IF EXISTS embedding_jobs")
+    op.execute("ALTER TABLE notes DROP COLUMN IF EXISTS embedding_status")
@@ -0,0 +1,41 @@
+"""Add precomputed note summaries
+
+Revision ID: b8f3e6a2d417
+Revises: e7b2d4f9a361
+Create Date: 2026-10-19 02:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8f3e6a2d417'
+down_revision: Union[str, Sequence[str], None] = 'e7b2d4f9a361'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS note_summaries (
+            note_id UUID PRIMARY KEY REFERENCES notes(id) ON DELETE CASCADE,
+            user_id VARCHAR NOT NULL,
+            content_hash VARCHAR(64),
+            summary TEXT,
+            checked_at TIMESTAMP WITH TIME ZONE,
+            attempts INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    # Filled by the background worker once NOTE_SUMMARIES_ENABLED is set;
+    # scripts/backfill_note_summaries.py summarizes existing notes in one go.
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TABLE IF EXISTS note_summaries")
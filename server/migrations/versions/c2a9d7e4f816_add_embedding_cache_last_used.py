@@ -0,0 +1,36 @@
+"""Add last_used_at to the embedding cache
+
+Revision ID: c2a9d7e4f816
+Revises: b8f3e6a2d417
+Create Date: 2026-10-19 03:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2a9d7e4f816'
+down_revision: Union[str, Sequence[str], None] = 'b8f3e6a2d417'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # now() is evaluated once for existing rows, so this does not rewrite the table
+    op.execute(
+        "ALTER TABLE embedding_cache "
+        "ADD COLUMN IF NOT EXISTS last_used_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_embedding_cache_last_used_at ON embedding_cache (last_used_at)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_embedding_cache_last_used_at")
+    op.execute("ALTER TABLE embedding_cache DROP COLUMN IF EXISTS last_used_at")
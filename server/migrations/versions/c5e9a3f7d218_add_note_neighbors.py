@@ -0,0 +1,42 @@
+"""Add precomputed note neighbors
+
+Revision ID: c5e9a3f7d218
+Revises: a6d3e8b1c047
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e9a3f7d218'
+down_revision: Union[str, Sequence[str], None] = 'a6d3e8b1c047'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS note_neighbors (
+            note_id UUID NOT NULL REFERENCES notes(id) ON DELETE CASCADE,
+            rank INTEGER NOT NULL,
+            neighbor_id UUID NOT NULL REFERENCES notes(id) ON DELETE CASCADE,
+            user_id VARCHAR NOT NULL,
+            similarity DOUBLE PRECISION NOT NULL,
+            PRIMARY KEY (note_id, rank)
+        )
+        """
+    )
+    op.execute("CREATE INDEX IF NOT EXISTS ix_note_neighbors_neighbor_id ON note_neighbors (neighbor_id)")
+    # Filled as notes are written once NOTE_NEIGHBORS_ENABLED is set;
+    # scripts/backfill_note_neighbors.py computes lists for existing notes.
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TABLE IF EXISTS note_neighbors")
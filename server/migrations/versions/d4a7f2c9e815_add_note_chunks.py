@@ -0,0 +1,48 @@
+"""Add note chunks
+
+Revision ID: d4a7f2c9e815
+Revises: b3e58f0c1a92
+Create Date: 2026-10-18 19:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.settings import get_settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a7f2c9e815'
+down_revision: Union[str, Sequence[str], None] = 'b3e58f0c1a92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS note_chunks (
+            id UUID PRIMARY KEY,
+            note_id UUID NOT NULL REFERENCES notes(id) ON DELETE CASCADE,
+            user_id VARCHAR NOT NULL,
+            chunk_index INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            content_hash VARCHAR(64) NOT NULL,
+            token_count INTEGER NOT NULL,
+            embedding vector({get_settings().embedding_dimensions}),
+            CONSTRAINT uq_note_chunks_note_id_chunk_index UNIQUE (note_id, chunk_index)
+        )
+        """
+    )
+    op.execute("CREATE INDEX IF NOT EXISTS ix_note_chunks_note_id ON note_chunks (note_id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_note_chunks_user_id ON note_chunks (user_id)")
+    # Existing notes keep matching on their note-level vector until
+    # scripts/backfill_note_chunks.py (or their next edit) chunks them.
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TABLE IF EXISTS note_chunks")
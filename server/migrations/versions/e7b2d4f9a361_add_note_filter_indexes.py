@@ -0,0 +1,35 @@
+"""Add note tag and date filter indexes
+
+Revision ID: e7b2d4f9a361
+Revises: c5e9a3f7d218
+Create Date: 2026-10-19 00:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7b2d4f9a361'
+down_revision: Union[str, Sequence[str], None] = 'c5e9a3f7d218'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_notes_tags ON notes USING gin (tags)")
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_notes_user_id_created_at "
+            "ON notes (user_id, created_at)"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_notes_user_id_created_at")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_notes_tags")
@@ -0,0 +1,96 @@
+"""Add ANN indexes on embeddings
+
+Revision ID: f2c8a1d7b394
+Revises: d4a7f2c9e815
+Create Date: 2026-10-18 20:40:00.000000
+
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.settings import get_settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c8a1d7b394'
+down_revision: Union[str, Sequence[str], None] = 'd4a7f2c9e815'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+TABLES = ("notes", "note_chunks")
+
+# index name suffix -> (indexed expression, operator class for HNSW / IVFFlat)
+FULL_INDEX = ("embedding", ("embedding", "vector_cosine_ops"))
+# VECTOR_STORAGE_MODE -> index on the quantized expression searched by VectorService._compact_distance
+DIMENSIONS = get_settings().embedding_dimensions
+COMPACT_INDEXES = {
+    "halfvec": ("embedding_half", (f"(embedding::halfvec({DIMENSIONS}))", "halfvec_cosine_ops")),
+    "binary": ("embedding_bit", (f"(binary_quantize(embedding)::bit({DIMENSIONS}))", "bit_hamming_ops")),
+}
+
+
+def _pgvector_version() -> tuple:
+    version = op.get_bind().execute(
+        sa.text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+    ).scalar()
+    if not version:
+        return (0, 0)
+    return tuple(int(part) for part in version.split(".")[:2])
+
+
+def _ivfflat_lists(table: str) -> int:
+    # pgvector guidance: rows / 1000 up to 1M rows, sqrt(rows) above
+    rows = op.get_bind().execute(sa.text(f"SELECT count(*) FROM {table}")).scalar() or 0
+    lists = rows // 1000 if rows <= 1_000_000 else int(rows ** 0.5)
+    return max(10, lists)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    settings = get_settings()
+    index_type = settings.vector_index_type.lower()
+    if index_type not in ("hnsw", "ivfflat"):
+        raise ValueError(f"VECTOR_INDEX_TYPE must be 'hnsw' or 'ivfflat', got '{index_type}'")
+
+    # Compact modes are opt-in: only the configured one gets an index, and the
+    # table itself is unchanged (no stored copies, no rewrite)
+    indexes = [FULL_INDEX]
+    storage_mode = settings.vector_storage_mode.lower()
+    if storage_mode in COMPACT_INDEXES:
+        if _pgvector_version() >= (0, 7):
+            indexes.append(COMPACT_INDEXES[storage_mode])
+        else:
+            logger.warning(
+                f"pgvector < 0.7: skipping the {storage_mode} index, VECTOR_STORAGE_MODE will search full vectors"
+            )
+
+    statements = []
+    for table in TABLES:
+        for name, (expression, opclass) in indexes:
+            if index_type == "hnsw":
+                options = f"WITH (m = {settings.vector_hnsw_m}, ef_construction = {settings.vector_hnsw_ef_construction})"
+            else:
+                options = f"WITH (lists = {_ivfflat_lists(table)})"
+            statements.append(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_{name}_{index_type} "
+                f"ON {table} USING {index_type} ({expression} {opclass}) {options}"
+            )
+
+    # CONCURRENTLY cannot run inside the migration transaction; writes keep flowing while indexes build
+    with op.get_context().autocommit_block():
+        for statement in statements:
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            for name, _ in [FULL_INDEX, *COMPACT_INDEXES.values()]:
+                for index_type in ("hnsw", "ivfflat"):
+                    op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS ix_{table}_{name}_{index_type}")
@@ -0,0 +1,46 @@
+"""
+Chunk and embed notes that have no note_chunks rows yet
+
+Usage (from server/): python -m scripts.backfill_note_chunks [--batch-size 32]
+"""
+import argparse
+from sqlalchemy.orm import undefer
+from app.core.database import SessionLocal
+from app.models.note import Note
+from app.services.chunk_service import ChunkService
+from app.utils.logger import logger
+
+
+def backfill(batch_size: int) -> int:
+    total = 0
+    while True:
+        with SessionLocal() as db:
+            notes = (
+                db.query(Note)
+                .options(undefer(Note.embedding))
+                .filter(Note.embedding.isnot(None))
+                .filter(Note.chunked.is_(False))
+                .limit(batch_size)
+                .all()
+            )
+            if not notes:
+                return total
+
+            plans = [
+                ChunkService.plan(db, note.id, note.user_id, note.title, note.content, note.embedding)  # type: ignore
+                for note in notes
+            ]
+            ChunkService.embed_plans(plans)
+            for plan in plans:
+                ChunkService.apply(db, plan)
+            db.commit()
+
+        total += len(notes)
+        logger.info(f"Chunked {total} notes so far")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+    print(f"Chunked {backfill(args.batch_size)} notes")
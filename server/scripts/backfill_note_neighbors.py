@@ -0,0 +1,41 @@
+"""
+Compute (or rebuild) the precomputed related-notes lists of all notes
+
+Usage (from server/): python -m scripts.backfill_note_neighbors [--batch-size 200] [--user-id <id>]
+"""
+import argparse
+from typing import Optional
+from app.core.database import SessionLocal
+from app.models.note import Note
+from app.services.neighbor_service import NeighborService
+from app.utils.logger import logger
+
+
+def backfill(batch_size: int, user_id: Optional[str] = None) -> int:
+    total = 0
+    last_id = None
+    while True:
+        with SessionLocal() as db:
+            query = db.query(Note.id).filter(Note.embedding.isnot(None))
+            if user_id:
+                query = query.filter(Note.user_id == user_id)
+            if last_id is not None:
+                query = query.filter(Note.id > last_id)
+            ids = [row[0] for row in query.order_by(Note.id).limit(batch_size).all()]
+            if not ids:
+                return total
+
+            NeighborService.refresh(db, ids)
+            db.commit()
+
+        last_id = ids[-1]
+        total += len(ids)
+        logger.info(f"Refreshed related-note lists of {total} notes so far")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--user-id")
+    args = parser.parse_args()
+    print(f"Refreshed related-note lists of {backfill(args.batch_size, args.user_id)} notes")
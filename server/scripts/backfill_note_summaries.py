@@ -0,0 +1,31 @@
+"""
+Summarize all long notes that have no current summary (note_summaries)
+
+Usage (from server/): python -m scripts.backfill_note_summaries [--batch-size 8] [--user-id <id>] [--retry-failed]
+"""
+import argparse
+from typing import Optional
+from app.services.summary_pipeline import summary_pipeline
+from app.utils.logger import logger
+
+
+def backfill(batch_size: int, user_id: Optional[str] = None, retry_failed: bool = False) -> int:
+    total = 0
+    while True:
+        # No settle delay: notes edited a moment ago are summarized too
+        processed = summary_pipeline.process_batch(
+            limit=batch_size, settle_seconds=0, user_id=user_id, retry_failed=retry_failed
+        )
+        if processed == 0:
+            return total
+        total += processed
+        logger.info(f"Checked {total} notes so far")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--user-id")
+    parser.add_argument("--retry-failed", action="store_true", help="Also retry notes whose summarization gave up")
+    args = parser.parse_args()
+    print(f"Checked {backfill(args.batch_size, args.user_id, args.retry_failed)} notes")
@@ -0,0 +1,90 @@
+"""
+Recall@k and latency of compact vector storage modes against exact search
+
+Usage (from server/):
+    python -m scripts.benchmark_vector_storage --user-id <id> [--top-k 10] [--queries 50]
+    python -m scripts.benchmark_vector_storage --synthetic 5000   # throwaway random notes
+
+Queries are noisy copies of stored note embeddings. For every mode the top-k
+notes are compared with the exact (full precision) top-k.
+"""
+import argparse
+import time
+import uuid
+from typing import List
+import numpy as np
+from app.core.database import SessionLocal
+from app.models.note import EMBEDDING_DIMENSIONS, Note
+from app.services.vector_service import VectorService
+
+MODES = ["full", "halfvec", "binary"]
+
+
+def _unit(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+
+def seed_synthetic(count: int, user_id: str) -> None:
+    """Clustered random unit vectors, so neighbourhoods are not all equidistant"""
+    rng = np.random.default_rng(0)
+    centers = _unit(rng.standard_normal((max(1, count // 50), EMBEDDING_DIMENSIONS)))
+    with SessionLocal() as db:
+        for start in range(0, count, 500):
+            size = min(500, count - start)
+            picks = centers[rng.integers(0, len(centers), size)]
+            vectors = _unit(picks + 0.5 * rng.standard_normal((size, EMBEDDING_DIMENSIONS)) / np.sqrt(EMBEDDING_DIMENSIONS))
+            db.bulk_insert_mappings(Note, [  # type: ignore
+                {"user_id": user_id, "title": f"bench {start + i}", "content": "", "tags": [], "embedding": vector.tolist()}
+                for i, vector in enumerate(vectors)
+            ])
+            db.commit()
+
+
+def run(user_id: str, top_k: int, queries: int) -> None:
+    rng = np.random.default_rng(1)
+    with SessionLocal() as db:
+        stored = [row[0] for row in db.query(Note.embedding).filter(Note.user_id == user_id, Note.embedding.isnot(None)).limit(queries).all()]
+        if not stored:
+            print(f"No embedded notes for user {user_id}")
+            return
+        query_vectors: List[List[float]] = _unit(
+            np.asarray(stored, dtype=np.float32) + 0.02 * rng.standard_normal((len(stored), EMBEDDING_DIMENSIONS))
+        ).tolist()
+
+        def search(vector: List[float], mode: str):
+            return [
+                row[0] for row in VectorService._nearest(
+                    db, Note, [Note.id], [Note.user_id == user_id], vector, top_k, -1.0, storage_mode=mode
+                )
+            ]
+
+        exact = [search(vector, "full") for vector in query_vectors]
+        print(f"{'mode':<8} {'recall@' + str(top_k):>10} {'mean ms':>9} {'p95 ms':>8}")
+        for mode in MODES:
+            recalls, latencies = [], []
+            for vector, truth in zip(query_vectors, exact):
+                started = time.perf_counter()
+                found = search(vector, mode)
+                latencies.append((time.perf_counter() - started) * 1000)
+                recalls.append(len(set(found) & set(truth)) / max(1, len(truth)))
+            print(f"{mode:<8} {np.mean(recalls):>10.3f} {np.mean(latencies):>9.2f} {np.percentile(latencies, 95):>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-id")
+    parser.add_argument("--synthetic", type=int, default=0, help="Seed N random notes for a throwaway user")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    user_id = args.user_id or f"benchmark-{uuid.uuid4()}"
+    if args.synthetic:
+        seed_synthetic(args.synthetic, user_id)
+    try:
+        run(user_id, args.top_k, args.queries)
+    finally:
+        if args.synthetic:
+            with SessionLocal() as db:
+                db.query(Note).filter(Note.user_id == user_id).delete(synchronize_session=False)
+                db.commit()
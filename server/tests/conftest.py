@@ -0,0 +1,5 @@
+import os
+
+# Required at import time by app.core.database and LLMService; unit tests never connect
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/mnemonic_test")
+os.environ.setdefault("GROQ_API_KEY", "test")
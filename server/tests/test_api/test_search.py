@@ -0,0 +1,84 @@
+import requests
+
+BASE_URL = "http://localhost:8000/api/v1"
+
+
+def test_search():
+    # 0. Test server is running
+    print("0. Testing server connectivity...")
+    try:
+        response = requests.get(f"{BASE_URL}/health")
+        print(f"Server: {response.status_code} - {response.json()}")
+    except Exception as e:
+        print(f"Server not reachable: {e}")
+        return
+    
+    # 1. Create a note with a keyword embeddings tend to miss
+    print("\n1. Creating note...")
+    create_data = {
+        "title": "Config loader",
+        "content": "The parse_config_file helper reads YAML and validates required keys",
+        "tags": ["python"]
+    }
+    response = requests.post(f"{BASE_URL}/notes/", json=create_data)
+    print(f"Status Code: {response.status_code}")
+    if response.status_code != 201:
+        print(f"Failed to create note: {response.text}")
+        return
+    
+    # 2. Same query in every retrieval mode
+    for mode in ("semantic", "hybrid", "lexical"):
+        print(f"\n2. Searching ({mode})...")
+        response = requests.post(f"{BASE_URL}/search/", json={
+            "query": "parse_config_file",
+            "top_k": 3,
+            "mode": mode
+        })
+        if response.status_code == 200:
+            data = response.json()
+            print(f"Results: {[(r['title'], r['similarity_score']) for r in data['results']]}")
+        else:
+            print(f"Failed: {response.text}")
+    
+    # 3. Several queries in one request: same results as one /search per query
+    print("\n3. Batch search...")
+    queries = ["yaml configuration", "required keys", "python helpers"]
+    response = requests.post(f"{BASE_URL}/search/batch", json={
+        "queries": queries,
+        "top_k": 2,
+        "min_similarity": 0.0
+    })
+    assert response.status_code == 200, response.text
+    groups = response.json()["results"]
+    assert [group["query"] for group in groups] == queries
+    for group in groups:
+        single = requests.post(f"{BASE_URL}/search/", json={
+            "query": group["query"],
+            "top_k": 2,
+            "min_similarity": 0.0,
+            "rerank": False
+        }).json()["results"]
+        batched = [(r["id"], r["similarity_score"], r["content"]) for r in group["results"]]
+        assert batched == [(r["id"], r["similarity_score"], r["content"]) for r in single], group["query"]
+        print(f"{group['query']}: {group['total_results']} results, same as /search")
+    
+    # 4. Preview projection: snippet instead of the full content
+    print("\n4. Search with preview...")
+    response = requests.post(f"{BASE_URL}/search/", json={"query": "yaml config", "min_similarity": 0.0, "preview": True})
+    assert response.status_code == 200, response.text
+    results = response.json()["results"]
+    assert results
+    # content is deferred on this path: only the snippet comes back
+    for r in results:
+        assert r["content"] is None and r["snippet"], r
+    print(f"Snippets: {[(r['title'], r['snippet']) for r in results]}")
+
+    response = requests.get(f"{BASE_URL}/notes/", params={"preview": True})
+    assert response.status_code == 200, response.text
+    created = [n for n in response.json()["notes"] if n["title"] == create_data["title"]]
+    assert created and created[0]["content"] is None
+    assert created[0]["snippet"] == create_data["content"]
+    print(f"Note list preview: {created[0]['snippet']}")
+
+if __name__ == "__main__":
+    test_search()
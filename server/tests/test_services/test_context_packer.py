@@ -0,0 +1,55 @@
+import pytest
+
+from app.services.chunk_service import ChunkService
+from app.services.context_packer import ContextPacker, _count
+from app.services.llm_service import llm_service
+
+CEILING = 600
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    # Count words (x1.3) instead of downloading the embedding model's tokenizer
+    monkeypatch.setattr(ChunkService, "_tokenizer_failed", True)
+
+
+def _note(title, content, similarity):
+    return {"title": title, "content": content, "tags": [], "similarity_score": similarity}
+
+
+def _prompt_tokens(query, notes):
+    return sum(_count(message["content"]) for message in llm_service.build_messages(query, notes))
+
+
+def test_long_notes_are_excerpted_under_the_ceiling():
+    query = "How do I rotate the database credentials?"
+    filler = " ".join(f"Unrelated sentence number {i} about lunch plans." for i in range(80))
+    relevant = "Rotate the database credentials with the vault command every month."
+    notes = [
+        _note("Ops runbook", f"{filler} {relevant} {filler}", 0.8),
+        _note("Team notes", filler, 0.6),
+        _note("Short", "The database lives in eu-west-1.", 0.5),
+    ]
+    assert _prompt_tokens(query, notes) > CEILING
+
+    packed, stats = ContextPacker.pack(query, notes, max_tokens=CEILING)
+
+    assert _prompt_tokens(query, packed) <= CEILING
+    assert stats.prompt_tokens <= CEILING
+    # Every note is kept: long ones as excerpts, the short one whole
+    assert [note["title"] for note in packed] == ["Ops runbook", "Team notes", "Short"]
+    assert stats.notes_dropped == 0
+    assert stats.notes_trimmed == 2
+    assert packed[2] is notes[2]
+    # The excerpt of the relevant note keeps the sentence that answers the question
+    assert any(relevant in passage for passage in packed[0]["passages"])
+
+
+def test_notes_that_fit_are_left_unchanged():
+    query = "Where is the database?"
+    notes = [_note("Short", "The database lives in eu-west-1.", 0.5)]
+
+    packed, stats = ContextPacker.pack(query, notes, max_tokens=CEILING)
+
+    assert packed == notes and "passages" not in packed[0]
+    assert stats.notes_trimmed == 0 and stats.notes_dropped == 0
@@ -0,0 +1,78 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.services.embedding_batcher import EmbeddingBatcher
+
+
+class FakeBackend:
+    """Records each call; the vector of a text is [its number]"""
+
+    def __init__(self, error=None):
+        self.calls = []
+        self.error = error
+        self._lock = threading.Lock()
+
+    def embed(self, texts):
+        with self._lock:
+            self.calls.append(list(texts))
+        if self.error is not None:
+            raise self.error
+        return [[float(text.split("-")[1])] for text in texts]
+
+
+def _batcher(name, backend, max_wait_ms=200.0):
+    return EmbeddingBatcher(backend.embed, max_batch_size=32, max_wait_ms=max_wait_ms, name=f"test_{name}")
+
+
+def _embed_concurrently(batcher, texts):
+    barrier = threading.Barrier(len(texts))
+
+    def call(text):
+        barrier.wait()
+        return batcher.embed(text)
+
+    with ThreadPoolExecutor(max_workers=len(texts)) as pool:
+        return list(pool.map(call, texts))
+
+
+def test_concurrent_callers_share_one_backend_call():
+    backend = FakeBackend()
+    batcher = _batcher("coalesce", backend)
+    texts = [f"text-{i}" for i in range(8)]
+    try:
+        vectors = _embed_concurrently(batcher, texts)
+    finally:
+        batcher.stop()
+
+    assert len(backend.calls) == 1
+    assert sorted(backend.calls[0]) == sorted(texts)
+    # Each caller gets the vector of its own text
+    assert vectors == [[float(i)] for i in range(8)]
+
+
+def test_identical_texts_are_embedded_once():
+    backend = FakeBackend()
+    batcher = _batcher("dedupe", backend)
+    try:
+        vectors = _embed_concurrently(batcher, ["text-1", "text-2", "text-1"])
+    finally:
+        batcher.stop()
+
+    assert [sorted(call) for call in backend.calls] == [["text-1", "text-2"]]
+    assert vectors == [[1.0], [2.0], [1.0]]
+
+
+def test_backend_error_reaches_every_waiting_caller():
+    backend = FakeBackend(error=RuntimeError("backend down"))
+    batcher = _batcher("errors", backend)
+    try:
+        futures = [batcher.submit(f"text-{i}") for i in range(4)]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="backend down"):
+                future.result(timeout=5)
+    finally:
+        batcher.stop()
+
+    assert len(backend.calls) == 1
@@ -1,3 +1,5 @@
+import json
+import time
 import requests
 
 BASE_URL = "http://localhost:8000/api/v1"
@@ -50,5 +52,41 @@ def test_llmReasoning():
     
     print("LLM Reasoning Complete!")
 
+def test_llmStreaming():
+    print("LLM Streaming (Server-Sent Events)")
+    
+    start = time.time()
+    first_token = None
+    with requests.post(
+        f"{BASE_URL}/query/text/stream",
+        json={"query": "How can I improve Python performance?", "top_k": 5, "min_similarity": 0.3},
+        stream=True
+    ) as response:
+        if response.status_code != 200:
+            print(f"Failed: {response.text}")
+            return
+        
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+                if event == "notes":
+                    print(f"Retrieved {len(data['retrieved_notes'])} notes after {(time.time() - start) * 1000:.0f}ms")
+                elif event == "token":
+                    if first_token is None:
+                        first_token = time.time()
+                        print(f"First token after {(first_token - start) * 1000:.0f}ms\n")
+                    print(data["text"], end="", flush=True)
+                elif event == "done":
+                    print(f"\n\nConfidence: {data['confidence']}, cited: {len(data['cited_notes'])}")
+                    print(f"Timings: {data['timings']}")
+                elif event == "error":
+                    print(f"\nStream failed: {data['detail']}")
+    
+    print("\nLLM Streaming Complete!")
+
 if __name__ == "__main__":
-    test_llmReasoning()
\ No newline at end of file
+    test_llmReasoning()
+    test_llmStreaming()
\ No newline at end of file
@@ -0,0 +1,49 @@
+from uuid import uuid4
+
+import numpy as np
+import pytest
+
+from app.services.retrieval_service import RetrievalService
+
+
+def test_rrf_sums_reciprocal_ranks():
+    a, b, c = uuid4(), uuid4(), uuid4()
+    scores = RetrievalService.reciprocal_rank_fusion([[a, b, c], [b, a]], k=60)
+    assert scores[a] == pytest.approx(1 / 61 + 1 / 62)
+    assert scores[b] == pytest.approx(1 / 62 + 1 / 61)
+    assert scores[c] == pytest.approx(1 / 63)
+
+
+def test_rrf_fused_order_with_ties_and_keyword_only_hits():
+    semantic = [uuid4() for _ in range(3)]
+    keyword_only = uuid4()
+    lexical = [semantic[1], semantic[0], keyword_only]
+    scores = RetrievalService.reciprocal_rank_fusion([semantic, lexical], k=60)
+
+    # A keyword-only hit is kept, with the score of its single rank
+    assert set(scores) == {*semantic, keyword_only}
+    assert scores[keyword_only] == pytest.approx(1 / 63)
+
+    # Ranks (1, 2) and (2, 1) tie, and so do the two single rank-3 hits. Sorting is
+    # stable, so ties keep the semantic order and keyword-only hits come after it,
+    # as in RetrievalService.hybrid
+    assert scores[semantic[0]] == scores[semantic[1]]
+    assert scores[semantic[2]] == scores[keyword_only]
+    fused = [note_id for note_id, _ in sorted(scores.items(), key=lambda item: item[1], reverse=True)]
+    assert fused == [semantic[0], semantic[1], semantic[2], keyword_only]
+
+
+# Candidates 0 and 1 are near-duplicates; candidate 2 is the least relevant but distinct
+RELEVANCE = [0.9, 0.8, 0.5]
+EMBEDDINGS = np.array([[1.0, 0.0], [1.0, 0.05], [0.0, 1.0]], dtype=np.float32)
+
+
+def test_mmr_without_diversity_keeps_relevance_order():
+    assert RetrievalService.maximal_marginal_relevance(RELEVANCE, EMBEDDINGS, 3, 0.0) == [0, 1, 2]
+    assert RetrievalService.maximal_marginal_relevance(RELEVANCE, EMBEDDINGS, 2, 0.0) == [0, 1]
+
+
+def test_mmr_with_full_diversity_picks_the_least_redundant_next():
+    # All candidates start equally non-redundant, so the first in relevance order is picked first
+    assert RetrievalService.maximal_marginal_relevance(RELEVANCE, EMBEDDINGS, 3, 1.0) == [0, 2, 1]
+    assert RetrievalService.maximal_marginal_relevance(RELEVANCE, EMBEDDINGS, 2, 1.0) == [0, 2]
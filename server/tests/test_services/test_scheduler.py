@@ -0,0 +1,161 @@
+import asyncio
+
+import pytest
+
+from app.core.scheduler import FairScheduler
+from app.utils.exceptions import BulkheadFullError, UserQueueFullError
+
+
+def _scheduler(name, max_concurrent=1, max_queue=10, max_queue_per_user=10, queue_timeout_ms=60000):
+    return FairScheduler(
+        f"test_{name}",
+        max_concurrent=max_concurrent,
+        max_queue=max_queue,
+        max_queue_per_user=max_queue_per_user,
+        queue_timeout_ms=queue_timeout_ms,
+    )
+
+
+def test_capacity_is_never_exceeded():
+    scheduler = _scheduler("capacity", max_concurrent=2)
+    running = 0
+    peak = 0
+
+    async def call(user_id):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.02)
+        running -= 1
+        return user_id
+
+    async def main():
+        users = [f"user-{i}" for i in range(6)]
+        return await asyncio.gather(*(scheduler.run(user_id, call, user_id) for user_id in users))
+
+    assert asyncio.run(main()) == [f"user-{i}" for i in range(6)]
+    assert peak == 2
+
+
+def test_light_user_is_not_stuck_behind_a_burst():
+    scheduler = _scheduler("fairness")
+    order = []
+
+    async def call(label):
+        order.append(label)
+        await asyncio.sleep(0.02)
+
+    async def main():
+        burst = [asyncio.create_task(scheduler.run("heavy", call, f"heavy-{i}")) for i in range(4)]
+        await asyncio.sleep(0.005)
+        light = asyncio.create_task(scheduler.run("light", call, "light-0"))
+        await asyncio.gather(*burst, light)
+
+    asyncio.run(main())
+    # The light user's only call runs right after the call already holding the slot
+    assert order == ["heavy-0", "light-0", "heavy-1", "heavy-2", "heavy-3"]
+
+
+def test_user_queue_limit_rejects_with_429():
+    scheduler = _scheduler("user_limit", max_queue_per_user=1)
+
+    async def main():
+        gate = asyncio.Event()
+        running = asyncio.create_task(scheduler.run("user", gate.wait))
+        queued = asyncio.create_task(scheduler.run("user", gate.wait))
+        await asyncio.sleep(0.01)
+        with pytest.raises(UserQueueFullError) as error:
+            await scheduler.run("user", gate.wait)
+        assert error.value.details["retry_after"] >= 1
+        # Another user still gets queued
+        other = asyncio.create_task(scheduler.run("other", gate.wait))
+        await asyncio.sleep(0.01)
+        gate.set()
+        await asyncio.gather(running, queued, other)
+
+    asyncio.run(main())
+    assert scheduler.rejected_user.value == 1
+
+
+def test_full_shared_queue_rejects_with_503():
+    scheduler = _scheduler("queue_full", max_queue=1)
+
+    async def main():
+        gate = asyncio.Event()
+        running = asyncio.create_task(scheduler.run("a", gate.wait))
+        queued = asyncio.create_task(scheduler.run("b", gate.wait))
+        await asyncio.sleep(0.01)
+        with pytest.raises(BulkheadFullError):
+            await scheduler.run("c", gate.wait)
+        gate.set()
+        await asyncio.gather(running, queued)
+
+    asyncio.run(main())
+    assert scheduler.rejected_capacity.value == 1
+
+
+def test_call_waiting_past_the_queue_timeout_gets_503():
+    scheduler = _scheduler("timeout", queue_timeout_ms=50)
+    # Measured service time short enough for the call to be admitted to the queue
+    scheduler._service_ms = 1.0
+
+    async def main():
+        gate = asyncio.Event()
+        running = asyncio.create_task(scheduler.run("a", gate.wait))
+        await asyncio.sleep(0.01)
+        with pytest.raises(BulkheadFullError):
+            await scheduler.run("b", gate.wait)
+        gate.set()
+        await running
+        # The timed-out waiter left no trace: the next call starts at once
+        await asyncio.wait_for(scheduler.run("b", asyncio.sleep, 0), timeout=0.1)
+
+    asyncio.run(main())
+    assert scheduler.timeouts.value == 1
+
+
+def test_expected_wait_beyond_the_timeout_is_rejected_up_front():
+    scheduler = _scheduler("estimate", queue_timeout_ms=100)
+
+    async def main():
+        gate = asyncio.Event()
+        running = asyncio.create_task(scheduler.run("a", gate.wait))
+        await asyncio.sleep(0.01)
+        # Initial service estimate (2 s) is far beyond the 100 ms queue deadline
+        with pytest.raises(BulkheadFullError):
+            scheduler.check("b")
+        gate.set()
+        await running
+        scheduler.check("b")
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_does_not_use_up_the_users_share():
+    scheduler = _scheduler("unclaim")
+    order = []
+
+    async def call(label, gate=None):
+        order.append(label)
+        if gate is not None:
+            await gate.wait()
+
+    async def main():
+        gate = asyncio.Event()
+        running = asyncio.create_task(scheduler.run("heavy", call, "heavy-0", gate))
+        await asyncio.sleep(0.005)
+        abandoned = asyncio.create_task(scheduler.run("light", call, "light-abandoned"))
+        await asyncio.sleep(0.005)
+        abandoned.cancel()
+        await asyncio.sleep(0.005)
+        queued = [asyncio.create_task(scheduler.run("heavy", call, f"heavy-{i}")) for i in (1, 2)]
+        await asyncio.sleep(0.005)
+        light = asyncio.create_task(scheduler.run("light", call, "light-0"))
+        await asyncio.sleep(0.005)
+        gate.set()
+        await asyncio.gather(running, *queued, light)
+        assert abandoned.cancelled()
+
+    asyncio.run(main())
+    # The abandoned call never ran, so the light user's next call is not pushed behind heavy-1
+    assert order == ["heavy-0", "light-0", "heavy-1", "heavy-2"]
@@ -0,0 +1,101 @@
+import asyncio
+
+from app.core.single_flight import SingleFlight
+
+
+def test_followers_share_one_call():
+    flight = SingleFlight("test_share", share=lambda result: dict(result))
+    calls = []
+
+    async def compute(value):
+        calls.append(value)
+        await asyncio.sleep(0.05)
+        return {"value": value}
+
+    async def main():
+        return await asyncio.gather(*(flight.run("key", compute, 1) for _ in range(3)))
+
+    leader, *followers = asyncio.run(main())
+    assert calls == [1]
+    assert leader == {"value": 1}
+    # Followers get the shared copy, never the leader's own object
+    for result in followers:
+        assert result == leader and result is not leader
+    assert followers[0] is followers[1]
+
+
+def test_different_keys_do_not_coalesce():
+    flight = SingleFlight("test_keys")
+    calls = []
+
+    async def compute(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return value
+
+    async def main():
+        return await asyncio.gather(flight.run("a", compute, 1), flight.run("b", compute, 2))
+
+    assert asyncio.run(main()) == [1, 2]
+    assert sorted(calls) == [1, 2]
+
+
+def test_followers_receive_the_leader_exception():
+    flight = SingleFlight("test_errors")
+    calls = []
+
+    async def fail():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        raise ValueError("boom")
+
+    async def main():
+        return await asyncio.gather(*(flight.run("key", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_follower_takes_over_when_leader_is_cancelled():
+    flight = SingleFlight("test_cancel")
+    calls = []
+
+    async def compute(value):
+        calls.append(value)
+        await asyncio.sleep(0.05)
+        return value
+
+    async def main():
+        leader = asyncio.create_task(flight.run("key", compute, 1))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(flight.run("key", compute, 1))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        result = await follower
+        assert leader.cancelled()
+        return result
+
+    assert asyncio.run(main()) == 1
+    # The follower ran the call itself after the leader went away
+    assert calls == [1, 1]
+
+
+def test_cancelled_follower_does_not_cancel_leader():
+    flight = SingleFlight("test_follower_cancel")
+
+    async def compute():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        leader = asyncio.create_task(flight.run("key", compute))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(flight.run("key", compute))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        result = await leader
+        assert follower.cancelled()
+        return result
+
+    assert asyncio.run(main()) == "done"